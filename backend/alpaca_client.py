@@ -1,35 +1,247 @@
 import os
 import asyncio
-from alpaca_trade_api.rest import REST
-from alpaca_trade_api.common import URL
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from quote_cache import QuoteCache
+from rate_limiter import TokenBucketLimiter, PrioritySemaphore, PRIORITY_ORDER, PRIORITY_READ
+from metrics import EXECUTOR_WAIT_SECONDS, LIMITER_WAIT_SECONDS, UPSTREAM_ERRORS, UPSTREAM_SECONDS
+
+# Symbols per multi-symbol latest-trade request; keeps the query string short
+QUOTE_CHUNK_SIZE = 200
+PRIORITY_LABELS = {PRIORITY_ORDER: 'order', PRIORITY_READ: 'read'}
 
 class AlpacaClient:
-    def __init__(self, api_key: str, secret_key: str, base_url: str = None, paper: bool = True):
+    def __init__(self, api_key: str, secret_key: str, base_url: str = None, paper: bool = True,
+                 quote_ttl: float = None, quote_cache_size: int = None,
+                 max_workers: int = None, rate_per_minute: float = None, burst: int = None,
+                 data_url: str = None, executor: ThreadPoolExecutor = None, http=None,
+                 rate_limiter: TokenBucketLimiter = None, slots: PrioritySemaphore = None):
         self.api_key = api_key
         self.secret_key = secret_key
         self.paper = paper
         if base_url is None or base_url == "":
             base_url = 'https://paper-api.alpaca.markets' if paper else 'https://api.alpaca.markets'
         self.base_url = base_url
+        # market data host; alpaca_trade_api reads the same variable
+        self.data_url = (data_url or os.getenv('APCA_API_DATA_URL', 'https://data.alpaca.markets')).rstrip('/')
+        # Short-lived quote cache shared by the API endpoints and strategies
+        if quote_ttl is None:
+            quote_ttl = float(os.getenv('QUOTE_CACHE_TTL_SECONDS', 1.0))
+        if quote_cache_size is None:
+            quote_cache_size = int(os.getenv('QUOTE_CACHE_MAX_ENTRIES', 10000))
+        self.quote_cache = QuoteCache(ttl=quote_ttl, max_entries=quote_cache_size)
+        # Streamed ring buffers (market_stream.TickStore); when live, quotes
+        # are served from memory without any request
+        self.tick_store = None
+        # Callbacks run with each submitted order (e.g. portfolio cache invalidation)
+        self.order_listeners = []
+        # Own thread pool so blocking REST calls don't compete for asyncio's
+        # default executor, plus one rate limiter shared by every method.
+        # Clients for several accounts can share all of these instead (see
+        # lib_api's AccountPool); whoever passed them in closes them.
+        if max_workers is None:
+            max_workers = int(os.getenv('ALPACA_MAX_WORKERS', 8))
+        if rate_per_minute is None:
+            rate_per_minute = float(os.getenv('ALPACA_RATE_LIMIT_PER_MINUTE', 200))
+        if burst is None and os.getenv('ALPACA_RATE_LIMIT_BURST'):
+            burst = int(os.getenv('ALPACA_RATE_LIMIT_BURST'))
+        self.rate_limiter = rate_limiter or TokenBucketLimiter(rate_per_minute=rate_per_minute, burst=burst)
+        self.slots = slots or PrioritySemaphore(max_workers)
+        self._init_transport(max_workers, executor=executor, http=http)
+
+    def _init_transport(self, max_workers, executor=None, http=None):
         # REST client (blocking) - we'll wrap in executor for async
-        self.client = REST(api_key, secret_key, base_url)
+        from alpaca_trade_api.rest import REST
+        self.client = REST(self.api_key, self.secret_key, self.base_url)
+        self.owns_transport = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='alpaca')
 
-    async def get_account(self):
+    async def _throttled(self, call, priority=PRIORITY_READ, op='request'):
+        """
+        Await `call()` once a rate-limit token and a concurrency slot are
+        free; both waits and the upstream time itself are recorded per `op`
+        """
+        label = PRIORITY_LABELS.get(priority, str(priority))
+        started = time.perf_counter()
+        await self.rate_limiter.acquire(priority)
+        LIMITER_WAIT_SECONDS.labels(label).observe(time.perf_counter() - started)
+        EXECUTOR_WAIT_SECONDS.labels(label).observe(await self.slots.acquire(priority))
+        started = time.perf_counter()
+        try:
+            return await call()
+        except Exception as e:
+            UPSTREAM_ERRORS.labels(op, type(e).__name__).inc()
+            raise
+        finally:
+            UPSTREAM_SECONDS.labels(op).observe(time.perf_counter() - started)
+            self.slots.release()
+
+    async def _run(self, func, priority=PRIORITY_READ, op='request'):
+        """Run a blocking REST call on our executor, under the rate limit"""
         loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self.client.get_account)
+        return await self._throttled(lambda: loop.run_in_executor(self.executor, func), priority, op)
+
+    def limiter_stats(self):
+        """Rate-limit and executor saturation / wait-time statistics"""
+        return {"rate_limit": self.rate_limiter.stats(), "executor": self.slots.stats()}
+
+    async def close(self):
+        if self.owns_transport:
+            self.executor.shutdown(wait=False)
+
+    async def get_account(self):
+        return await self._run(self.client.get_account, op='get_account')
 
     async def get_positions(self):
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, self.client.list_positions)
+        return await self._run(self.client.list_positions, op='get_positions')
 
-    async def create_order(self, symbol, qty, side, type='market', time_in_force='day'):
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, lambda: self.client.submit_order(symbol=symbol, qty=qty, side=side, type=type, time_in_force=time_in_force))
+    def add_order_listener(self, callback):
+        self.order_listeners.append(callback)
+
+    async def create_order(self, symbol, qty, side, type='market', time_in_force='day', limit_price=None,
+                           client_order_id=None):
+        # idempotency key: Alpaca rejects a resubmission with the same id, so
+        # a retried timeout can never place the order twice
+        order = dict(symbol=symbol, qty=qty, side=side, type=type, time_in_force=time_in_force,
+                     client_order_id=client_order_id or uuid.uuid4().hex)
+        if limit_price is not None:
+            order['limit_price'] = limit_price
+        order = await self._submit_order(order)
+        for callback in self.order_listeners:
+            callback(order)
+        return order
+
+    async def _submit_order(self, order):
+        return await self._run(lambda: self.client.submit_order(**order), priority=PRIORITY_ORDER, op='submit_order')
 
     async def get_last_quote(self, symbol):
-        loop = asyncio.get_running_loop()
+        if self.tick_store is not None and self.tick_store.live:
+            # a symbol that has not traded lately falls through to a fetch
+            quote = self.tick_store.last_quote(symbol, max_age=self.tick_store.quote_max_age)
+            if quote is not None:
+                return quote
+        return await self.quote_cache.get_or_fetch(symbol, self._fetch_last_quote)
+
+    async def _fetch_last_quote(self, symbol):
         try:
-            q = await loop.run_in_executor(None, lambda: self.client.get_latest_trade(symbol))
-            return {"symbol": symbol, "price": float(q.price), "timestamp": str(q.timestamp)}
+            return await self._latest_trade(symbol)
         except Exception:
             return None
+
+    async def _latest_trade(self, symbol):
+        q = await self._run(lambda: self.client.get_latest_trade(symbol), op='latest_trade')
+        return {"symbol": symbol, "price": float(q.price), "timestamp": str(q.timestamp)}
+
+    async def get_last_quotes(self, symbols, chunk_size=QUOTE_CHUNK_SIZE):
+        """Latest trade for many symbols, one multi-symbol request per chunk of cache misses"""
+        async def fetch_many(missing):
+            chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+            results = await asyncio.gather(*(self._get_latest_trades(chunk) for chunk in chunks))
+            quotes = {}
+            for chunk_quotes in results:
+                quotes.update(chunk_quotes)
+            return quotes
+        streamed = {}
+        if self.tick_store is not None and self.tick_store.live:
+            streamed = self.tick_store.last_quotes(symbols, max_age=self.tick_store.quote_max_age)
+            symbols = [s for s in symbols if s not in streamed]
+            if not symbols:
+                return streamed
+        quotes = await self.quote_cache.get_many_or_fetch(symbols, fetch_many)
+        quotes.update(streamed)
+        return quotes
+
+    def quote_cache_stats(self):
+        return self.quote_cache.stats()
+
+    async def _get_latest_trades(self, symbols):
+        try:
+            return await self._latest_trades(symbols)
+        except Exception:
+            return {}
+
+    async def _latest_trades(self, symbols):
+        trades = await self._run(lambda: self.client.get_latest_trades(symbols), op='latest_trades')
+        return {
+            symbol: {"symbol": symbol, "price": float(t.price), "timestamp": str(t.timestamp)}
+            for symbol, t in trades.items()
+        }
+
+    async def get_bars(self, symbols, start, end, timeframe='1Day'):
+        """Historical bars as {symbol: [{"t", "o", "h", "l", "c", "v"}, ...]}"""
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        return await self._bars(symbols, start, end, timeframe)
+
+    async def _bars(self, symbols, start, end, timeframe):
+        bars = await self._run(lambda: self.client.get_bars(symbols, timeframe, start, end, adjustment='all'),
+                               op='bars')
+        result = {symbol: [] for symbol in symbols}
+        for bar in bars:
+            raw = bar._raw
+            symbol = raw.get('S', symbols[0])
+            result.setdefault(symbol, []).append({k: raw[k] for k in ('t', 'o', 'h', 'l', 'c', 'v')})
+        return result
+
+
+class LazyAlpacaClient:
+    """
+    Stand-in that builds the real client on first use (FAST_START), so the
+    transport's imports and setup stay off the startup path. Order listeners
+    registered before then are attached once it is built.
+    """
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_client', None)
+        object.__setattr__(self, '_listeners', [])
+        # built from a worker thread during warm-up while requests may arrive
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    @property
+    def built(self) -> bool:
+        return self._client is not None
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    client = self._factory()
+                    for callback in self._listeners:
+                        client.add_order_listener(callback)
+                    object.__setattr__(self, '_client', client)
+        return self._client
+
+    def add_order_listener(self, callback):
+        if self._client is None:
+            self._listeners.append(callback)
+        else:
+            self._client.add_order_listener(callback)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
+
+
+def create_alpaca_client(api_key: str, secret_key: str, base_url: str = None, paper: bool = True,
+                         transport: str = None, **kwargs):
+    """
+    Build an Alpaca client for the configured transport: 'rest' wraps the
+    blocking alpaca_trade_api client in a thread pool, 'http' talks to the
+    REST endpoints directly over a pooled async HTTP client.
+    """
+    transport = (transport or os.getenv('ALPACA_TRANSPORT', 'rest')).lower()
+    if transport == 'http':
+        from alpaca_http import AlpacaHTTPClient
+        return AlpacaHTTPClient(api_key, secret_key, base_url=base_url, paper=paper, **kwargs)
+    if transport != 'rest':
+        raise ValueError(f"Unknown Alpaca transport '{transport}' (expected 'rest' or 'http')")
+    return AlpacaClient(api_key, secret_key, base_url=base_url, paper=paper, **kwargs)
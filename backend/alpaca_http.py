@@ -0,0 +1,152 @@
+"""
+Native async transport for AlpacaClient.
+
+Talks to Alpaca's trading and market-data REST endpoints directly over one
+pooled, keep-alive httpx.AsyncClient (HTTP/2 when the `h2` package is
+installed) instead of handing every call to a thread running the blocking
+alpaca_trade_api client. Method signatures, caching and rate limiting are
+inherited from AlpacaClient; account, position and order payloads come back
+as plain dicts.
+
+Select it with ALPACA_TRANSPORT=http (see alpaca_client.create_alpaca_client).
+"""
+
+import asyncio
+import os
+
+import httpx
+
+from alpaca_client import AlpacaClient
+from metrics import UPSTREAM_ERRORS
+from rate_limiter import PRIORITY_ORDER, PRIORITY_READ
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Status codes worth retrying, mirroring alpaca_trade_api's defaults
+RETRY_STATUS = (429, 504)
+# A 504 on order submission doesn't mean the order wasn't placed; only a 429
+# is safe to resend blindly (see _submit_order)
+ORDER_RETRY_STATUS = (429,)
+MAX_RETRIES = 3
+# Largest page the data API returns for bar requests
+BARS_PAGE_LIMIT = 10000
+
+
+def http_client(max_connections: int) -> httpx.AsyncClient:
+    """Pooled keep-alive client for Alpaca's REST endpoints, without credentials"""
+    http2 = HTTP2_AVAILABLE and os.getenv('ALPACA_HTTP2', 'true').lower() in ('1', 'true', 'yes')
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(float(os.getenv('ALPACA_HTTP_TIMEOUT_SECONDS', 10.0))),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
+
+
+class AlpacaHTTPError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Alpaca API error {status_code}: {message}")
+        self.status_code = status_code
+
+
+class AlpacaHTTPClient(AlpacaClient):
+    def _init_transport(self, max_workers, executor=None, http=None):
+        self.client = None
+        self.executor = None
+        # credentials go on each request, so one pool can serve many accounts
+        self.auth_headers = {
+            'APCA-API-KEY-ID': self.api_key or '',
+            'APCA-API-SECRET-KEY': self.secret_key or '',
+        }
+        self.owns_transport = http is None
+        self.http = http or http_client(max_workers)
+
+    async def close(self):
+        if self.owns_transport:
+            await self.http.aclose()
+
+    async def _request(self, method, url, priority=PRIORITY_READ, op='request', retry_status=RETRY_STATUS, **kwargs):
+        kwargs['headers'] = self.auth_headers
+        for attempt in range(MAX_RETRIES + 1):
+            resp = await self._throttled(lambda: self.http.request(method, url, **kwargs), priority, op)
+            if resp.status_code >= 400:
+                UPSTREAM_ERRORS.labels(op, resp.status_code).inc()
+            if resp.status_code in retry_status and attempt < MAX_RETRIES:
+                retry_after = resp.headers.get('Retry-After')
+                await asyncio.sleep(float(retry_after) if retry_after else 0.5 * 2 ** attempt)
+                continue
+            if resp.status_code >= 400:
+                try:
+                    message = resp.json().get('message', resp.text)
+                except ValueError:
+                    message = resp.text
+                raise AlpacaHTTPError(resp.status_code, message)
+            return resp.json() if resp.content else None
+
+    async def _trading(self, method, path, priority=PRIORITY_READ, op='request', **kwargs):
+        return await self._request(method, f"{self.base_url}/v2{path}", priority, op, **kwargs)
+
+    async def _order_by_client_id(self, client_order_id):
+        try:
+            return await self._trading('GET', '/orders:by_client_order_id', op='get_order',
+                                       params={'client_order_id': client_order_id})
+        except AlpacaHTTPError as e:
+            if e.status_code == 404:
+                return None
+            raise
+
+    async def _data(self, path, params=None, op='request'):
+        return await self._request('GET', f"{self.data_url}/v2{path}", params=params, op=op)
+
+    async def get_account(self):
+        return await self._trading('GET', '/account', op='get_account')
+
+    async def get_positions(self):
+        return await self._trading('GET', '/positions', op='get_positions')
+
+    async def _submit_order(self, order):
+        """
+        POST the order; on a 504 look it up by client_order_id before
+        resubmitting, so a gateway timeout can't place it twice
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return await self._trading('POST', '/orders', priority=PRIORITY_ORDER, op='submit_order',
+                                           retry_status=ORDER_RETRY_STATUS, json=order)
+            except AlpacaHTTPError as e:
+                if e.status_code != 504 or attempt == MAX_RETRIES or not order.get('client_order_id'):
+                    raise
+            await asyncio.sleep(0.5 * 2 ** attempt)
+            placed = await self._order_by_client_id(order['client_order_id'])
+            if placed is not None:
+                return placed
+
+    async def _latest_trade(self, symbol):
+        trade = (await self._data(f'/stocks/{symbol}/trades/latest', op='latest_trade'))['trade']
+        return {"symbol": symbol, "price": float(trade['p']), "timestamp": str(trade['t'])}
+
+    async def _latest_trades(self, symbols):
+        trades = (await self._data('/stocks/trades/latest', {'symbols': ','.join(symbols)}, op='latest_trades'))['trades']
+        return {
+            symbol: {"symbol": symbol, "price": float(t['p']), "timestamp": str(t['t'])}
+            for symbol, t in trades.items()
+        }
+
+    async def _bars(self, symbols, start, end, timeframe):
+        result = {symbol: [] for symbol in symbols}
+        params = {
+            'symbols': ','.join(symbols), 'timeframe': timeframe,
+            'start': start, 'end': end, 'adjustment': 'all', 'limit': BARS_PAGE_LIMIT,
+        }
+        while True:
+            resp = await self._data('/stocks/bars', {k: v for k, v in params.items() if v is not None}, op='bars')
+            for symbol, bars in (resp.get('bars') or {}).items():
+                result.setdefault(symbol, []).extend(
+                    {k: bar[k] for k in ('t', 'o', 'h', 'l', 'c', 'v')} for bar in bars or []
+                )
+            if not resp.get('next_page_token'):
+                return result
+            params['page_token'] = resp['next_page_token']
@@ -0,0 +1,196 @@
+"""
+Vectorized momentum backtester.
+
+Works on a (dates x symbols) close-price matrix and computes signals,
+positions, fills, the equity curve and summary metrics as whole-array
+NumPy operations - there is no per-bar Python loop, so a 10 year / 500
+symbol daily run takes well under a second.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def forward_fill(prices: np.ndarray) -> np.ndarray:
+    """Forward-fill NaNs down each column (leading NaNs are left alone)"""
+    prices = np.asarray(prices, dtype=np.float64)
+    mask = np.isnan(prices)
+    if not mask.any():
+        return prices
+    idx = np.where(mask, 0, np.arange(prices.shape[0])[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    # leading NaNs map back to row 0, which is itself NaN, so they stay NaN
+    return prices[idx, np.arange(prices.shape[1])]
+
+
+def momentum(prices: np.ndarray, lookback_days: int) -> np.ndarray:
+    """Trailing return over `lookback_days` bars; NaN for the warm-up rows"""
+    out = np.full(prices.shape, np.nan)
+    if lookback_days < prices.shape[0]:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[lookback_days:] = prices[lookback_days:] / prices[:-lookback_days] - 1.0
+    return out
+
+
+def momentum_signals(mom: np.ndarray, momentum_threshold: float) -> np.ndarray:
+    """Same rule as MomentumStrategy.get_signals: 1 = buy, -1 = sell, 0 = hold"""
+    signals = np.zeros(mom.shape, dtype=np.int8)
+    signals[mom > momentum_threshold] = 1
+    signals[mom < -momentum_threshold] = -1
+    return signals
+
+
+def signals_to_positions(signals: np.ndarray) -> np.ndarray:
+    """
+    Turn buy/sell/hold signals into a long-only 0/1 position state.
+
+    A buy opens (or keeps) the position, a sell closes it and a hold keeps
+    whatever the last non-hold signal decided - a forward fill of the last
+    non-zero signal, done with an index accumulate instead of a loop.
+    """
+    rows = np.arange(signals.shape[0])[:, None]
+    last = np.where(signals != 0, rows, -1)
+    np.maximum.accumulate(last, axis=0, out=last)
+    cols = np.arange(signals.shape[1])
+    state = signals[np.maximum(last, 0), cols]
+    return ((last >= 0) & (state > 0)).astype(np.int8)
+
+
+def _trade_returns(held: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """Return of every round trip, entry/exit filled at the bar's close"""
+    n_dates, n_symbols = held.shape
+    # pad with a flat bar on both ends so every entry has a matching exit;
+    # positions still open at the end are marked out at the last close
+    padded = np.zeros((n_symbols, n_dates + 2), dtype=np.int8)
+    padded[:, 1:-1] = held.T
+    edges = np.diff(padded, axis=1)
+    entry_sym, entry_bar = np.nonzero(edges == 1)
+    exit_sym, exit_bar = np.nonzero(edges == -1)
+    exit_bar = np.minimum(exit_bar, n_dates - 1)
+    entry_px = prices[entry_bar, entry_sym]
+    exit_px = prices[exit_bar, exit_sym]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = exit_px / entry_px - 1.0
+    return returns[np.isfinite(returns)]
+
+
+def max_drawdown(equity: np.ndarray) -> float:
+    """Largest peak-to-trough fall of an equity curve, as a positive fraction"""
+    if equity.size == 0:
+        return 0.0
+    peaks = np.maximum.accumulate(equity)
+    return float(np.max(1.0 - equity / peaks))
+
+
+def sharpe_ratio(returns: np.ndarray, periods_per_year: int = TRADING_DAYS_PER_YEAR) -> float:
+    """Annualised Sharpe ratio of per-period returns (zero risk-free rate)"""
+    if returns.size < 2:
+        return 0.0
+    std = returns.std(ddof=1)
+    if not np.isfinite(std) or std == 0:
+        return 0.0
+    return float(returns.mean() / std * np.sqrt(periods_per_year))
+
+
+def run_backtest(prices: np.ndarray,
+                 lookback_days: int = 20,
+                 momentum_threshold: float = 0.05,
+                 initial_capital: float = 100000.0,
+                 cost_bps: float = 0.0,
+                 fill_lag: int = 1,
+                 dates: Optional[Sequence] = None,
+                 symbols: Optional[List[str]] = None,
+                 include_series: bool = False) -> Dict:
+    """
+    Backtest the momentum rule over a (dates x symbols) close-price matrix.
+
+    Signals are taken at each close and filled `fill_lag` bars later at that
+    bar's close. Held names are equal-weighted and rebalanced every bar;
+    `cost_bps` is charged on turnover. Returns a plain dict of metrics, plus
+    the equity curve / daily returns / positions / per-trade returns when
+    `include_series` is set.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim == 1:
+        prices = prices[:, np.newaxis]
+    if prices.ndim != 2:
+        raise ValueError("prices must be a (dates x symbols) matrix")
+    if lookback_days < 1:
+        raise ValueError("lookback_days must be >= 1")
+    if fill_lag < 0:
+        raise ValueError("fill_lag must be >= 0")
+
+    n_dates, n_symbols = prices.shape
+    prices = forward_fill(prices)
+
+    signals = momentum_signals(momentum(prices, lookback_days), momentum_threshold)
+    target = signals_to_positions(signals)
+
+    # position actually held at the end of each bar
+    held = np.zeros_like(target)
+    if fill_lag < n_dates:
+        held[fill_lag:] = target[:n_dates - fill_lag]
+    held[np.isnan(prices)] = 0
+
+    counts = held.sum(axis=1, keepdims=True)
+    weights = np.divide(held, counts, out=np.zeros(held.shape), where=counts > 0)
+
+    bar_returns = np.zeros_like(prices)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bar_returns[1:] = prices[1:] / prices[:-1] - 1.0
+    bar_returns[~np.isfinite(bar_returns)] = 0.0
+
+    # the return of bar t is earned by the weights held at the end of bar t-1
+    port_returns = np.zeros(n_dates)
+    port_returns[1:] = np.einsum('ij,ij->i', weights[:-1], bar_returns[1:])
+
+    turnover = np.abs(np.diff(weights, axis=0, prepend=0.0)).sum(axis=1)
+    port_returns -= turnover * (cost_bps / 1e4)
+
+    equity = initial_capital * np.cumprod(1.0 + port_returns)
+    trade_returns = _trade_returns(held, prices)
+
+    result = {
+        "strategy": "momentum",
+        "symbols": symbols,
+        "start_date": str(dates[0]) if dates is not None and len(dates) else None,
+        "end_date": str(dates[-1]) if dates is not None and len(dates) else None,
+        "lookback_days": lookback_days,
+        "momentum_threshold": momentum_threshold,
+        "bars": n_dates,
+        "initial_capital": initial_capital,
+        "final_equity": float(equity[-1]) if n_dates else initial_capital,
+        "total_return": float(equity[-1] / initial_capital - 1.0) if n_dates else 0.0,
+        "sharpe_ratio": sharpe_ratio(port_returns[1:]),
+        "max_drawdown": max_drawdown(equity),
+        "win_rate": float((trade_returns > 0).mean()) if trade_returns.size else 0.0,
+        "total_trades": int(trade_returns.size),
+        "exposure": float((counts[:, 0] > 0).mean()) if n_dates else 0.0,
+        "status": "completed",
+    }
+    if include_series:
+        result["equity_curve"] = equity
+        result["returns"] = port_returns
+        result["positions"] = held
+        result["trade_returns"] = trade_returns
+    return result
+
+
+def bars_to_matrix(bars: Dict[str, List[Dict]], symbols: List[str], field: str = 'c'):
+    """
+    Align per-symbol bar lists (as returned by AlpacaClient.get_bars) on the
+    union of their timestamps. Returns (dates, matrix) with NaN where a
+    symbol has no bar for a date.
+    """
+    stamps = {s: np.array([b['t'] for b in bars.get(s, [])]) for s in symbols}
+    non_empty = [v for v in stamps.values() if v.size]
+    dates = np.unique(np.concatenate(non_empty)) if non_empty else np.array([])
+    matrix = np.full((dates.size, len(symbols)), np.nan)
+    for j, symbol in enumerate(symbols):
+        if stamps[symbol].size:
+            rows = np.searchsorted(dates, stamps[symbol])
+            matrix[rows, j] = [b[field] for b in bars[symbol]]
+    return dates, matrix
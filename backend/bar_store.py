@@ -0,0 +1,265 @@
+"""
+Local columnar store for historical bars.
+
+Each symbol gets a directory with one flat binary file per column:
+
+    <root>/<SYMBOL>/t.i8        int64   bar open time, epoch seconds (sorted)
+    <root>/<SYMBOL>/open.f4     float32
+    <root>/<SYMBOL>/high.f4     float32
+    <root>/<SYMBOL>/low.f4      float32
+    <root>/<SYMBOL>/close.f4    float32
+    <root>/<SYMBOL>/volume.f8   float64
+
+There are no headers, so the row count is just file size / item size.
+Daily syncs are append-only. Reads memory-map the files and return slices
+of those maps. A range read is a binary search on the timestamp column, not
+a copy, so years of history come back in microseconds.
+
+    python bar_store.py sync --root data/bars --symbols SPY,QQQ --start 2015-01-01
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from market_stream import parse_timestamp
+
+COLUMNS = {
+    't': np.int64,
+    'open': np.float32,
+    'high': np.float32,
+    'low': np.float32,
+    'close': np.float32,
+    'volume': np.float64,
+}
+_EXT = {np.int64: 'i8', np.float32: 'f4', np.float64: 'f8'}
+# bar field names as returned by AlpacaClient.get_bars
+_BAR_KEYS = {'open': 'o', 'high': 'h', 'low': 'l', 'close': 'c', 'volume': 'v'}
+
+
+def to_epoch(value) -> int:
+    """Date / datetime / ISO string / epoch number -> epoch seconds (UTC)"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+    if isinstance(value, str):
+        if len(value) == 10:
+            value = datetime.date.fromisoformat(value)
+        else:
+            return int(parse_timestamp(value))
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return int(value.timestamp())
+    if isinstance(value, datetime.date):
+        return int(datetime.datetime(value.year, value.month, value.day, tzinfo=datetime.timezone.utc).timestamp())
+    raise TypeError(f"Cannot convert {value!r} to a timestamp")
+
+
+def to_end_epoch(value) -> int:
+    """
+    Inclusive upper bound for a range end: a bare date covers the whole UTC
+    day (daily bars are stamped at 04:00/05:00Z, after that day's midnight)
+    """
+    if value is None:
+        return None
+    if isinstance(value, str) and len(value) == 10 or \
+            isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return to_epoch(value) + 86400 - 1
+    return to_epoch(value)
+
+
+def _append_file(path: str, values: np.ndarray):
+    with open(path, 'ab') as f:
+        f.write(np.ascontiguousarray(values).tobytes())
+
+
+class BarStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._maps = {}  # (symbol, column) -> (file size, memmap)
+
+    def _path(self, symbol: str, column: str) -> str:
+        return os.path.join(self.root, symbol, f"{column}.{_EXT[COLUMNS[column]]}")
+
+    def symbols(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.exists(self._path(d, 't')))
+
+    def column(self, symbol: str, column: str) -> np.ndarray:
+        """
+        Read-only memory map of a whole column (empty array if missing),
+        re-mapped when the file has grown, e.g. after a sync by another process
+        """
+        key = (symbol, column)
+        path = self._path(symbol, column)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        cached = self._maps.get(key)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+        dtype = COLUMNS[column]
+        # whole rows only: another process may be mid-write
+        rows = size // np.dtype(dtype).itemsize
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        mapped = np.memmap(path, dtype=dtype, mode='r', shape=(rows,))
+        self._maps[key] = (size, mapped)
+        return mapped
+
+    def __len__(self):
+        return len(self.symbols())
+
+    def count(self, symbol: str) -> int:
+        return len(self.column(symbol, 't'))
+
+    def last_timestamp(self, symbol: str) -> Optional[int]:
+        t = self.column(symbol, 't')
+        return int(t[-1]) if len(t) else None
+
+    def append(self, symbol: str, t, open=None, high=None, low=None, close=None, volume=None) -> int:
+        """
+        Append bars newer than the last stored one; returns rows written.
+        Older or duplicate timestamps are dropped so re-running a sync is safe.
+        """
+        if close is None:
+            raise ValueError("close prices are required")
+        t = np.asarray(t, dtype=np.int64)
+        close = np.asarray(close, dtype=np.float32)
+        columns = {
+            'open': close if open is None else np.asarray(open, dtype=np.float32),
+            'high': close if high is None else np.asarray(high, dtype=np.float32),
+            'low': close if low is None else np.asarray(low, dtype=np.float32),
+            'close': close,
+            'volume': np.zeros(len(t)) if volume is None else np.asarray(volume, dtype=np.float64),
+        }
+
+        order = np.argsort(t, kind='stable')
+        t = t[order]
+        keep = np.ones(len(t), dtype=bool)
+        keep[1:] = t[1:] != t[:-1]
+        last = self.last_timestamp(symbol)
+        if last is not None:
+            keep &= t > last
+        if not keep.any():
+            return 0
+
+        os.makedirs(os.path.join(self.root, symbol), exist_ok=True)
+        self._release(symbol)
+        self._truncate_to_t(symbol)
+        # timestamps go last so a crash mid-append never indexes missing data
+        for name in ('open', 'high', 'low', 'close', 'volume', 't'):
+            values = t if name == 't' else columns[name][order]
+            _append_file(self._path(symbol, name), values[keep])
+        return int(keep.sum())
+
+    def append_bars(self, symbol: str, bars: List[Dict]) -> int:
+        """Append bars in AlpacaClient.get_bars format ({"t", "o", "h", "l", "c", "v"})"""
+        if not bars:
+            return 0
+        t = [to_epoch(b['t']) for b in bars]
+        return self.append(symbol, t, **{name: [b[key] for b in bars] for name, key in _BAR_KEYS.items()})
+
+    def _truncate_to_t(self, symbol: str):
+        """Drop rows a crashed append wrote to the value columns but never indexed in `t`"""
+        t_path = self._path(symbol, 't')
+        rows = os.path.getsize(t_path) // np.dtype(np.int64).itemsize if os.path.exists(t_path) else 0
+        for name in ('open', 'high', 'low', 'close', 'volume'):
+            path = self._path(symbol, name)
+            size = rows * np.dtype(COLUMNS[name]).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _release(self, symbol: str):
+        # memmaps have a fixed length; drop them so the next read sees new rows
+        for column in COLUMNS:
+            self._maps.pop((symbol, column), None)
+
+    def _bounds(self, symbol: str, start=None, end=None):
+        t = self.column(symbol, 't')
+        lo = 0 if start is None else int(np.searchsorted(t, to_epoch(start), side='left'))
+        hi = len(t) if end is None else int(np.searchsorted(t, to_end_epoch(end), side='right'))
+        return lo, hi
+
+    def read(self, symbol: str, start=None, end=None, columns: Iterable[str] = None) -> Dict[str, np.ndarray]:
+        """Columns for bars with start <= t <= end (a date end includes that day), as zero-copy memmap slices"""
+        lo, hi = self._bounds(symbol, start, end)
+        return {name: self.column(symbol, name)[lo:hi] for name in (columns or COLUMNS)}
+
+    def closes(self, symbol: str, n: Optional[int] = None, end=None) -> np.ndarray:
+        """The last n closes up to `end` (zero-copy)"""
+        _, hi = self._bounds(symbol, None, end)
+        lo = 0 if n is None else max(0, hi - n)
+        return self.column(symbol, 'close')[lo:hi]
+
+    def price_matrix(self, symbols: List[str], start=None, end=None, column: str = 'close'):
+        """
+        (dates, dates x symbols matrix) aligned on the union of timestamps,
+        NaN where a symbol has no bar - the input format of backtest.run_backtest.
+        """
+        ranges = {s: self.read(s, start, end, columns=('t', column)) for s in symbols}
+        stamps = [r['t'] for r in ranges.values() if len(r['t'])]
+        dates = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype=np.int64)
+        matrix = np.full((len(dates), len(symbols)), np.nan)
+        for j, symbol in enumerate(symbols):
+            r = ranges[symbol]
+            if len(r['t']):
+                matrix[np.searchsorted(dates, r['t']), j] = r[column]
+        return dates, matrix
+
+    async def sync_daily(self, client, symbols: List[str], start='2015-01-01', end=None) -> Dict[str, int]:
+        """
+        Fetch and append the daily bars each symbol is missing. Symbols that
+        need the same start date share one multi-symbol request.
+        """
+        end = end or datetime.date.today().isoformat()
+        groups = {}
+        for symbol in symbols:
+            last = self.last_timestamp(symbol)
+            since = (datetime.datetime.fromtimestamp(last, datetime.timezone.utc).date() + datetime.timedelta(days=1)
+                     ) if last is not None else datetime.date.fromisoformat(start[:10])
+            if since.isoformat() <= end[:10]:
+                groups.setdefault(since.isoformat(), []).append(symbol)
+
+        written = {symbol: 0 for symbol in symbols}
+        for since, group in groups.items():
+            bars = await client.get_bars(group, since, end)
+            for symbol in group:
+                written[symbol] = self.append_bars(symbol, bars.get(symbol, []))
+        return written
+
+
+async def _sync_main(args):
+    from alpaca_client import create_alpaca_client
+    client = create_alpaca_client(
+        api_key=os.getenv('ALPACA_API_KEY'),
+        secret_key=os.getenv('ALPACA_SECRET_KEY'),
+        base_url=os.getenv('ALPACA_BASE_URL'),
+    )
+    store = BarStore(args.root)
+    symbols = [s.strip().upper() for s in args.symbols.split(',') if s.strip()] or store.symbols()
+    try:
+        written = await store.sync_daily(client, symbols, start=args.start)
+    finally:
+        await client.close()
+    for symbol, rows in written.items():
+        print(f"{symbol}: +{rows} bars ({store.count(symbol)} total)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local columnar bar store")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sync = sub.add_parser('sync', help="append missing daily bars from Alpaca")
+    sync.add_argument('--root', default=os.getenv('BAR_STORE_DIR', 'data/bars'))
+    sync.add_argument('--symbols', default='', help="comma-separated; defaults to every stored symbol")
+    sync.add_argument('--start', default='2015-01-01', help="first date for symbols with no history yet")
+    args = parser.parse_args()
+    asyncio.run(_sync_main(args))
@@ -4,43 +4,93 @@ This is a simple momentum strategy that buys stocks with positive momentum
 and sells stocks with negative momentum.
 """
 
-import asyncio
-from typing import List, Dict
-from datetime import datetime, timedelta
+import time
+import numpy as np
+from typing import Dict, List, Optional
 from strategy_engine import StrategyEngine
 from risk_manager import RiskManager
 from alpaca_client import AlpacaClient
+from indicators import IndicatorEngine
+from execution_planner import ExecutionPlanner
+from risk_engine import PreTradeRiskEngine
+from metrics import STRATEGY_TICK_SECONDS
 
 class MomentumStrategy(StrategyEngine):
-    def __init__(self, alpaca_client: AlpacaClient):
-        super().__init__(alpaca_client)
+    DEFAULT_SYMBOLS = ('SPY', 'QQQ', 'IWM', 'AAPL', 'MSFT', 'GOOGL')
+
+    def __init__(self, alpaca_client: AlpacaClient, bar_store=None, journal=None, portfolio=None, risk_engine=None):
+        super().__init__(alpaca_client, bar_store, journal, portfolio)
         self.risk_manager = RiskManager(max_drawdown_pct=0.15, risk_per_trade=0.02)
-        self.symbols = ['SPY', 'QQQ', 'IWM', 'AAPL', 'MSFT', 'GOOGL']
+        self.symbols = list(self.DEFAULT_SYMBOLS)
         self.lookback_days = 20
         self.momentum_threshold = 0.05  # 5% momentum threshold
+        self.last_quotes = {}
+        # O(1)-per-bar momentum/volatility state, warmed from the bar store
+        self.indicators = IndicatorEngine(self.symbols, momentum_window=self.lookback_days)
+        # history loaded on first use, then only newer bars are fed in
+        self.indicator_history = self.lookback_days * 5
+        self._indicators_refreshed = {}  # symbol -> date last synced
+        # pre-trade limits checked inline before every rebalance
+        self.risk_engine = risk_engine or PreTradeRiskEngine(max_position_pct=self.risk_manager.max_position_pct)
+        self.planner = ExecutionPlanner(alpaca_client, portfolio=self.portfolio, journal=journal, risk=self.risk_engine)
         
-    async def calculate_momentum(self, symbol: str) -> float:
+    async def calculate_momentum(self, symbol: str, quote: Dict = None) -> float:
         """Calculate momentum for a given symbol"""
         try:
-            # Get current price
-            current_quote = await self.alpaca.get_last_quote(symbol)
+            # Get current price (reuse a batched quote when one is supplied)
+            current_quote = quote or await self.alpaca.get_last_quote(symbol)
             if not current_quote:
                 return 0.0
                 
             current_price = current_quote['price']
             
-            # In a real implementation, you would fetch historical data
-            # For this example, we'll simulate momentum calculation
-            # You would typically use a data provider like Polygon or Tiingo
+            # Without a local history store, fall back to simulated momentum
+            if self.bar_store is None:
+                return self._simulate_momentum(symbol, current_price)
             
-            # Simulate momentum calculation (replace with real data)
-            momentum = self._simulate_momentum(symbol, current_price)
-            return momentum
+            self.refresh_indicators([symbol])
+            momentum = self.indicators.momentum_from([symbol], [current_price])[0]
+            return 0.0 if momentum != momentum else float(momentum)
             
         except Exception as e:
             print(f"Error calculating momentum for {symbol}: {e}")
             return 0.0
     
+    def refresh_indicators(self, symbols: List[str] = None):
+        """
+        Feed bars the indicator engine hasn't seen yet from the bar store
+        (checked once a day per symbol). New history for all symbols is fed
+        in as one NaN-padded matrix so warm-up stays vectorized; the risk
+        engine's covariance takes the same bars.
+        """
+        if self.bar_store is None:
+            return
+        today = self.now().date()
+        symbols = [s for s in (symbols or self.symbols) if self._indicators_refreshed.get(s) != today]
+        if not symbols:
+            return
+        self.indicators.add_symbols(symbols)
+        pending = {}
+        for symbol in symbols:
+            self._indicators_refreshed[symbol] = today
+            row = self.indicators.index[symbol]
+            if self.indicators.count[row]:
+                bars = self.bar_store.read(symbol, start=int(self.indicators.last_ts[row]) + 1)
+            else:
+                bars = {k: v[-self.indicator_history:] for k, v in self.bar_store.read(symbol).items()}
+            if len(bars['t']):
+                pending[symbol] = bars
+        if not pending:
+            return
+        self.risk_engine.update_bars(pending)
+        depth = max(len(b['t']) for b in pending.values())
+        arrays = {k: np.full((depth, len(pending)), np.nan) for k in ('close', 'high', 'low', 't')}
+        for j, bars in enumerate(pending.values()):
+            for k, values in arrays.items():
+                values[depth - len(bars['t']):, j] = bars[k]
+        self.indicators.warm_up(arrays['close'], arrays['high'], arrays['low'],
+                                symbols=list(pending), timestamps=arrays['t'])
+    
     def _simulate_momentum(self, symbol: str, current_price: float) -> float:
         """Simulate momentum calculation - replace with real data"""
         # This is a placeholder - in production, you would:
@@ -54,130 +104,82 @@ class MomentumStrategy(StrategyEngine):
     
     async def get_signals(self) -> Dict[str, str]:
         """Get buy/sell signals for all symbols"""
-        signals = {}
-        
-        for symbol in self.symbols:
-            momentum = await self.calculate_momentum(symbol)
-            
-            if momentum > self.momentum_threshold:
-                signals[symbol] = 'buy'
-            elif momentum < -self.momentum_threshold:
-                signals[symbol] = 'sell'
-            else:
-                signals[symbol] = 'hold'
-                
-        return signals
+        # One batched request per chunk of symbols instead of one per symbol;
+        # the quotes are kept so order sizing doesn't fetch them again
+        self.last_quotes = await self.alpaca.get_last_quotes(self.symbols)
+        prices = [self.last_quotes[s]['price'] if s in self.last_quotes else np.nan for s in self.symbols]
+        return self.compute_signals(self.symbols, prices)
+    
+    def compute_signals(self, symbols: List[str], prices) -> Dict[str, str]:
+        """Momentum vs. threshold for each symbol; 'hold' without a price or enough history"""
+        prices = np.asarray(prices, dtype=np.float64)
+        quoted = np.isfinite(prices)
+        momenta = np.full(len(symbols), np.nan)
+        live = [s for s, ok in zip(symbols, quoted) if ok]
+        if self.bar_store is not None:
+            # one vectorized pass over the incremental indicator state
+            self.refresh_indicators(live)
+            momenta[quoted] = self.indicators.momentum_from(live, prices[quoted])
+        else:
+            momenta[quoted] = [self._simulate_momentum(s, p) for s, p in zip(live, prices[quoted])]
+        # NaN compares False both ways, so it holds
+        signals = np.where(momenta > self.momentum_threshold, 'buy',
+                           np.where(momenta < -self.momentum_threshold, 'sell', 'hold'))
+        return dict(zip(symbols, signals.tolist()))
     
     async def execute_strategy(self):
         """Main strategy execution"""
-        print(f"Executing momentum strategy at {datetime.now()}")
+        print(f"Executing momentum strategy at {self.now()} UTC")
+        started = time.perf_counter()
+        outcome = 'error'
         
         try:
             # Get current account info
-            account = await self.alpaca.get_account()
+            account = await self.portfolio.account()
             account_value = float(account['portfolio_value'])
             
-            # Check risk limits
-            if not self.risk_manager.check_max_drawdown(0.05):  # 5% current drawdown
-                print("Risk limit exceeded, skipping strategy execution")
+            # Check risk limits (drawdown from the equity high-water mark)
+            drawdown = self.risk_manager.update_equity(account_value)
+            if not self.risk_manager.check_max_drawdown(drawdown):
+                print(f"Risk limit exceeded ({drawdown:.1%} drawdown), skipping strategy execution")
+                outcome = 'risk_halt'
                 return
             
             # Get trading signals
             signals = await self.get_signals()
             
-            # Execute trades based on signals
-            for symbol, signal in signals.items():
-                if signal == 'buy':
-                    await self._execute_buy_order(symbol, account_value)
-                elif signal == 'sell':
-                    await self._execute_sell_order(symbol)
+            # Diff the target portfolio against one positions snapshot and
+            # submit the orders concurrently, sells first
+            report = await self.planner.rebalance(signals, lambda symbol: self._target_quantity(symbol, account_value),
+                                                  tag='momentum',
+                                                  prices={s: q['price'] for s, q in self.last_quotes.items()})
+            print(f"Rebalanced: {report['submitted']} orders submitted, {report['failed']} failed, "
+                  f"{len(report['rejected'])} rejected by risk "
+                  f"in {report['elapsed_s']}s (p95 {report['latency_ms']['p95']}ms)")
+            outcome = 'ok'
+            return report
                     
         except Exception as e:
             print(f"Error executing strategy: {e}")
+        finally:
+            STRATEGY_TICK_SECONDS.labels('momentum', outcome).observe(time.perf_counter() - started)
     
-    async def _execute_buy_order(self, symbol: str, account_value: float):
-        """Execute buy order for a symbol"""
-        try:
-            # Calculate position size based on risk management
-            volatility = 0.02  # 2% volatility assumption
-            position_size = self.risk_manager.position_size(account_value, volatility)
-            
-            # Get current price
-            quote = await self.alpaca.get_last_quote(symbol)
-            if not quote:
-                return
-                
-            # Calculate quantity (simplified)
-            price = quote['price']
-            quantity = max(1, int(position_size / price))
-            
-            # Place order
-            order = await self.alpaca.create_order(
-                symbol=symbol,
-                qty=quantity,
-                side='buy',
-                type='market',
-                time_in_force='day'
-            )
-            
-            print(f"Buy order placed: {quantity} shares of {symbol}")
-            
-        except Exception as e:
-            print(f"Error placing buy order for {symbol}: {e}")
-    
-    async def _execute_sell_order(self, symbol: str):
-        """Execute sell order for a symbol"""
-        try:
-            # Get current positions
-            positions = await self.alpaca.get_positions()
-            
-            # Find position for this symbol
-            position = None
-            for pos in positions:
-                if pos['symbol'] == symbol:
-                    position = pos
-                    break
-            
-            if not position:
-                print(f"No position found for {symbol}")
-                return
-            
-            # Sell entire position
-            quantity = int(float(position['qty']))
-            if quantity > 0:
-                order = await self.alpaca.create_order(
-                    symbol=symbol,
-                    qty=quantity,
-                    side='sell',
-                    type='market',
-                    time_in_force='day'
-                )
-                
-                print(f"Sell order placed: {quantity} shares of {symbol}")
-            
-        except Exception as e:
-            print(f"Error placing sell order for {symbol}: {e}")
+    def _target_quantity(self, symbol: str, account_value: float) -> Optional[int]:
+        """Shares to hold on a buy signal (None without a price)"""
+        # Calculate position size based on risk management, scaled by the
+        # symbol's EWMA volatility (2% assumption until it has history)
+        volatility = 0.02
+        if symbol in self.indicators.index and self.indicators.count[self.indicators.index[symbol]] > 1:
+            volatility = float(self.indicators.volatility([symbol])[0])
+        position_size = self.risk_manager.position_size(account_value, volatility)
+        
+        # Current price was fetched with the signals
+        quote = self.last_quotes.get(symbol)
+        if not quote:
+            return None
+        return max(1, int(position_size / quote['price']))
     
-    async def backtest_momentum(self, symbols: List[str], start: str, end: str):
+    async def backtest_momentum(self, symbols: List[str], start: str, end: str, **kwargs):
         """Backtest the momentum strategy"""
         print(f"Backtesting momentum strategy from {start} to {end}")
-        
-        # This is a placeholder implementation
-        # In production, you would:
-        # 1. Fetch historical data for the period
-        # 2. Run the strategy on historical data
-        # 3. Calculate performance metrics
-        # 4. Return detailed results
-        
-        return {
-            "strategy": "momentum",
-            "symbols": symbols,
-            "start_date": start,
-            "end_date": end,
-            "total_return": 0.15,  # 15% return
-            "sharpe_ratio": 1.2,
-            "max_drawdown": 0.08,  # 8% max drawdown
-            "win_rate": 0.65,  # 65% win rate
-            "total_trades": 45,
-            "status": "completed"
-        }
+        return await super().backtest_momentum(symbols, start, end, **kwargs)
@@ -0,0 +1,151 @@
+"""
+Target-portfolio execution planner.
+
+Signals become a target quantity per symbol, which is diffed against a
+single positions snapshot indexed by symbol. The resulting orders are
+checked by the pre-trade risk engine when one is configured, then
+submitted concurrently under a bounded semaphore. All sells go first, so
+buying power is freed before buys go out. Every run returns a report with
+per-order latency and failures.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+from order_journal import order_event
+
+logger = logging.getLogger(__name__)
+
+
+def index_positions(positions: List[Dict]) -> Dict[str, float]:
+    """Positions list (Alpaca shape) -> {symbol: signed qty}"""
+    held = {}
+    for p in positions or ():
+        qty = float(p.get('qty', 0))
+        held[p['symbol']] = -abs(qty) if p.get('side') == 'short' else qty
+    return held
+
+
+def target_portfolio(signals: Dict[str, str], held: Dict[str, float], size: Callable[[str], float]) -> Dict[str, float]:
+    """
+    'buy' -> size(symbol) shares (None when it can't be sized: keep what is
+    held), 'sell' -> flat, 'hold' -> keep what is held. Long-only: a sell closes a long
+    position but never covers a short.
+    """
+    targets = {}
+    for symbol, signal in signals.items():
+        if signal == 'buy':
+            qty = size(symbol)
+            targets[symbol] = held.get(symbol, 0.0) if qty is None else qty
+        elif signal == 'sell':
+            targets[symbol] = min(held.get(symbol, 0.0), 0.0)
+        else:
+            targets[symbol] = held.get(symbol, 0.0)
+    return targets
+
+
+def plan_orders(targets: Dict[str, float], held: Dict[str, float], min_qty: float = 1.0) -> List[Dict]:
+    """Orders that move `held` to `targets`, sells first, skipping changes under `min_qty`"""
+    sells, buys = [], []
+    for symbol, target in targets.items():
+        delta = target - held.get(symbol, 0.0)
+        if abs(delta) < min_qty:
+            continue
+        qty = round(abs(delta), 6)
+        if qty.is_integer():
+            qty = int(qty)
+        (sells if delta < 0 else buys).append({"symbol": symbol, "side": "sell" if delta < 0 else "buy", "qty": qty})
+    return sells + buys
+
+
+class ExecutionPlanner:
+    def __init__(self, client, portfolio=None, journal=None, max_concurrency: int = None, risk=None):
+        self.client = client
+        self.portfolio = portfolio
+        self.journal = journal
+        # optional risk_engine.PreTradeRiskEngine; the batch is checked before submission,
+        # under its lock so a refresh running in a worker thread finishes first
+        self.risk = risk
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv('EXECUTION_MAX_CONCURRENCY', 10))
+        self.max_concurrency = max_concurrency
+
+    async def positions(self) -> Dict[str, float]:
+        """One fresh positions snapshot, indexed by symbol"""
+        if self.portfolio is not None:
+            snapshot = await self.portfolio.snapshot(max_age=0)
+            if self.risk is not None:
+                async with self.risk.lock:
+                    self.risk.sync(snapshot)
+            return index_positions(snapshot["positions"])
+        positions = await self.client.get_positions()
+        return index_positions([getattr(p, '_raw', p) for p in positions or ()])
+
+    async def rebalance(self, signals: Dict[str, str], size: Callable[[str], float], tag: Optional[str] = None,
+                        prices: Optional[Dict[str, float]] = None) -> Dict:
+        """`prices` (symbol -> last price) are used to value orders for the risk check"""
+        held = await self.positions()
+        if self.risk is not None and prices:
+            async with self.risk.lock:
+                self.risk.mark(prices)
+        orders = plan_orders(target_portfolio(signals, held, size), held)
+        return await self.execute(orders, tag=tag)
+
+    async def execute(self, orders: List[Dict], tag: Optional[str] = None) -> Dict:
+        """Risk-check `orders`, then submit every sell concurrently, then every buy"""
+        sem = asyncio.Semaphore(self.max_concurrency)
+        started = time.perf_counter()
+        rejected = []
+        if self.risk is not None and orders:
+            async with self.risk.lock:
+                orders, rejected = self.risk.filter(orders)
+            for order in rejected:
+                logger.warning(f"Risk rejected {order['side']} {order['qty']} {order['symbol']}: {order['reasons']}")
+
+        async def submit(order):
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    placed = await self.client.create_order(symbol=order['symbol'], qty=order['qty'], side=order['side'],
+                                                            type='market', time_in_force='day')
+                    result = dict(order, status='submitted', order=placed)
+                except Exception as e:
+                    logger.error(f"Order {order['side']} {order['qty']} {order['symbol']} failed: {e}")
+                    placed = None
+                    result = dict(order, status='failed', error=str(e))
+                result['latency_ms'] = round((time.perf_counter() - t0) * 1000, 3)
+            if self.journal is not None:
+                extra = {"strategy": tag} if tag else {}
+                await self.journal.record(order_event(order['symbol'], order['qty'], order['side'], placed,
+                                                      status='failed' if placed is None else None, **extra))
+            return result
+
+        results = []
+        for side in ('sell', 'buy'):
+            batch = [o for o in orders if o['side'] == side]
+            if batch:
+                results += await asyncio.gather(*(submit(o) for o in batch))
+        if self.risk is not None:
+            async with self.risk.lock:
+                self.risk.apply([r for r in results if r['status'] == 'submitted'])
+        return self._report(results, rejected, time.perf_counter() - started)
+
+    @staticmethod
+    def _report(results: List[Dict], rejected: List[Dict], elapsed: float) -> Dict:
+        latencies = sorted(r['latency_ms'] for r in results)
+
+        def pct(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+
+        failed = [r for r in results if r['status'] == 'failed']
+        return {
+            "orders": results,
+            "submitted": len(results) - len(failed),
+            "failed": len(failed),
+            "rejected": rejected,
+            "elapsed_s": round(elapsed, 3),
+            "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "max": latencies[-1] if latencies else 0.0},
+        }
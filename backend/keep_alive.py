@@ -1,12 +1,12 @@
 import os
 import asyncio
-import httpx
 
 async def keep_alive():
     url = os.getenv('KEEP_ALIVE_URL')
     interval = int(os.getenv('KEEP_ALIVE_PING_INTERVAL_SECONDS', 600))
     if not url:
         return
+    import httpx
     async with httpx.AsyncClient() as client:
         while True:
             try:
@@ -1,14 +1,18 @@
 import os
 import asyncio
+import importlib
 import logging
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+import json
+import datetime
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-from alpaca_client import AlpacaClient
-from database import init_db
+from alpaca_client import LazyAlpacaClient, create_alpaca_client
 from keep_alive import keep_alive
+from market_calendar import MarketCalendar
+from metrics import REGISTRY, STARTUP, RequestMetricsMiddleware, mark_startup
 from typing import Optional
 import traceback
 
@@ -33,21 +37,132 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in sampling profiler, built on first use; toggled at runtime through /debug/profiler
+profiler = None
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'false').lower() in ('1','true','yes')
+
+def _profiler():
+    global profiler
+    if profiler is None:
+        from profiler import SamplingProfiler
+        profiler = SamplingProfiler(
+            interval=float(os.getenv('PROFILER_INTERVAL_MS', 5)) / 1000,
+            slow_threshold=float(os.getenv('PROFILER_SLOW_MS', 500)) / 1000
+        )
+    return profiler
+
+# Per-route latency histograms for /metrics (outermost, so it times CORS too)
+app.add_middleware(RequestMetricsMiddleware, router=app.router, profiler=lambda: profiler)
+
 PAPER_MODE = os.getenv('PAPER_MODE', 'true').lower() in ('1','true','yes')
 ALPACA_BASE = os.getenv('ALPACA_BASE_URL')
+ALPACA_TRANSPORT = os.getenv('ALPACA_TRANSPORT', 'rest').lower()
+MARKET_STREAM_ENABLED = os.getenv('MARKET_STREAM_ENABLED', 'false').lower() in ('1','true','yes')
+MARKET_STREAM_SYMBOLS = [s.strip().upper() for s in os.getenv('MARKET_STREAM_SYMBOLS', 'SPY,QQQ,IWM,AAPL,MSFT,GOOGL').split(',') if s.strip()]
+MARKET_STREAM_BUFFER_SIZE = int(os.getenv('MARKET_STREAM_BUFFER_SIZE', 1024))
+ORDER_JOURNAL_BATCH_SIZE = int(os.getenv('ORDER_JOURNAL_BATCH_SIZE', 500))
+ORDER_JOURNAL_FLUSH_SECONDS = float(os.getenv('ORDER_JOURNAL_FLUSH_SECONDS', 0.5))
+PRETRADE_RISK_ENABLED = os.getenv('PRETRADE_RISK_ENABLED', 'true').lower() in ('1','true','yes')
+TRADE_UPDATES_ENABLED = os.getenv('TRADE_UPDATES_ENABLED', 'false').lower() in ('1','true','yes')
+# how old a portfolio snapshot /create_order's risk check may use before fetching a fresh one
+RISK_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv('RISK_SNAPSHOT_MAX_AGE_SECONDS', 10.0))
+# daily closes per symbol the risk covariance is warmed from (BAR_STORE_DIR)
+RISK_COV_HISTORY = int(os.getenv('RISK_COV_HISTORY', 250))
+# e.g. 'open+5', 'close-15' or 'every:60' (seconds, market hours only); unset disables
+STRATEGY_SCHEDULE = os.getenv('STRATEGY_SCHEDULE', '').strip()
+STRATEGY_OVERLAP = os.getenv('STRATEGY_OVERLAP', 'skip')
+# symbols the scheduled strategy trades: comma-separated, or @path to a file
+# with one per line (default: the strategy's own list)
+STRATEGY_UNIVERSE = os.getenv('STRATEGY_UNIVERSE', '').strip()
+# >0 runs strategies in this many shard worker processes instead of the API event loop
+STRATEGY_WORKERS = int(os.getenv('STRATEGY_WORKERS', 0))
+BAR_STORE_DIR = os.getenv('BAR_STORE_DIR', 'data/bars')
+# Serve requests as soon as possible after a cold start: the broker client is
+# built on first use and warmed in the background, and create_all is skipped
+# while the schema version marker matches
+FAST_START = os.getenv('FAST_START', 'false').lower() in ('1','true','yes')
 
-# Initialize Alpaca client
-try:
-    alpaca = AlpacaClient(
+def _create_alpaca():
+    client = create_alpaca_client(
         api_key=os.getenv('ALPACA_API_KEY'),
         secret_key=os.getenv('ALPACA_SECRET_KEY'),
         base_url=ALPACA_BASE,
-        paper=PAPER_MODE
+        paper=PAPER_MODE,
+        transport=ALPACA_TRANSPORT
+    )
+    logger.info(f"Alpaca client initialized in {'PAPER' if PAPER_MODE else 'LIVE'} mode ({ALPACA_TRANSPORT} transport)")
+    return client
+
+# Initialize Alpaca client
+if FAST_START:
+    alpaca = LazyAlpacaClient(_create_alpaca)
+else:
+    try:
+        alpaca = _create_alpaca()
+    except Exception as e:
+        logger.error(f"Failed to initialize Alpaca client: {e}")
+        alpaca = None
+
+# Account/positions snapshot shared by /portfolio, /health and strategies;
+# invalidated by orders placed through `alpaca` and by streamed fills (built at startup)
+portfolio_state = None
+
+def _build_risk_engine():
+    from risk_engine import PreTradeRiskEngine
+    sectors = {}
+    if os.getenv('RISK_SECTORS_FILE'):
+        with open(os.getenv('RISK_SECTORS_FILE')) as f:
+            sectors = json.load(f)
+    engine = PreTradeRiskEngine(
+        max_gross=float(os.getenv('RISK_MAX_GROSS', 1.0)),
+        max_net=float(os.getenv('RISK_MAX_NET', 1.0)),
+        max_position_pct=float(os.getenv('RISK_MAX_POSITION_PCT', 0.2)),
+        max_sector_pct=float(os.getenv('RISK_MAX_SECTOR_PCT', 0.4)),
+        max_var_pct=float(os.getenv('RISK_MAX_VAR_PCT', 0.03)),
+        sectors=sectors,
+        # without fill/cancel events, a snapshot fetched after an order stands for its fill
+        settle_on_snapshot=not TRADE_UPDATES_ENABLED,
     )
-    logger.info(f"Alpaca client initialized in {'PAPER' if PAPER_MODE else 'LIVE'} mode")
-except Exception as e:
-    logger.error(f"Failed to initialize Alpaca client: {e}")
-    alpaca = None
+    return engine
+
+async def _load_risk_engine():
+    """Build the risk engine (and import NumPy) off the event loop, then warm its covariance from the bar store"""
+    global risk_engine
+    try:
+        engine = await asyncio.to_thread(_build_risk_engine)
+    except Exception as e:
+        logger.error(f"Building the pre-trade risk engine failed: {e}")
+        raise
+    risk_engine = engine
+    if os.path.isdir(BAR_STORE_DIR):
+        from bar_store import BarStore
+        try:
+            await engine.refresh_in_thread(BarStore(BAR_STORE_DIR), history=RISK_COV_HISTORY)
+            logger.info(f"Risk covariance warmed from {BAR_STORE_DIR}")
+        except Exception as e:
+            logger.error(f"Warming the risk covariance from {BAR_STORE_DIR} failed: {e}")
+
+# Pre-trade limits checked inline in /create_order; built and warmed by
+# risk_ready, which /create_order waits on
+risk_engine = None
+risk_ready = None
+
+# Streamed market data (filled by the ingest task when MARKET_STREAM_ENABLED)
+tick_store = None
+market_stream = None
+background_tasks = []
+
+# Orders are persisted off the request path in batches (built at startup)
+order_journal = None
+
+# Local exchange calendar for /health; the scheduler is only imported when used
+market_calendar = MarketCalendar()
+scheduler = None
+strategy_runner = None
+# set once the broker client is built and the first portfolio snapshot is in
+broker_warm = not FAST_START
+# FAST_START's background schema check; endpoints reading the database wait on it
+db_ready = None
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -60,15 +175,167 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 @app.on_event("startup")
 async def startup_event():
+    global db_ready, risk_ready, portfolio_state, order_journal
+    from order_journal import OrderJournal
+    from portfolio_state import PortfolioState
+    if alpaca is not None:
+        portfolio_state = PortfolioState.shared(alpaca)
+    order_journal = OrderJournal(batch_size=ORDER_JOURNAL_BATCH_SIZE, flush_interval=ORDER_JOURNAL_FLUSH_SECONDS)
+    if PRETRADE_RISK_ENABLED:
+        risk_ready = asyncio.create_task(_load_risk_engine())
+        background_tasks.append(risk_ready)
     try:
-        await init_db()
-        logger.info("Database initialized successfully")
+        if FAST_START:
+            # orders queue in the journal until the schema check finishes
+            db_ready = asyncio.create_task(_init_db(skip_if_current=True))
+            background_tasks.append(db_ready)
+            order_journal.start(ready=db_ready)
+            background_tasks.append(asyncio.create_task(_warm_broker()))
+        else:
+            await _init_db()
+            order_journal.start()
+            if risk_ready is not None:
+                await asyncio.wait([risk_ready])
+            mark_startup("broker_warm")
         
         # start keep-alive in background if configured
         task = asyncio.create_task(_start_keep_alive())
         logger.info("Keep-alive service started")
     except Exception as e:
         logger.error(f"Startup error: {e}")
+    
+    if MARKET_STREAM_ENABLED and alpaca is not None:
+        background_tasks.append(asyncio.create_task(_run_market_stream()))
+    if TRADE_UPDATES_ENABLED and portfolio_state is not None:
+        portfolio_state.add_trade_listener(_journal_fill)
+        if PRETRADE_RISK_ENABLED:
+            portfolio_state.add_trade_listener(_settle_risk_booking)
+        background_tasks.append(asyncio.create_task(portfolio_state.run_trade_updates()))
+        logger.info("Trade updates stream started")
+    if STRATEGY_SCHEDULE and alpaca is not None:
+        background_tasks.append(asyncio.create_task(_start_strategy_schedule()))
+    if PROFILER_ENABLED:
+        _profiler().start()
+    mark_startup("app_ready")
+    logger.info(f"Startup complete {STARTUP['app_ready']}s after process start")
+
+async def _journal_fill(msg):
+    """Journal executions from the trade_updates stream; the order summaries are rolled up from these"""
+    from order_journal import fill_event
+    event = fill_event(msg)
+    if event is not None:
+        await order_journal.record(event)
+
+async def _settle_risk_booking(msg):
+    # nothing is booked before the engine is built
+    if risk_engine is not None:
+        async with risk_engine.lock:
+            risk_engine.on_trade_update(msg)
+
+async def _init_db(skip_if_current: bool = False):
+    from database import init_db
+    created = await init_db(skip_if_current=skip_if_current)
+    logger.info("Database initialized successfully" if created else "Database schema is current, skipped create_all")
+
+async def _database():
+    """The database module once the schema is ready; 503 if the FAST_START schema check failed"""
+    if db_ready is not None:
+        if not db_ready.done():
+            await asyncio.wait([db_ready])
+        if db_ready.cancelled() or db_ready.exception() is not None:
+            raise HTTPException(status_code=503, detail="Database not ready")
+    import database
+    return database
+
+async def _risk_engine():
+    """The pre-trade risk engine once built and warmed, None if disabled; 503 if building it failed"""
+    if risk_ready is None:
+        return None
+    if not risk_ready.done():
+        await asyncio.wait([risk_ready])
+    if risk_ready.cancelled() or risk_ready.exception() is not None:
+        raise HTTPException(status_code=503, detail="Pre-trade risk engine not ready")
+    return risk_engine
+
+async def _warm_broker():
+    """FAST_START: build the client off the event loop, then prime the portfolio snapshot"""
+    global broker_warm
+    try:
+        await asyncio.to_thread(alpaca.get)
+        await portfolio_state.snapshot()
+        mark_startup("broker_warm")
+        logger.info(f"Broker connection warm {STARTUP['broker_warm']}s after process start")
+    except Exception as e:
+        logger.error(f"Broker warm-up failed: {e}")
+    finally:
+        # from here /health checks the broker itself and reports any failure
+        broker_warm = True
+
+def _strategy_universe():
+    if STRATEGY_UNIVERSE.startswith('@'):
+        with open(STRATEGY_UNIVERSE[1:]) as f:
+            symbols = [line.strip().upper() for line in f]
+    else:
+        symbols = [s.strip().upper() for s in STRATEGY_UNIVERSE.split(',')]
+    return [s for s in symbols if s and not s.startswith('#')]
+
+async def _start_strategy_schedule():
+    global scheduler, strategy_runner
+    # strategies share the pre-trade risk engine, so wait for it to be built
+    if risk_ready is not None:
+        await asyncio.wait([risk_ready])
+    try:
+        import scheduler
+        from example_momentum_strategy import MomentumStrategy
+        universe = _strategy_universe() or list(MomentumStrategy.DEFAULT_SYMBOLS)
+        bar_store_root = BAR_STORE_DIR if os.path.isdir(BAR_STORE_DIR) else None
+        if STRATEGY_WORKERS > 0:
+            from strategy_runner import StrategyRunner
+            strategy_runner = StrategyRunner(alpaca, {'momentum': MomentumStrategy}, universe, workers=STRATEGY_WORKERS,
+                                             bar_store_root=bar_store_root, portfolio=portfolio_state,
+                                             journal=order_journal, risk=risk_engine)
+            background_tasks.append(asyncio.create_task(strategy_runner.start()))
+            job = strategy_runner.tick
+        else:
+            from bar_store import BarStore
+            strategy = MomentumStrategy(alpaca, bar_store=BarStore(bar_store_root) if bar_store_root else None,
+                                        journal=order_journal, portfolio=portfolio_state, risk_engine=risk_engine)
+            strategy.symbols = universe
+            job = strategy.execute_strategy
+        scheduler.add_session_job(job, STRATEGY_SCHEDULE, name='momentum', overlap=STRATEGY_OVERLAP)
+        scheduler.start_scheduler()
+    except Exception as e:
+        logger.error(f"Starting the strategy schedule failed: {e}")
+
+async def _run_market_stream():
+    """Import the stream (and NumPy) off the event loop, then ingest until cancelled"""
+    global market_stream, tick_store
+    stream = await asyncio.to_thread(importlib.import_module, 'market_stream')
+    tick_store = stream.TickStore(capacity=MARKET_STREAM_BUFFER_SIZE)
+    market_stream = stream.MarketDataStream(
+        api_key=os.getenv('ALPACA_API_KEY'),
+        secret_key=os.getenv('ALPACA_SECRET_KEY'),
+        symbols=MARKET_STREAM_SYMBOLS,
+        store=tick_store
+    )
+    alpaca.tick_store = tick_store
+    logger.info(f"Market data stream started for {len(MARKET_STREAM_SYMBOLS)} symbols")
+    await market_stream.run()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    if scheduler is not None:
+        scheduler.stop_scheduler()
+    if strategy_runner is not None:
+        await strategy_runner.stop()
+    if profiler is not None:
+        profiler.stop()
+    if order_journal is not None:
+        await order_journal.stop()
+    if alpaca is not None:
+        await alpaca.close()
 
 async def _start_keep_alive():
     try:
@@ -82,14 +349,27 @@ async def health():
     try:
         if alpaca is None:
             return {"status": "error", "message": "Alpaca client not initialized", "paper_mode": PAPER_MODE}
+        if not broker_warm:
+            # FAST_START: answer the host's probe without waiting on the broker
+            return {"status": "warming", "paper_mode": PAPER_MODE, "startup": STARTUP}
         
-        # Test Alpaca connection
-        account = await alpaca.get_account()
+        # Test Alpaca connection (served from the portfolio snapshot)
+        account = await portfolio_state.account()
         return {
             "status": "ok", 
             "paper_mode": PAPER_MODE,
             "alpaca_connected": True,
-            "account_status": account.get('status', 'unknown') if account else 'unknown'
+            "account_status": account.get('status', 'unknown') if account else 'unknown',
+            "quote_cache": alpaca.quote_cache_stats(),
+            "limits": alpaca.limiter_stats(),
+            "market_stream": market_stream.stats() if market_stream else None,
+            "order_journal": order_journal.stats() if order_journal else None,
+            "portfolio_cache": portfolio_state.stats(),
+            "risk": risk_engine.stats() if risk_engine else None,
+            "market": market_calendar.status(),
+            "scheduler": scheduler.job_stats() if scheduler is not None else {},
+            "strategy_runner": strategy_runner.stats() if strategy_runner is not None else None,
+            "startup": STARTUP
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -100,6 +380,53 @@ async def health():
             "error": str(e)
         }
 
+def _collect_state():
+    """Gauges/counters read from components that keep their own stats"""
+    if order_journal is not None:
+        journal = order_journal.stats()
+        yield "order_journal_queued", "gauge", "Order events waiting to be written", {}, journal["queued"]
+        yield "order_journal_written_total", "counter", "Order events written", {}, journal["written"]
+        yield "order_journal_dropped_total", "counter", "Order events dropped after failed flushes", {}, journal["dropped"]
+    if alpaca is not None and getattr(alpaca, 'built', True):
+        cache = alpaca.quote_cache_stats()
+        for result in ('hits', 'misses', 'coalesced'):
+            yield "quote_cache_lookups_total", "counter", "Quote cache lookups by result", {"result": result}, cache[result]
+        yield "quote_cache_entries", "gauge", "Quotes held in the cache", {}, cache["entries"]
+        limits = alpaca.limiter_stats()
+        executor = limits["executor"]
+        yield "alpaca_executor_in_use", "gauge", "Upstream concurrency slots in use", {}, executor["in_use"]
+        yield "alpaca_executor_queued", "gauge", "Calls waiting for an upstream concurrency slot", {}, executor["queued"]
+        yield "alpaca_rate_limit_tokens", "gauge", "Rate-limit tokens available", {}, limits["rate_limit"]["tokens"]
+        yield "alpaca_rate_limit_queued", "gauge", "Calls waiting for a rate-limit token", {}, limits["rate_limit"]["queued"]
+    if portfolio_state is not None:
+        cache = portfolio_state.stats()
+        yield "portfolio_cache_fetches_total", "counter", "Account/positions upstream fetches", {}, cache["fetches"]
+        yield "portfolio_cache_hits_total", "counter", "Portfolio snapshot reads served from cache", {}, cache["hits"]
+    if market_stream is not None:
+        yield "market_stream_connected", "gauge", "Market data websocket connected", {}, int(tick_store.live)
+
+REGISTRY.register_collector(_collect_state)
+
+@app.get('/metrics')
+async def metrics():
+    """Prometheus text exposition of the in-process metrics"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+class ProfilerConfig(BaseModel):
+    enabled: Optional[bool] = None
+    interval_ms: Optional[float] = Field(None, gt=0)
+    slow_ms: Optional[float] = Field(None, ge=0)
+
+@app.get('/debug/profiler')
+async def get_profiler():
+    """Profiler state and the collapsed stacks captured for slow requests"""
+    return _profiler().report()
+
+@app.post('/debug/profiler')
+async def configure_profiler(config: ProfilerConfig):
+    """Turn the sampling profiler on/off or retune it without a restart"""
+    return _profiler().configure(config.enabled, config.interval_ms, config.slow_ms)
+
 @app.get('/fetch_quote')
 async def fetch_quote(ticker: str):
     """Fetch latest quote for a ticker"""
@@ -121,16 +448,123 @@ async def fetch_quote(ticker: str):
         logger.error(f"Error fetching quote for {ticker}: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch quote: {str(e)}")
 
+# Upper bound on symbols per /fetch_quotes call
+MAX_QUOTE_TICKERS = 1000
+
+@app.get('/fetch_quotes')
+async def fetch_quotes(tickers: str):
+    """Fetch latest quotes for a comma-separated list of tickers"""
+    symbols = [t.strip().upper() for t in (tickers or '').split(',') if t.strip()]
+    if not symbols:
+        raise HTTPException(status_code=400, detail="At least one ticker symbol is required")
+    if len(symbols) > MAX_QUOTE_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_QUOTE_TICKERS} tickers per request")
+    
+    if alpaca is None:
+        raise HTTPException(status_code=503, detail="Alpaca client not available")
+    
+    try:
+        quotes = await alpaca.get_last_quotes(symbols)
+        missing = [s for s in symbols if s not in quotes]
+        return {"quotes": quotes, "missing": missing}
+    except Exception as e:
+        logger.error(f"Error fetching quotes for {symbols}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch quotes: {str(e)}")
+
+def _symbol_filter(symbols: Optional[str]):
+    return {s.strip().upper() for s in symbols.split(',') if s.strip()} if symbols else None
+
+@app.websocket('/ws/quotes')
+async def quotes_websocket(websocket: WebSocket, symbols: Optional[str] = None):
+    """Push streamed trades/bars to the client (optionally filtered by symbols)"""
+    await websocket.accept()
+    if market_stream is None:
+        await websocket.close(code=1013, reason="Market data stream not enabled")
+        return
+    wanted = _symbol_filter(symbols)
+    queue = market_stream.subscribe()
+
+    async def send_updates():
+        # start the client off with the latest known prices
+        snapshot = tick_store.last_quotes(wanted or tick_store.trades.keys())
+        await websocket.send_json({"type": "snapshot", "quotes": snapshot})
+        while True:
+            update = await queue.get()
+            if wanted is None or update["symbol"] in wanted:
+                await websocket.send_json(update)
+
+    async def watch_disconnect():
+        # the client never sends anything we need, but reading is the only
+        # way to notice it leaving when its symbols rarely trade
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(send_updates()), asyncio.create_task(watch_disconnect())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = None if task.cancelled() else task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.warning(f"Quote websocket closed: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        market_stream.unsubscribe(queue)
+
+@app.get('/stream/quotes')
+async def quotes_sse(request: Request, symbols: Optional[str] = None):
+    """Server-sent events variant of /ws/quotes"""
+    if market_stream is None:
+        raise HTTPException(status_code=503, detail="Market data stream not enabled")
+    wanted = _symbol_filter(symbols)
+    
+    async def events():
+        queue = market_stream.subscribe()
+        try:
+            while not await request.is_disconnected():
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if wanted is None or update["symbol"] in wanted:
+                    yield f"data: {json.dumps(update)}\n\n"
+        finally:
+            market_stream.unsubscribe(queue)
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 class OrderRequest(BaseModel):
     symbol: str = Field(..., min_length=1, max_length=10, description="Stock symbol")
     qty: float = Field(..., gt=0, description="Quantity to trade")
     side: str = Field(..., regex="^(buy|sell)$", description="Order side: buy or sell")
     type: str = Field("market", regex="^(market|limit)$", description="Order type")
     time_in_force: str = Field("day", regex="^(day|gtc|ioc|fok)$", description="Time in force")
+    limit_price: Optional[float] = Field(None, gt=0, description="Limit price (limit orders only)")
+
+async def _pre_trade_check(symbol: str, qty: float, side: str):
+    """Reject the order (400) if it breaches a pre-trade risk limit"""
+    # a recent snapshot is enough: orders placed since are already booked in the engine
+    snapshot = (portfolio_state.peek(max_age=RISK_SNAPSHOT_MAX_AGE_SECONDS)
+                or await portfolio_state.snapshot(max_age=RISK_SNAPSHOT_MAX_AGE_SECONDS))
+    async with risk_engine.lock:
+        risk_engine.sync(snapshot)
+        price = risk_engine.price(symbol)
+    if price is None:
+        quote = await alpaca.get_last_quote(symbol)
+        price = quote['price'] if quote else None
+    async with risk_engine.lock:
+        verdict = risk_engine.check([{"symbol": symbol, "side": side, "qty": qty, "price": price}])
+    if verdict["rejected"]:
+        reasons = verdict["rejected"][0]["reasons"]
+        logger.warning(f"Pre-trade risk rejected {side} {qty} {symbol}: {reasons}")
+        raise HTTPException(status_code=400, detail=f"Order rejected by pre-trade risk checks: {', '.join(reasons)}")
 
 @app.post('/create_order')
 async def create_order(req: OrderRequest):
     """Create a new order"""
+    from order_journal import order_event
     if alpaca is None:
         raise HTTPException(status_code=503, detail="Alpaca client not available")
     
@@ -148,6 +582,12 @@ async def create_order(req: OrderRequest):
         if req.side.lower() not in ['buy', 'sell']:
             raise HTTPException(status_code=400, detail="Side must be 'buy' or 'sell'")
         
+        if (req.type == 'limit') != (req.limit_price is not None):
+            raise HTTPException(status_code=400, detail="limit_price is required for limit orders and only allowed for them")
+        
+        if await _risk_engine() is not None:
+            await _pre_trade_check(symbol, req.qty, req.side.lower())
+        
         logger.info(f"Creating {req.side} order: {req.qty} {symbol}")
         
         order = await alpaca.create_order(
@@ -155,16 +595,22 @@ async def create_order(req: OrderRequest):
             qty=req.qty, 
             side=req.side.lower(), 
             type=req.type, 
-            time_in_force=req.time_in_force
+            time_in_force=req.time_in_force,
+            limit_price=req.limit_price
         )
         
         logger.info(f"Order created successfully: {order}")
+        if risk_engine is not None:
+            async with risk_engine.lock:
+                risk_engine.apply([{"symbol": symbol, "side": req.side.lower(), "qty": req.qty, "order": order}])
+        await order_journal.record(order_event(symbol, req.qty, req.side.lower(), order))
         return {"status": "ok", "order": order}
         
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error creating order: {e}")
+        await order_journal.record(order_event(req.symbol.strip().upper(), req.qty, req.side.lower(), status='failed', error=str(e)))
         raise HTTPException(status_code=500, detail=f"Failed to create order: {str(e)}")
 
 @app.get('/portfolio')
@@ -174,18 +620,58 @@ async def portfolio():
         raise HTTPException(status_code=503, detail="Alpaca client not available")
     
     try:
-        account = await alpaca.get_account()
-        positions = await alpaca.get_positions()
+        snapshot = await portfolio_state.snapshot()
         
         return {
-            "account": account, 
-            "positions": positions,
-            "paper_mode": PAPER_MODE
+            "account": snapshot["account"], 
+            "positions": snapshot["positions"],
+            "paper_mode": PAPER_MODE,
+            "age_seconds": round(snapshot["age"], 3)
         }
     except Exception as e:
         logger.error(f"Error fetching portfolio: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch portfolio: {str(e)}")
 
+@app.get('/orders')
+async def list_orders(limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None,
+                      symbol: Optional[str] = None, side: Optional[str] = Query(None, regex='^(buy|sell)$'),
+                      fields: Optional[str] = None, order: str = Query('desc', regex='^(asc|desc)$')):
+    """
+    Journaled orders, newest first, one page at a time. Pass the returned
+    next_cursor to get the following page; `fields` is a comma-separated
+    subset of the order columns (default: all but the raw broker payload).
+    """
+    database = await _database()
+    columns = [f.strip() for f in fields.split(',') if f.strip()] if fields else database.DEFAULT_ORDER_FIELDS
+    try:
+        return await database.list_orders(limit=limit, cursor=cursor, symbol=symbol.strip().upper() if symbol else None,
+                                          side=side, fields=columns, ascending=order == 'asc')
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get('/orders/summary')
+async def orders_summary(start: Optional[datetime.date] = None, end: Optional[datetime.date] = None,
+                         symbol: Optional[str] = None, limit: int = Query(1000, ge=1, le=10000),
+                         cursor: Optional[str] = None):
+    """
+    Daily per-symbol filled volume, notional, realized P&L and fill counts
+    (default: the last 30 days), one page of days at a time, with per-symbol
+    totals over the whole range
+    """
+    database = await _database()
+    end = end or datetime.datetime.utcnow().date()
+    start = start or end - datetime.timedelta(days=30)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    symbol = symbol.strip().upper() if symbol else None
+    try:
+        page = await database.daily_rollups(start, end, symbol=symbol, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # totals cover the whole range, not just this page of days
+    totals = await database.rollup_totals(start, end, symbol=symbol)
+    return {"start": start, "end": end, "days": page["days"], "next_cursor": page["next_cursor"], "totals": totals}
+
 @app.get('/')
 async def root():
     """Root endpoint with API information"""
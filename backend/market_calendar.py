@@ -0,0 +1,138 @@
+"""
+Local NYSE trading calendar.
+
+Holidays and early closes are computed from the exchange's rules (observed
+dates, Good Friday from Easter, Juneteenth from 2022), so sessions can be
+looked up without calling the broker. Times are timezone-aware in
+America/New_York; pass `holidays`/`early_closes` to override specific dates
+(e.g. an unscheduled closure).
+"""
+
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+EXCHANGE_TZ = ZoneInfo('America/New_York')
+REGULAR_OPEN = time(9, 30)
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th `weekday` (Mon=0) of the month; n=-1 for the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = (date(year, month + 1, 1) if month < 12 else date(year + 1, 1, 1)) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day: date) -> date:
+    """Saturday holidays are observed on Friday, Sunday holidays on Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=64)
+def nyse_holidays(year: int) -> Dict[date, str]:
+    holidays = {
+        _nth_weekday(year, 1, 0, 3): "Martin Luther King Jr. Day",
+        _nth_weekday(year, 2, 0, 3): "Washington's Birthday",
+        _easter(year) - timedelta(days=2): "Good Friday",
+        _nth_weekday(year, 5, 0, -1): "Memorial Day",
+        _observed(date(year, 7, 4)): "Independence Day",
+        _nth_weekday(year, 9, 0, 1): "Labor Day",
+        _nth_weekday(year, 11, 3, 4): "Thanksgiving Day",
+        _observed(date(year, 12, 25)): "Christmas Day",
+    }
+    # a Saturday New Year's Day is not observed on the Friday before
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays[_observed(new_year)] = "New Year's Day"
+    if year >= 2022:
+        holidays[_observed(date(year, 6, 19))] = "Juneteenth"
+    return holidays
+
+
+@lru_cache(maxsize=64)
+def nyse_early_closes(year: int) -> Dict[date, time]:
+    """13:00 closes: July 3rd, the day after Thanksgiving and Christmas Eve, when they are sessions"""
+    holidays = nyse_holidays(year)
+    candidates = [
+        date(year, 7, 3),
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1),
+        date(year, 12, 24),
+    ]
+    return {d: EARLY_CLOSE for d in candidates if d.weekday() < 5 and d not in holidays}
+
+
+class MarketCalendar:
+    def __init__(self, holidays: Iterable[date] = (), early_closes: Optional[Dict[date, time]] = None,
+                 tz: ZoneInfo = EXCHANGE_TZ):
+        self.tz = tz
+        self.extra_holidays = set(holidays)
+        self.extra_early_closes = dict(early_closes or {})
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in nyse_holidays(day.year) and day not in self.extra_holidays
+
+    def session(self, day: date) -> Optional[Tuple[datetime, datetime]]:
+        """(open, close) for `day`, or None when the market is closed all day"""
+        if not self.is_trading_day(day):
+            return None
+        close = self.extra_early_closes.get(day) or nyse_early_closes(day.year).get(day, REGULAR_CLOSE)
+        return (datetime.combine(day, REGULAR_OPEN, self.tz), datetime.combine(day, close, self.tz))
+
+    def sessions(self, start: date, end: date) -> List[Tuple[datetime, datetime]]:
+        """Every session from `start` to `end` inclusive"""
+        days = (start + timedelta(days=i) for i in range((end - start).days + 1))
+        return [s for s in map(self.session, days) if s is not None]
+
+    def now(self) -> datetime:
+        return datetime.now(self.tz)
+
+    def is_open(self, at: Optional[datetime] = None) -> bool:
+        at = (at or self.now()).astimezone(self.tz)
+        session = self.session(at.date())
+        return session is not None and session[0] <= at < session[1]
+
+    def next_session(self, after: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+        """The session in progress at `after`, else the next one to open"""
+        after = (after or self.now()).astimezone(self.tz)
+        day = after.date()
+        # the longest NYSE closure on record is well under a month
+        for _ in range(30):
+            session = self.session(day)
+            if session is not None and session[1] > after:
+                return session
+            day += timedelta(days=1)
+        raise ValueError(f"no trading session within 30 days of {after}")
+
+    def status(self, at: Optional[datetime] = None) -> Dict:
+        at = (at or self.now()).astimezone(self.tz)
+        opens, closes = self.next_session(at)
+        is_open = opens <= at
+        return {
+            "is_open": is_open,
+            "next_open": None if is_open else opens.isoformat(),
+            "next_close": closes.isoformat(),
+            "early_close": closes.time() != REGULAR_CLOSE,
+        }
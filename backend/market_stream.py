@@ -0,0 +1,233 @@
+"""
+Streaming market-data ingest.
+
+A background task subscribes to Alpaca's real-time trade/bar websocket and
+keeps the last N ticks and bars per symbol in fixed-size, array-backed ring
+buffers. Readers (/fetch_quote, strategies via AlpacaClient) get the latest
+price from memory with no network call, as long as the last trade is no
+older than `quote_max_age`, and every update is fanned out to WebSocket/SSE
+subscribers through bounded per-client queues.
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TRADE_FIELDS = ('price', 'size')
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+DEFAULT_STREAM_URL = 'wss://stream.data.alpaca.markets/v2/iex'
+
+
+def parse_timestamp(value) -> float:
+    """RFC 3339 timestamp (nanosecond precision allowed) -> epoch seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = value.replace('Z', '+00:00')
+    # datetime only understands microseconds; trim longer fractions
+    if '.' in text:
+        head, _, rest = text.partition('.')
+        digits = len(rest) - len(rest.lstrip('0123456789'))
+        text = f"{head}.{rest[:min(digits, 6)]}{rest[digits:]}"
+    return datetime.datetime.fromisoformat(text).timestamp()
+
+
+class RingBuffer:
+    """Last `capacity` rows of float fields plus an epoch-seconds column"""
+
+    def __init__(self, capacity: int, fields: Iterable[str]):
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, len(self.fields)), dtype=np.float64)
+        self.count = 0  # total rows ever appended
+
+    def append(self, ts: float, row):
+        i = self.count % self.capacity
+        self.ts[i] = ts
+        self.values[i] = row
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def latest(self) -> Optional[np.ndarray]:
+        if not self.count:
+            return None
+        return self.values[(self.count - 1) % self.capacity]
+
+    def latest_ts(self) -> float:
+        return self.ts[(self.count - 1) % self.capacity] if self.count else 0.0
+
+    def last(self, n: Optional[int] = None):
+        """Oldest-to-newest (ts, values) for the last n rows (a view when it doesn't wrap)"""
+        n = len(self) if n is None else min(n, len(self))
+        end = self.count % self.capacity or (self.capacity if self.count else 0)
+        start = end - n
+        if start >= 0:
+            return self.ts[start:end], self.values[start:end]
+        idx = np.arange(start, end) % self.capacity
+        return self.ts[idx], self.values[idx]
+
+    def column(self, field: str, n: Optional[int] = None) -> np.ndarray:
+        return self.last(n)[1][:, self.fields.index(field)]
+
+
+class TickStore:
+    """Per-symbol trade and bar ring buffers"""
+
+    def __init__(self, capacity: int = 1024, bar_capacity: Optional[int] = None,
+                 quote_max_age: Optional[float] = None, clock=time.time):
+        self.capacity = capacity
+        self.bar_capacity = bar_capacity or capacity
+        # older last trades are not served as quotes (AlpacaClient fetches instead)
+        if quote_max_age is None:
+            quote_max_age = float(os.getenv('STREAM_QUOTE_MAX_AGE_SECONDS', 5.0))
+        self.quote_max_age = quote_max_age
+        self._clock = clock
+        self.trades: Dict[str, RingBuffer] = {}
+        self.bars: Dict[str, RingBuffer] = {}
+        # set by the stream while it is connected and subscribed
+        self.live = False
+
+    def update_trade(self, symbol: str, ts: float, price: float, size: float = 0.0):
+        buf = self.trades.get(symbol)
+        if buf is None:
+            buf = self.trades[symbol] = RingBuffer(self.capacity, TRADE_FIELDS)
+        buf.append(ts, (price, size))
+
+    def update_bar(self, symbol: str, ts: float, o: float, h: float, l: float, c: float, v: float):
+        buf = self.bars.get(symbol)
+        if buf is None:
+            buf = self.bars[symbol] = RingBuffer(self.bar_capacity, BAR_FIELDS)
+        buf.append(ts, (o, h, l, c, v))
+
+    def last_quote(self, symbol: str, max_age: Optional[float] = None) -> Optional[Dict]:
+        """Latest trade in the same shape as AlpacaClient.get_last_quote; None if older than `max_age` seconds"""
+        buf = self.trades.get(symbol)
+        if buf is None or not buf.count:
+            return None
+        ts = buf.latest_ts()
+        if max_age is not None and self._clock() - ts > max_age:
+            return None
+        return {
+            "symbol": symbol,
+            "price": float(buf.latest()[0]),
+            "timestamp": datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat(),
+            "source": "stream",
+        }
+
+    def last_quotes(self, symbols: Iterable[str], max_age: Optional[float] = None) -> Dict[str, Dict]:
+        quotes = {}
+        for symbol in symbols:
+            quote = self.last_quote(symbol, max_age)
+            if quote is not None:
+                quotes[symbol] = quote
+        return quotes
+
+    def closes(self, symbol: str, n: Optional[int] = None) -> np.ndarray:
+        buf = self.bars.get(symbol)
+        return buf.column('close', n) if buf is not None else np.empty(0)
+
+
+class MarketDataStream:
+    def __init__(self, api_key: str, secret_key: str, symbols: List[str], store: TickStore,
+                 url: Optional[str] = None, subscriber_queue_size: int = 1000):
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.symbols = list(symbols)
+        self.store = store
+        self.url = url or os.getenv('ALPACA_STREAM_URL', DEFAULT_STREAM_URL)
+        self.subscriber_queue_size = subscriber_queue_size
+        self._subscribers = set()
+        self.messages = 0
+        self.dropped = 0
+        self.reconnects = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.subscriber_queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def _publish(self, update: Dict):
+        for queue in self._subscribers:
+            if queue.full():
+                # slow client: drop its oldest update rather than block ingest
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(update)
+
+    def handle_message(self, msg: Dict):
+        kind = msg.get('T')
+        if kind == 't':
+            ts = parse_timestamp(msg['t'])
+            self.store.update_trade(msg['S'], ts, float(msg['p']), float(msg.get('s', 0)))
+            self._publish({"type": "trade", "symbol": msg['S'], "price": float(msg['p']),
+                           "size": msg.get('s', 0), "timestamp": msg['t']})
+        elif kind in ('b', 'u'):
+            ts = parse_timestamp(msg['t'])
+            self.store.update_bar(msg['S'], ts, float(msg['o']), float(msg['h']), float(msg['l']),
+                                  float(msg['c']), float(msg['v']))
+            self._publish({"type": "bar", "symbol": msg['S'], "open": msg['o'], "high": msg['h'],
+                           "low": msg['l'], "close": msg['c'], "volume": msg['v'], "timestamp": msg['t']})
+        elif kind == 'error':
+            logger.error(f"Market stream error {msg.get('code')}: {msg.get('msg')}")
+        else:
+            return
+        self.messages += 1
+
+    async def _session(self, websockets):
+        async with websockets.connect(self.url, max_size=None) as ws:
+            await ws.send(json.dumps({"action": "auth", "key": self.api_key, "secret": self.secret_key}))
+            while True:
+                reply = json.loads(await ws.recv())
+                if any(m.get('T') == 'error' for m in reply):
+                    raise ConnectionError(f"stream authentication failed: {reply}")
+                if any(m.get('msg') == 'authenticated' for m in reply):
+                    break
+            await ws.send(json.dumps({"action": "subscribe", "trades": self.symbols, "bars": self.symbols}))
+            async for raw in ws:
+                for msg in json.loads(raw):
+                    if msg.get('T') == 'subscription':
+                        self.store.live = True
+                        logger.info(f"Market stream subscribed to {len(self.symbols)} symbols")
+                    else:
+                        self.handle_message(msg)
+
+    async def run(self, max_backoff: float = 30.0):
+        """Connect, subscribe and ingest forever, reconnecting with backoff"""
+        import websockets
+        backoff = 1.0
+        while True:
+            try:
+                await self._session(websockets)
+                backoff = 1.0
+            except asyncio.CancelledError:
+                self.store.live = False
+                raise
+            except Exception as e:
+                logger.error(f"Market stream disconnected: {e}")
+            self.store.live = False
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+
+    def stats(self) -> Dict:
+        return {
+            "live": self.store.live,
+            "symbols": len(self.symbols),
+            "messages": self.messages,
+            "subscribers": len(self._subscribers),
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+        }
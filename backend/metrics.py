@@ -0,0 +1,263 @@
+"""
+Lightweight in-process metrics.
+
+Fixed-bucket histograms and counters: observing is a bisect and a few
+additions, so they can sit on hot paths. Metrics are grouped into labelled
+families on a Registry, which renders them (plus any registered collector
+callbacks) in the Prometheus text format served at /metrics.
+"""
+
+import bisect
+import math
+import os
+import time
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+# seconds; covers sub-millisecond calls up to minute-long jobs
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # one count per bucket upper bound, plus the +Inf overflow
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation (the max for the overflow bucket)"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf"""
+        total = 0
+        for bound, n in zip(self.buckets + (math.inf,), self.counts):
+            total += n
+            yield bound, total
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": round(self.max, 6),
+        }
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class _Family:
+    """One metric name with a child per label-value tuple"""
+
+    def __init__(self, kind: str, name: str, help: str, labelnames: Sequence[str], factory: Callable):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self.children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values, **kwargs):
+        key = tuple(str(v) for v in values) if values else tuple(str(kwargs[n]) for n in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = self._factory()
+        return child
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self.families: Dict[str, _Family] = {}
+        # callables yielding (name, kind, help, {labels}, value) for state owned elsewhere
+        self.collectors = []
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> _Family:
+        return self._family('histogram', name, help, labelnames, lambda: Histogram(buckets))
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> _Family:
+        return self._family('counter', name, help, labelnames, Counter)
+
+    def _family(self, kind, name, help, labelnames, factory) -> _Family:
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = _Family(kind, name, help, labelnames, factory)
+        return family
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Dict, float]]]):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for family in self.families.values():
+            if not family.children:
+                continue
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, child in family.children.items():
+                if family.kind == 'counter':
+                    lines.append(f"{family.name}{_format_labels(family.labelnames, values)} {_number(child.value)}")
+                    continue
+                for bound, count in child.cumulative():
+                    le = 'le="' + _number(bound) + '"'
+                    lines.append(f"{family.name}_bucket{_format_labels(family.labelnames, values, le)} {count}")
+                labels = _format_labels(family.labelnames, values)
+                lines.append(f"{family.name}_sum{labels} {_number(child.sum)}")
+                lines.append(f"{family.name}_count{labels} {child.count}")
+        described = set()
+        for collector in self.collectors:
+            for name, kind, help, labels, value in collector():
+                if value is None:
+                    continue
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {help}")
+                    lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def process_start_time() -> float:
+    """Wall-clock start of this process from /proc on Linux, else the first import of this module"""
+    try:
+        with open('/proc/self/stat') as f:
+            # the command name may contain spaces; fields after it are fixed
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat') as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return boot + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+
+# seconds from process start to each startup milestone (None until reached)
+STARTUP = {"process_start": process_start_time(), "app_ready": None, "first_response": None, "broker_warm": None}
+
+
+def mark_startup(phase: str):
+    if STARTUP.get(phase) is None:
+        STARTUP[phase] = round(time.time() - STARTUP["process_start"], 4)
+
+
+REGISTRY = Registry()
+
+
+def _collect_startup():
+    for phase, seconds in STARTUP.items():
+        if phase != "process_start":
+            yield "startup_seconds", "gauge", "Seconds from process start to each startup milestone", {"phase": phase}, seconds
+
+
+REGISTRY.register_collector(_collect_startup)
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'API request latency by route', ('method', 'route', 'status'))
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    'alpaca_request_duration_seconds', 'Alpaca upstream call latency, excluding throttling waits', ('op',))
+UPSTREAM_ERRORS = REGISTRY.counter(
+    'alpaca_request_errors_total', 'Failed Alpaca upstream calls by error', ('op', 'error'))
+LIMITER_WAIT_SECONDS = REGISTRY.histogram(
+    'alpaca_rate_limit_wait_seconds', 'Time spent waiting for a rate-limit token', ('priority',))
+EXECUTOR_WAIT_SECONDS = REGISTRY.histogram(
+    'alpaca_executor_wait_seconds', 'Time spent queued for an upstream concurrency slot', ('priority',))
+JOURNAL_FLUSH_SECONDS = REGISTRY.histogram(
+    'order_journal_flush_seconds', 'Order journal batch write time, including retries')
+JOB_RUN_SECONDS = REGISTRY.histogram(
+    'scheduled_job_duration_seconds', 'Scheduled job run time', ('job',))
+JOB_LAG_SECONDS = REGISTRY.histogram(
+    'scheduled_job_lag_seconds', 'Scheduled job start delay past its fire time', ('job',))
+STRATEGY_TICK_SECONDS = REGISTRY.histogram(
+    'strategy_tick_duration_seconds', 'Strategy execution tick time', ('strategy', 'outcome'))
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request into HTTP_REQUEST_SECONDS,
+    labelled with the route template rather than the raw path. When a
+    profiler.SamplingProfiler is attached and enabled, slow requests are
+    handed to it for capture; `profiler` may also be a callable returning
+    the current one (or None), for a profiler built after the app.
+    """
+
+    def __init__(self, app, router=None, profiler=None):
+        self.app = app
+        self.router = router
+        self.profiler = profiler
+        self._routes: Dict[Callable, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return 'unmatched'
+        route = self._routes.get(endpoint)
+        if route is None and self.router is not None:
+            self._routes = {getattr(r, 'endpoint', None): r.path for r in self.router.routes}
+            route = self._routes.get(endpoint)
+        return route or getattr(endpoint, '__name__', 'unknown')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if STARTUP["first_response"] is None:
+                mark_startup("first_response")
+            elapsed = time.perf_counter() - started
+            route = self._route(scope)
+            HTTP_REQUEST_SECONDS.labels(scope['method'], route, status).observe(elapsed)
+            profiler = self.profiler() if callable(self.profiler) else self.profiler
+            if profiler is not None and profiler.enabled:
+                profiler.request_finished(f"{scope['method']} {route}", started, elapsed)
@@ -0,0 +1,381 @@
+"""
+Write-behind order journal.
+
+Order paths hand events to an in-memory queue and return immediately; a
+background task drains the queue and writes to the `orders` table in
+batches - a multi-row INSERT, or COPY when running on asyncpg and the batch
+is large. A batch is flushed when it reaches `batch_size` rows or
+`flush_interval` seconds after its first row. The bounded queue applies
+backpressure to producers instead of growing without limit, and stop()
+has the writer drain everything that is left before it exits.
+
+Fills from the trade_updates stream (fill_event) go through the same queue
+into `order_fills`. In the same transaction as each batch, the daily
+per-symbol rollups (`order_daily_rollups`) are advanced by the batch's
+fills, so summary views never have to scan history, and count what actually
+traded rather than what was submitted. Realized P&L is booked against a
+running average-cost position per symbol (`order_position_ledger`); the
+journal is the only writer of both tables.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import re
+import time
+from typing import Awaitable, Dict, Iterable, List, Optional, Tuple
+
+from metrics import JOURNAL_FLUSH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+ORDER_COLUMNS = ('symbol', 'qty', 'side', 'status', 'price', 'broker_order_id', 'raw', 'created_at')
+# Below this many rows a multi-row INSERT is as fast as COPY
+COPY_THRESHOLD = 200
+FILL_COLUMNS = ('broker_order_id', 'symbol', 'side', 'qty', 'price', 'created_at')
+MAX_FLUSH_ATTEMPTS = 3
+# trade_updates events that carry an execution
+EXECUTION_EVENTS = frozenset({'fill', 'partial_fill'})
+# queued by stop(): the writer flushes what it holds and exits
+_STOP = object()
+
+
+def order_event(symbol: str, qty: float, side: str, order=None, status: Optional[str] = None,
+                price: Optional[float] = None, **extra) -> Dict:
+    """
+    Build an `orders` row from a broker order (alpaca Entity or dict) and the
+    request that produced it. Timestamped now, not when it reaches the DB.
+    """
+    raw = getattr(order, '_raw', order) or {}
+    if not isinstance(raw, dict):
+        raw = {"repr": str(raw)}
+    if extra:
+        raw = dict(raw, **extra)
+    if price is None and raw.get('filled_avg_price'):
+        price = raw['filled_avg_price']
+    return {
+        "symbol": symbol,
+        "qty": float(qty),
+        "side": side,
+        "status": status or raw.get('status') or 'submitted',
+        "price": float(price) if price is not None else None,
+        "broker_order_id": raw.get('id'),
+        "raw": raw,
+        "created_at": datetime.datetime.utcnow(),
+    }
+
+
+def _parse_timestamp(value) -> datetime.datetime:
+    """Alpaca's RFC 3339 timestamp (nanoseconds, Z) -> naive UTC, like the rest of the journal; now if unparseable"""
+    if isinstance(value, str):
+        # fromisoformat takes at most microseconds and no Z before 3.11
+        text = re.sub(r'(\.\d{6})\d+', r'\1', value.replace('Z', '+00:00'))
+        try:
+            parsed = datetime.datetime.fromisoformat(text)
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+            return parsed
+        except ValueError:
+            pass
+    return datetime.datetime.utcnow()
+
+
+def fill_event(msg: Dict) -> Optional[Dict]:
+    """
+    Build an `order_fills` row from a trade_updates message, or None if it is
+    not a fill. The event's own qty and price are this execution; a final
+    'fill' without them falls back to the order's filled_qty and
+    filled_avg_price, which then cover the whole order.
+    """
+    if msg.get('event') not in EXECUTION_EVENTS:
+        return None
+    order = msg.get('order') or {}
+    qty, price = msg.get('qty'), msg.get('price')
+    if (qty is None or price is None) and msg['event'] == 'fill':
+        qty, price = order.get('filled_qty'), order.get('filled_avg_price')
+    if qty is None or price is None or order.get('side') not in ('buy', 'sell'):
+        logger.warning(f"Trade update without a fill quantity and price, not journaled: {msg}")
+        return None
+    return {
+        "kind": "fill",
+        "broker_order_id": order.get('id'),
+        "symbol": order.get('symbol'),
+        "side": order['side'],
+        "qty": abs(float(qty)),
+        "price": float(price),
+        "created_at": _parse_timestamp(msg.get('timestamp')),
+    }
+
+
+def fold_rollups(fills: Iterable[Dict], ledger: Dict[str, Tuple[float, float]]) -> Dict[Tuple, Dict]:
+    """
+    Fold fill rows (in time order) into {(day, symbol): totals} increments;
+    every fill is one trade. `ledger` ({symbol: (qty, avg_price)}) is
+    updated in place: buys and sells that grow a position move its average
+    price, those that shrink it realize P&L against it.
+    """
+    totals = {}
+    for row in fills:
+        symbol, qty, price = row['symbol'], float(row['qty']), float(row['price'])
+        key = (row['created_at'].date(), symbol)
+        day = totals.get(key)
+        if day is None:
+            day = totals[key] = dict.fromkeys(('trade_count', 'volume', 'buy_volume', 'sell_volume',
+                                               'notional', 'realized_pnl'), 0.0)
+        day['trade_count'] += 1
+        day['volume'] += qty
+        day['buy_volume' if row['side'] == 'buy' else 'sell_volume'] += qty
+        day['notional'] += qty * price
+        signed = qty if row['side'] == 'buy' else -qty
+        pos, avg = ledger.get(symbol, (0.0, 0.0))
+        if pos == 0 or (pos > 0) == (signed > 0):
+            new_pos = pos + signed
+            avg = (pos * avg + signed * price) / new_pos
+        else:
+            closed = min(abs(signed), abs(pos))
+            day['realized_pnl'] += closed * (price - avg) * (1 if pos > 0 else -1)
+            new_pos = pos + signed
+            if new_pos == 0:
+                avg = 0.0
+            elif (new_pos > 0) != (pos > 0):
+                # flipped through flat: the remainder opens at this price
+                avg = price
+        ledger[symbol] = (new_pos, avg)
+    return totals
+
+
+class OrderJournal:
+    def __init__(self, engine=None, batch_size: int = 500, flush_interval: float = 0.5, max_queue: int = 10000):
+        self._engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = None
+        self.max_queue = max_queue
+        self._task = None
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from database import engine
+            self._engine = engine
+        return self._engine
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, ready: Optional[Awaitable] = None):
+        """Start the writer; with `ready` (e.g. schema creation), events queue up until it completes"""
+        if self.running:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(ready))
+
+    async def record(self, event: Dict) -> bool:
+        """Queue an order or fill event; waits only when the queue is full (backpressure)"""
+        if not self.running:
+            return False
+        await self.queue.put(event)
+        return True
+
+    async def stop(self):
+        """
+        Have the writer flush everything queued and exit. It is never
+        cancelled mid-flush, so no batch can be written twice.
+        """
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self.queue.put(_STOP)
+            await self._task
+        self._task = None
+        # events recorded while the writer was finishing up
+        remaining = [e for e in iter(self._get_nowait, None) if e is not _STOP]
+        for i in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[i:i + self.batch_size])
+
+    def _get_nowait(self):
+        try:
+            return self.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+    async def _run(self, ready: Optional[Awaitable] = None):
+        loop = asyncio.get_running_loop()
+        if ready is not None:
+            # wait() rather than await: a cancelled schema check must not end the writer
+            ready = asyncio.ensure_future(ready)
+            await asyncio.wait([ready])
+            if ready.cancelled() or ready.exception() is not None:
+                logger.error(f"Order journal starting without a ready database: "
+                             f"{'cancelled' if ready.cancelled() else ready.exception()}")
+        while True:
+            event = await self.queue.get()
+            if event is _STOP:
+                return
+            batch = [event]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    event = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        event = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, rows: List[Dict]):
+        if not rows:
+            return
+        started = time.perf_counter()
+        for attempt in range(1, MAX_FLUSH_ATTEMPTS + 1):
+            try:
+                await self.write_rows(rows)
+                break
+            except Exception as e:
+                if attempt == MAX_FLUSH_ATTEMPTS:
+                    self.dropped += len(rows)
+                    logger.error(f"Order journal dropped {len(rows)} rows after {attempt} attempts: {e}")
+                    return
+                logger.warning(f"Order journal flush failed (attempt {attempt}): {e}")
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        JOURNAL_FLUSH_SECONDS.labels().observe(time.perf_counter() - started)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.written += len(rows)
+        self.batches += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    async def write_rows(self, rows: List[Dict]):
+        """
+        One round-trip for the order rows (COPY on asyncpg, multi-row INSERT
+        elsewhere), one for the fills and the rollup upserts, all in one
+        transaction
+        """
+        fills = [r for r in rows if r.get('kind') == 'fill']
+        if fills:
+            rows = [r for r in rows if r.get('kind') != 'fill']
+        async with self.engine.begin() as conn:
+            if fills:
+                from database import Fill
+                await conn.execute(Fill.__table__.insert(), [{c: r.get(c) for c in FILL_COLUMNS} for r in fills])
+                await self.update_rollups(conn, fills)
+            if not rows:
+                return
+            if self.engine.dialect.driver == 'asyncpg' and len(rows) >= COPY_THRESHOLD:
+                # the raw connection is inside the transaction begun above
+                raw = await conn.get_raw_connection()
+                records = [
+                    tuple(json.dumps(r[c], default=str) if c == 'raw' else r.get(c) for c in ORDER_COLUMNS)
+                    for r in rows
+                ]
+                await raw.driver_connection.copy_records_to_table('orders', records=records, columns=ORDER_COLUMNS)
+                return
+            from database import Order
+            await conn.execute(Order.__table__.insert(), [{c: r.get(c) for c in ORDER_COLUMNS} for r in rows])
+
+    async def update_rollups(self, conn, fills: List[Dict]):
+        """Advance the daily rollups and position ledger by `fills`: one SELECT and two upserts"""
+        from sqlalchemy import select
+        from database import PositionLedger, upsert
+        table = PositionLedger.__table__
+        result = await conn.execute(select(table).where(table.c.symbol.in_({r['symbol'] for r in fills})))
+        ledger = {r.symbol: (r.qty, r.avg_price) for r in result}
+        before = dict(ledger)
+        totals = fold_rollups(fills, ledger)
+        await self._upsert_rollups(conn, totals, additive=True)
+        changed = [{"symbol": s, "qty": q, "avg_price": a} for s, (q, a) in ledger.items() if before.get(s) != (q, a)]
+        if changed:
+            stmt = upsert(conn, PositionLedger.__table__)
+            await conn.execute(stmt.on_conflict_do_update(
+                index_elements=['symbol'], set_={"qty": stmt.excluded.qty, "avg_price": stmt.excluded.avg_price}),
+                changed)
+
+    @staticmethod
+    async def _upsert_rollups(conn, totals: Dict[Tuple, Dict], additive: bool):
+        if not totals:
+            return
+        from database import DailySymbolRollup, ROLLUP_SUMS, upsert
+        table = DailySymbolRollup.__table__
+        stmt = upsert(conn, table)
+        set_ = {c: (table.c[c] + stmt.excluded[c]) if additive else stmt.excluded[c] for c in ROLLUP_SUMS}
+        await conn.execute(stmt.on_conflict_do_update(index_elements=['day', 'symbol'], set_=set_),
+                           [dict(values, day=day, symbol=symbol) for (day, symbol), values in totals.items()])
+
+    async def rebuild_rollups(self, page_size: int = 5000) -> int:
+        """
+        Recompute the rollups and ledger from the full fill history (after a
+        migration or a manual edit of `order_fills`). Pages through the
+        history in order, so memory stays at one page plus the rollups
+        themselves. Run it with no journal writing. Returns the number of
+        fills replayed.
+        """
+        from sqlalchemy import delete
+        from database import DailySymbolRollup, PositionLedger, list_fills
+        ledger, totals, replayed, cursor = {}, {}, 0, None
+        while True:
+            page = await list_fills(limit=page_size, cursor=cursor, ascending=True, bind=self.engine)
+            for key, values in fold_rollups(page["fills"], ledger).items():
+                day = totals.setdefault(key, dict.fromkeys(values, 0.0))
+                for column, value in values.items():
+                    day[column] += value
+            replayed += len(page["fills"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        async with self.engine.begin() as conn:
+            await conn.execute(delete(DailySymbolRollup.__table__))
+            await conn.execute(delete(PositionLedger.__table__))
+            await self._upsert_rollups(conn, totals, additive=False)
+            if ledger:
+                await conn.execute(PositionLedger.__table__.insert(),
+                                   [{"symbol": s, "qty": q, "avg_price": a} for s, (q, a) in ledger.items()])
+        logger.info(f"Rebuilt {len(totals)} daily rollups from {replayed} fills")
+        return replayed
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
+
+
+async def _rebuild_main(args):
+    from database import init_db
+    await init_db()
+    journal = OrderJournal()
+    replayed = await journal.rebuild_rollups(page_size=args.page_size)
+    print(f"Replayed {replayed} fills")
+    await journal.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Order journal maintenance")
+    sub = parser.add_subparsers(dest='command', required=True)
+    rebuild = sub.add_parser('rebuild-rollups', help="recompute daily rollups and positions from the order_fills table")
+    rebuild.add_argument('--page-size', type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(_rebuild_main(args))
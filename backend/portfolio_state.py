@@ -0,0 +1,191 @@
+"""
+Cached portfolio snapshot.
+
+Account and positions are fetched concurrently and kept for a short TTL,
+so every /portfolio, /health and strategy read inside that window shares
+one pair of upstream calls, and concurrent misses share one fetch. The
+snapshot is invalidated by order events (AlpacaClient order listeners) and,
+when enabled, by fills from Alpaca's trade_updates stream rather than
+being re-polled blindly.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import weakref
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# trade_updates events that change cash or positions
+FILL_EVENTS = {'fill', 'partial_fill', 'canceled', 'expired', 'rejected'}
+
+
+def to_dict(entity) -> Dict:
+    """alpaca_trade_api Entity (or a plain dict from the HTTP transport) -> dict"""
+    if entity is None:
+        return {}
+    raw = getattr(entity, '_raw', entity)
+    return dict(raw) if isinstance(raw, dict) else {}
+
+
+class PortfolioState:
+    # one instance per client from shared(), so strategies built without one
+    # don't each register another order listener on the client
+    _shared = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def shared(cls, client) -> "PortfolioState":
+        if client is None:
+            # compute-only strategies (strategy_runner workers) have no broker
+            return cls(client)
+        state = cls._shared.get(client)
+        if state is None:
+            state = cls._shared[client] = cls(client)
+        return state
+
+    def __init__(self, client, ttl: float = None, clock=time.monotonic):
+        self.client = client
+        if ttl is None:
+            ttl = float(os.getenv('PORTFOLIO_CACHE_TTL_SECONDS', 2.0))
+        self.ttl = ttl
+        self._clock = clock
+        self._snapshot: Optional[Dict] = None
+        # last snapshot fetched, kept across invalidations for peek()
+        self._last: Optional[Dict] = None
+        self._fetched_at = 0.0
+        self._inflight: Optional[asyncio.Future] = None
+        # bumped on invalidation so a fetch started before an order is not
+        # cached as fresh afterwards
+        self._generation = 0
+        self.fetches = 0
+        self.hits = 0
+        self.invalidations = 0
+        # awaited with every trade_updates message (order journal, risk engine)
+        self.trade_listeners = []
+        if hasattr(client, 'add_order_listener'):
+            client.add_order_listener(self.on_order)
+
+    def invalidate(self):
+        self._generation += 1
+        self._snapshot = None
+        # a fetch already in flight may predate the order; later callers start a new one
+        self._inflight = None
+        self.invalidations += 1
+
+    def add_trade_listener(self, callback):
+        """`await callback(data)` for each trade_updates message run_trade_updates receives"""
+        self.trade_listeners.append(callback)
+
+    def on_order(self, order):
+        self.invalidate()
+
+    def handle_trade_update(self, msg: Dict):
+        """Invalidate on a trade_updates stream message that moved cash or positions"""
+        if msg.get('event') in FILL_EVENTS:
+            self.invalidate()
+
+    def _fresh(self) -> bool:
+        return self._snapshot is not None and self._clock() - self._fetched_at < self.ttl
+
+    async def snapshot(self, max_age: float = None) -> Dict:
+        """{"account", "positions", "fetched_at", "age"}; refetched when older than `max_age` (default ttl)"""
+        max_age = self.ttl if max_age is None else max_age
+        if self._snapshot is not None and self._clock() - self._fetched_at < max_age:
+            self.hits += 1
+            return dict(self._snapshot, age=self._clock() - self._fetched_at)
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh())
+        else:
+            self.hits += 1
+        inflight = self._inflight
+        # shield: one caller being cancelled must not cancel the shared fetch
+        snapshot = await asyncio.shield(inflight)
+        return dict(snapshot, age=self._clock() - self._fetched_at)
+
+    async def _refresh(self) -> Dict:
+        generation = self._generation
+        started = self._clock()
+        try:
+            account, positions = await asyncio.gather(self.client.get_account(), self.client.get_positions())
+        finally:
+            # only clear our own fetch, not one started after an invalidation
+            if self._inflight is asyncio.current_task():
+                self._inflight = None
+        self.fetches += 1
+        snapshot = {
+            "account": to_dict(account),
+            "positions": [to_dict(p) for p in positions or []],
+            # when the fetch began; anything filled before then is in it
+            "fetched_at": started,
+        }
+        if generation == self._generation:
+            self._last = snapshot
+            self._snapshot = snapshot
+            self._fetched_at = self._clock()
+        return snapshot
+
+    def peek(self, max_age: float = None) -> Optional[Dict]:
+        """
+        Most recent snapshot without fetching, even if invalidated; None before
+        the first fetch or, with `max_age`, once it is older than that
+        """
+        if max_age is not None and self._clock() - self._fetched_at >= max_age:
+            return None
+        return self._last
+
+    async def account(self, max_age: float = None) -> Dict:
+        return (await self.snapshot(max_age))["account"]
+
+    async def positions(self, max_age: float = None) -> List[Dict]:
+        return (await self.snapshot(max_age))["positions"]
+
+    async def position(self, symbol: str, max_age: float = None) -> Optional[Dict]:
+        for position in await self.positions(max_age):
+            if position.get('symbol') == symbol:
+                return position
+        return None
+
+    async def run_trade_updates(self, url: str = None, max_backoff: float = 30.0):
+        """Listen to Alpaca's trade_updates stream and invalidate on fills"""
+        import websockets
+        base = getattr(self.client, 'base_url', 'https://paper-api.alpaca.markets')
+        url = url or os.getenv('ALPACA_TRADE_STREAM_URL') or base.replace('https://', 'wss://').replace('http://', 'ws://') + '/stream'
+        backoff = 1.0
+        while True:
+            try:
+                async with websockets.connect(url) as ws:
+                    await ws.send(json.dumps({"action": "auth", "key": self.client.api_key, "secret": self.client.secret_key}))
+                    await ws.send(json.dumps({"action": "listen", "data": {"streams": ["trade_updates"]}}))
+                    backoff = 1.0
+                    async for raw in ws:
+                        msg = json.loads(raw)
+                        if msg.get('stream') == 'authorization' and msg.get('data', {}).get('status') != 'authorized':
+                            raise ConnectionError(f"trade stream authentication failed: {msg}")
+                        if msg.get('stream') == 'trade_updates':
+                            data = msg.get('data', {})
+                            self.handle_trade_update(data)
+                            for callback in self.trade_listeners:
+                                try:
+                                    await callback(data)
+                                except Exception as e:
+                                    logger.error(f"Trade update listener failed: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Trade updates stream disconnected: {e}")
+            # fills may have been missed while disconnected
+            self.invalidate()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+
+    def stats(self) -> Dict:
+        return {
+            "ttl": self.ttl,
+            "cached": self._fresh(),
+            "fetches": self.fetches,
+            "hits": self.hits,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,112 @@
+"""
+Opt-in sampling profiler for the event loop thread.
+
+While enabled, a daemon thread snapshots the loop thread's Python stack
+every `interval` seconds into a bounded ring. When a request finishes
+slower than `slow_threshold`, the samples taken during it are folded into
+collapsed stacks ("file:function;file:function ... count", the flamegraph
+input format) and kept with the request. Everything else costs one boolean
+check per request, so it can be switched on in production and off again at
+runtime (POST /debug/profiler).
+"""
+
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_DEPTH = 64
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, slow_threshold: float = 0.5, max_samples: int = 20000,
+                 max_captures: int = 20, top: int = 20):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.top = top
+        # (perf_counter timestamp, collapsed stack)
+        self._samples = collections.deque(maxlen=max_samples)
+        self.captures = collections.deque(maxlen=max_captures)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target: Optional[int] = None
+        self.samples_taken = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, thread_id: Optional[int] = None):
+        """Begin sampling `thread_id` (default: the calling thread, i.e. the event loop)"""
+        if self.enabled:
+            return
+        self._target = thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        logger.info(f"Sampling profiler started ({self.interval * 1000:g}ms interval, "
+                    f"capturing requests over {self.slow_threshold * 1000:g}ms)")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        self._thread = None
+        logger.info("Sampling profiler stopped")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                self._samples.append((time.perf_counter(), _collapse(frame)))
+                self.samples_taken += 1
+
+    def request_finished(self, name: str, started: float, elapsed: float):
+        if elapsed < self.slow_threshold:
+            return
+        end = started + elapsed
+        # list() copies the deque atomically under the GIL
+        stacks = collections.Counter(stack for t, stack in list(self._samples) if started <= t <= end)
+        self.captures.append({
+            "request": name,
+            "at": time.time() - (time.perf_counter() - end),
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "samples": sum(stacks.values()),
+            "stacks": [f"{stack} {n}" for stack, n in stacks.most_common(self.top)],
+        })
+
+    def report(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "interval_ms": self.interval * 1000,
+            "slow_ms": self.slow_threshold * 1000,
+            "samples_taken": self.samples_taken,
+            "captures": list(self.captures),
+        }
+
+    def configure(self, enabled: Optional[bool] = None, interval_ms: Optional[float] = None,
+                  slow_ms: Optional[float] = None) -> Dict:
+        if interval_ms is not None:
+            self.interval = max(0.001, interval_ms / 1000)
+        if slow_ms is not None:
+            self.slow_threshold = max(0.0, slow_ms / 1000)
+        if enabled is True:
+            self.start()
+        elif enabled is False:
+            self.stop()
+        return self.report()
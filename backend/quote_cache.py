@@ -0,0 +1,155 @@
+"""
+In-process quote cache for AlpacaClient.
+
+Quotes are kept for a short, per-symbol configurable TTL in an LRU map
+bounded by entry count. Lookups are single-flight: while a symbol is being
+fetched, every other caller for that symbol awaits the same in-flight
+request instead of issuing its own.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+
+class QuoteCache:
+    def __init__(self, ttl: float = 1.0, max_entries: int = 10000, symbol_ttls: Optional[Dict[str, float]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.symbol_ttls = dict(symbol_ttls or {})
+        self._clock = clock
+        self._entries = OrderedDict()  # symbol -> (expires_at, quote)
+        self._inflight = {}  # symbol -> Future
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def set_ttl(self, symbol: str, ttl: float):
+        """Override the TTL for one symbol (e.g. longer for illiquid names)"""
+        self.symbol_ttls[symbol] = ttl
+
+    def _ttl_for(self, symbol: str) -> float:
+        return self.symbol_ttls.get(symbol, self.ttl)
+
+    def get(self, symbol: str):
+        """Fresh cached quote or None; does not touch the counters"""
+        entry = self._entries.get(symbol)
+        if entry is None:
+            return None
+        expires_at, quote = entry
+        if expires_at <= self._clock():
+            del self._entries[symbol]
+            return None
+        self._entries.move_to_end(symbol)
+        return quote
+
+    def set(self, symbol: str, quote):
+        ttl = self._ttl_for(symbol)
+        if quote is None or ttl <= 0:
+            return
+        self._entries[symbol] = (self._clock() + ttl, quote)
+        self._entries.move_to_end(symbol)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, symbol: Optional[str] = None):
+        if symbol is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(symbol, None)
+
+    def _begin(self, symbol: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[symbol] = future
+        return future
+
+    def _finish(self, symbol: str, future: asyncio.Future, quote=None, error: Optional[BaseException] = None):
+        self._inflight.pop(symbol, None)
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+            # the caller that started the fetch re-raises; waiters may not exist
+            future.exception()
+        else:
+            self.set(symbol, quote)
+            future.set_result(quote)
+
+    async def get_or_fetch(self, symbol: str, fetch: Callable[[str], Awaitable]):
+        """Cached quote, else join an in-flight fetch, else fetch it ourselves"""
+        quote = self.get(symbol)
+        if quote is not None:
+            self.hits += 1
+            return quote
+        future = self._inflight.get(symbol)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = self._begin(symbol)
+        try:
+            quote = await fetch(symbol)
+        except BaseException as e:
+            self._finish(symbol, future, error=e)
+            raise
+        self._finish(symbol, future, quote)
+        return quote
+
+    async def get_many_or_fetch(self, symbols: Iterable[str],
+                                fetch_many: Callable[[list], Awaitable[Dict[str, dict]]]) -> Dict[str, dict]:
+        """
+        Batched variant: cache hits are served directly, symbols already in
+        flight are joined and only the remaining misses go to `fetch_many`
+        in a single call.
+        """
+        quotes = {}
+        waiting = {}
+        missing = []
+        for symbol in dict.fromkeys(symbols):
+            quote = self.get(symbol)
+            if quote is not None:
+                self.hits += 1
+                quotes[symbol] = quote
+            elif symbol in self._inflight:
+                self.coalesced += 1
+                waiting[symbol] = self._inflight[symbol]
+            else:
+                self.misses += 1
+                missing.append(symbol)
+
+        if missing:
+            futures = {symbol: self._begin(symbol) for symbol in missing}
+            try:
+                fetched = await fetch_many(missing)
+            except BaseException as e:
+                for symbol, future in futures.items():
+                    self._finish(symbol, future, error=e)
+                raise
+            for symbol, future in futures.items():
+                self._finish(symbol, future, fetched.get(symbol))
+                if fetched.get(symbol) is not None:
+                    quotes[symbol] = fetched[symbol]
+
+        if waiting:
+            results = await asyncio.gather(*(asyncio.shield(f) for f in waiting.values()), return_exceptions=True)
+            for symbol, quote in zip(waiting, results):
+                if quote is not None and not isinstance(quote, BaseException):
+                    quotes[symbol] = quote
+        return quotes
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
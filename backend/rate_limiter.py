@@ -0,0 +1,178 @@
+"""
+Async throttling primitives for upstream broker calls.
+
+TokenBucketLimiter enforces a requests-per-minute budget; PrioritySemaphore
+bounds how many calls run at once. Both serve waiters by priority, then
+FIFO, so order submission always goes ahead of quote and portfolio reads.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Callable, Dict
+
+PRIORITY_ORDER = 0
+PRIORITY_READ = 1
+
+
+class _WaitStats:
+    def __init__(self):
+        self.acquired = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float):
+        self.acquired += 1
+        if wait > 0:
+            self.waited += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "avg_wait_ms": self.total_wait / self.acquired * 1000 if self.acquired else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+class _PriorityWaiters:
+    """Heap of (priority, seq, future) shared by both primitives"""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+
+    def push(self, priority: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), future))
+        return future
+
+    def pop(self):
+        """Next waiter that is still waiting, or None"""
+        while self._heap:
+            _, _, future = heapq.heappop(self._heap)
+            if not future.done():
+                return future
+        return None
+
+    def __len__(self):
+        return sum(1 for _, _, f in self._heap if not f.done())
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate_per_minute: float = 200, burst: int = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, int(self.rate)))
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._waiters = _PriorityWaiters()
+        self._wakeup = None
+        self._stats = {PRIORITY_ORDER: _WaitStats(), PRIORITY_READ: _WaitStats()}
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority: int = PRIORITY_READ):
+        started = self._clock()
+        self._refill()
+        if self.tokens >= 1 and not len(self._waiters):
+            self.tokens -= 1
+            self._stats.setdefault(priority, _WaitStats()).record(0.0)
+            return
+        future = self._waiters.push(priority)
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # a token handed to a cancelled waiter goes back in the bucket
+            if future.done() and not future.cancelled():
+                self.tokens += 1
+            raise
+        self._stats.setdefault(priority, _WaitStats()).record(self._clock() - started)
+
+    def _schedule(self):
+        if self._wakeup is not None:
+            return
+        delay = max(0.0, (1 - self.tokens) / self.rate) if self.rate > 0 else 1.0
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _dispatch(self):
+        self._wakeup = None
+        self._refill()
+        while self.tokens >= 1:
+            future = self._waiters.pop()
+            if future is None:
+                break
+            self.tokens -= 1
+            future.set_result(None)
+        if len(self._waiters):
+            self._schedule()
+
+    def stats(self) -> Dict:
+        self._refill()
+        return {
+            "rate_per_minute": self.rate * 60,
+            "burst": self.capacity,
+            "tokens": round(self.tokens, 3),
+            "queued": len(self._waiters),
+            "orders": self._stats[PRIORITY_ORDER].as_dict(),
+            "reads": self._stats[PRIORITY_READ].as_dict(),
+        }
+
+
+class PrioritySemaphore:
+    def __init__(self, value: int, clock: Callable[[], float] = time.monotonic):
+        self.size = value
+        self.in_use = 0
+        self.peak_in_use = 0
+        self._clock = clock
+        self._waiters = _PriorityWaiters()
+        self._stats = _WaitStats()
+
+    async def acquire(self, priority: int = PRIORITY_READ) -> float:
+        """Take a slot; returns how long we waited for it"""
+        started = self._clock()
+        if self.in_use < self.size and not len(self._waiters):
+            self._take()
+            self._stats.record(0.0)
+            return 0.0
+        future = self._waiters.push(priority)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        wait = self._clock() - started
+        self._stats.record(wait)
+        return wait
+
+    def _take(self):
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def release(self):
+        future = self._waiters.pop()
+        if future is not None:
+            # hand the slot straight to the next waiter
+            future.set_result(None)
+        else:
+            self.in_use -= 1
+
+    def stats(self) -> Dict:
+        stats = self._stats.as_dict()
+        stats.update({
+            "size": self.size,
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "queued": len(self._waiters),
+            "saturation": self.in_use / self.size if self.size else 0.0,
+        })
+        return stats
@@ -0,0 +1,501 @@
+"""
+Pre-trade portfolio risk checks.
+
+Positions, marks and an EWMA covariance of daily returns live in NumPy
+arrays indexed by symbol, so checking one order or a whole batch is a few
+vectorized operations on the post-trade book:
+
+- gross and net exposure as a fraction of equity
+- per-symbol concentration and per-sector exposure
+- parametric one-day VaR, z * sqrt(v' S v), from the cached covariance
+
+The covariance is warmed from the bar store and then refreshed
+incrementally, one rank-1 update per new bar (each bar is taken once, by
+timestamp); symbols start from `default_volatility` on the diagonal until
+history replaces it. An order is only rejected if it adds to a breached
+limit; risk-reducing orders always pass. When a batch as a whole breaches
+gross, net or VaR, orders are admitted greedily in the order given until it
+fits, rather than rejecting every order that adds exposure.
+
+Submitted orders are booked on top of the last snapshot until the broker
+reports them filled, canceled, expired or rejected (on_trade_update), or,
+without a trade_updates stream (`settle_on_snapshot`), until a snapshot
+fetched after the order was booked is synced.
+
+refresh_in_thread warms the covariance in a worker thread while holding
+`lock`; event-loop code takes the same lock around its calls so none of
+them sees the arrays mid-update.
+"""
+
+import asyncio
+import logging
+import time
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NO_SECTOR = -1
+# order states in which nothing more will fill
+SETTLED_EVENTS = frozenset({'canceled', 'expired', 'rejected', 'failed'})
+
+
+_UPPER = np.zeros((0, 0), dtype=bool)
+
+
+def _upper(n: int) -> np.ndarray:
+    """Mask of the strictly upper triangle of an n x n matrix (a view of a shared, read-only mask)"""
+    global _UPPER
+    if n > len(_UPPER):
+        _UPPER = np.triu(np.ones((max(n, 2 * len(_UPPER), 256),) * 2, dtype=bool), 1)
+        _UPPER.flags.writeable = False
+    return _UPPER[:n, :n]
+
+
+def _cumsum_by(keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Running sum of `values` within each key, in the original order"""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys, running = keys[order], np.cumsum(values[order])
+    starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+    base = running[starts] - values[order][starts]
+    out = np.empty_like(running)
+    out[order] = running - np.repeat(base, np.diff(starts, append=len(keys)))
+    return out
+
+
+class PreTradeRiskEngine:
+    def __init__(self, max_gross: float = 1.0, max_net: float = 1.0, max_position_pct: float = 0.2,
+                 max_sector_pct: float = 0.4, sector_caps: Optional[Dict[str, float]] = None,
+                 max_var_pct: float = 0.03, var_confidence: float = 0.95, cov_lambda: float = 0.94,
+                 default_volatility: float = 0.02, sectors: Optional[Dict[str, str]] = None,
+                 settle_on_snapshot: bool = False, clock=time.monotonic):
+        self.max_gross = max_gross
+        self.max_net = max_net
+        self.max_position_pct = max_position_pct
+        self.max_sector_pct = max_sector_pct
+        self.max_var_pct = max_var_pct
+        self.z = NormalDist().inv_cdf(var_confidence)
+        self.cov_lambda = cov_lambda
+        self.default_var = default_volatility ** 2
+        self.equity = 0.0
+        self.index: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.sector_names: List[str] = []
+        self.sector_caps = dict(sector_caps or {})
+        # order id -> [row, signed qty not yet filled, booked at]
+        self._booked: Dict[str, list] = {}
+        self.settle_on_snapshot = settle_on_snapshot
+        # held while refresh_in_thread runs; event-loop callers take it before using the engine
+        self.lock = asyncio.Lock()
+        self._clock = clock
+        self._alloc(0)
+        self._snapshot_id = None
+        if sectors:
+            self.set_sectors(sectors)
+
+    def _alloc(self, n: int):
+        self.positions = np.zeros(n)
+        self.prices = np.full(n, np.nan)
+        self.last_close = np.full(n, np.nan)
+        # timestamp of the last bar folded into the covariance, -1 before any
+        self.last_t = np.full(n, -1, dtype=np.int64)
+        self.sector = np.full(n, NO_SECTOR, dtype=np.int64)
+        self.cov = np.diag(np.full(n, self.default_var))
+
+    def add_symbols(self, symbols: Iterable[str]):
+        new = [s for s in dict.fromkeys(symbols) if s not in self.index]
+        if not new:
+            return
+        n_old = len(self.symbols)
+        old = (self.positions, self.prices, self.last_close, self.last_t, self.sector, self.cov)
+        self._alloc(n_old + len(new))
+        (self.positions[:n_old], self.prices[:n_old], self.last_close[:n_old], self.last_t[:n_old],
+         self.sector[:n_old]) = old[:5]
+        self.cov[:n_old, :n_old] = old[5]
+        for s in new:
+            self.index[s] = len(self.symbols)
+            self.symbols.append(s)
+
+    def rows(self, symbols: Iterable[str]) -> np.ndarray:
+        symbols = list(symbols)
+        self.add_symbols(symbols)
+        return np.fromiter((self.index[s] for s in symbols), dtype=np.int64, count=len(symbols))
+
+    def set_sectors(self, sectors: Dict[str, str]):
+        rows = self.rows(sectors)
+        for row, name in zip(rows, sectors.values()):
+            if name not in self.sector_names:
+                self.sector_names.append(name)
+            self.sector[row] = self.sector_names.index(name)
+
+    # -- state updates -------------------------------------------------------
+
+    def sync(self, snapshot: Dict):
+        """
+        Load equity and positions from a PortfolioState snapshot (skipped if
+        unchanged), plus the unfilled part of the orders still booked. With
+        `settle_on_snapshot`, orders booked before the snapshot's `fetched_at`
+        (same clock) are dropped: their fills are in its positions.
+        """
+        if snapshot is None or snapshot.get("account") is self._snapshot_id:
+            return
+        self._snapshot_id = snapshot.get("account")
+        account = snapshot["account"]
+        self.equity = float(account.get('equity') or account.get('portfolio_value') or 0.0)
+        positions = snapshot.get("positions") or []
+        self.positions[:] = 0.0
+        fetched_at = snapshot.get("fetched_at")
+        if self.settle_on_snapshot and fetched_at is not None:
+            for order_id in [k for k, (_, _, at) in self._booked.items() if at < fetched_at]:
+                del self._booked[order_id]
+        for row, remaining, _ in self._booked.values():
+            self.positions[row] += remaining
+        if not positions:
+            return
+        rows = self.rows(p['symbol'] for p in positions)
+        qty = np.array([float(p['qty']) for p in positions])
+        side = np.array([p.get('side') == 'short' for p in positions])
+        self.positions[rows] += np.where(side, -np.abs(qty), qty)
+        for row, p in zip(rows, positions):
+            price = p.get('current_price')
+            if price is None and p.get('market_value') is not None and float(p['qty']):
+                price = float(p['market_value']) / float(p['qty'])
+            if price is not None:
+                self.prices[row] = float(price)
+
+    def mark(self, prices: Dict[str, float]):
+        """Latest prices used to value positions and orders"""
+        if prices:
+            # rows() may grow the arrays, so before indexing them
+            rows = self.rows(prices)
+            self.prices[rows] = np.fromiter(prices.values(), dtype=np.float64, count=len(prices))
+
+    def update_bar(self, closes: Dict[str, float], t: Optional[int] = None):
+        """
+        Feed one daily close per symbol; rank-1 EWMA update of the covariance.
+        With the bar's timestamp `t`, symbols that already have it are skipped.
+        """
+        rows = self.rows(closes)
+        closes = np.fromiter(closes.values(), dtype=np.float64, count=len(rows))
+        if t is not None:
+            new = self.last_t[rows] < t
+            rows, closes = rows[new], closes[new]
+            self.last_t[rows] = t
+        prev = self.last_close[rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = np.log(closes / prev)
+        ok = np.isfinite(r)
+        self.last_close[rows] = closes
+        if not ok.any():
+            return
+        rows, r = rows[ok], r[ok]
+        lam = self.cov_lambda
+        # the default variance acts as a prior that decays as history builds up
+        block = np.ix_(rows, rows)
+        self.cov[block] = lam * self.cov[block] + (1 - lam) * np.outer(r, r)
+
+    def warm_up(self, closes: np.ndarray, symbols: List[str], timestamps: Optional[np.ndarray] = None):
+        """
+        Initialise the covariance from a (bars x symbols) close history in one
+        pass; `timestamps` (one per bar) mark those bars as seen for update_bar
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        rows = self.rows(symbols)
+        if not len(closes):
+            return
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = np.log(closes[1:] / closes[:-1])
+        r[~np.isfinite(r)] = 0.0
+        n = r.shape[0]
+        if n:
+            # EWMA weights, newest bar heaviest, normalised to sum to 1
+            w = (1 - self.cov_lambda) * self.cov_lambda ** np.arange(n - 1, -1, -1)
+            w /= w.sum()
+            self.cov[np.ix_(rows, rows)] = (r * w[:, np.newaxis]).T @ r
+        # each symbol's last close, which may be before the last bar
+        finite = np.isfinite(closes)
+        ok = finite.any(axis=0)
+        latest = closes.shape[0] - 1 - np.argmax(finite[::-1], axis=0)
+        last = closes[latest, np.arange(closes.shape[1])]
+        self.last_close[rows[ok]] = last[ok]
+        if timestamps is not None:
+            self.last_t[rows[ok]] = np.asarray(timestamps, dtype=np.int64)[latest[ok]]
+        unpriced = ok & np.isnan(self.prices[rows])
+        self.prices[rows[unpriced]] = last[unpriced]
+
+    def update_bars(self, bars: Dict[str, Dict[str, np.ndarray]]):
+        """
+        Feed bars ({symbol: {"t", "close"}}, e.g. BarStore.read) the covariance
+        hasn't seen. Symbols with no history yet are warmed up together in one
+        pass; the rest get one rank-1 update per new timestamp.
+        """
+        fresh, pending = {}, {}
+        for symbol, b in bars.items():
+            t = np.asarray(b['t'], dtype=np.int64)
+            row = self.index.get(symbol)
+            last = self.last_t[row] if row is not None else -1
+            new = t > last
+            if new.any():
+                (fresh if last < 0 else pending)[symbol] = (t[new], np.asarray(b['close'], dtype=np.float64)[new])
+        for group, warm in ((fresh, True), (pending, False)):
+            if not group:
+                continue
+            stamps = np.unique(np.concatenate([t for t, _ in group.values()]))
+            matrix = np.full((len(stamps), len(group)), np.nan)
+            for j, (t, close) in enumerate(group.values()):
+                matrix[np.searchsorted(stamps, t), j] = close
+            symbols = list(group)
+            if warm:
+                self.warm_up(matrix, symbols, timestamps=stamps)
+                continue
+            for t, row in zip(stamps, matrix):
+                have = np.isfinite(row)
+                self.update_bar({s: c for s, c, ok in zip(symbols, row, have) if ok}, t=int(t))
+
+    def refresh_from_store(self, bar_store, symbols: Optional[Iterable[str]] = None, history: int = 250):
+        """
+        Feed the covariance from a bar_store.BarStore: the last `history`
+        closes of symbols it has not seen, only newer bars of the rest
+        (default: every symbol in the store)
+        """
+        bars = {}
+        for symbol in (bar_store.symbols() if symbols is None else symbols):
+            row = self.index.get(symbol)
+            if row is not None and self.last_t[row] >= 0:
+                b = bar_store.read(symbol, start=int(self.last_t[row]) + 1, columns=('t', 'close'))
+            else:
+                b = {k: v[-history:] for k, v in bar_store.read(symbol, columns=('t', 'close')).items()}
+            if len(b['t']):
+                bars[symbol] = b
+        self.update_bars(bars)
+
+    async def refresh_in_thread(self, bar_store, symbols: Optional[Iterable[str]] = None, history: int = 250):
+        """refresh_from_store in a worker thread, holding `lock` until it is done"""
+        async with self.lock:
+            await asyncio.to_thread(self.refresh_from_store, bar_store, symbols, history)
+
+    def price(self, symbol: str) -> Optional[float]:
+        row = self.index.get(symbol)
+        if row is None or np.isnan(self.prices[row]):
+            return None
+        return float(self.prices[row])
+
+    def apply(self, orders: List[Dict]):
+        """
+        Book submitted orders so the next check sees them before the broker
+        does. An order carrying the broker's (`order`, as returned by
+        create_order, or `id`) stays booked until on_trade_update settles it.
+        """
+        for o in orders:
+            placed = getattr(o.get('order'), '_raw', o.get('order')) or {}
+            status = placed.get('status') if isinstance(placed, dict) else None
+            if status in SETTLED_EVENTS:
+                continue
+            row = self.rows([o['symbol']])[0]
+            signed = float(o['qty']) * (1 if o['side'] == 'buy' else -1)
+            self.positions[row] += signed
+            order_id = placed.get('id') if isinstance(placed, dict) else o.get('id')
+            if order_id is not None and status != 'filled':
+                self._booked[order_id] = [row, signed, self._clock()]
+
+    def on_trade_update(self, msg: Dict):
+        """
+        Settle a booked order from a trade_updates message: fills leave the
+        position as booked (the next snapshot carries them), while a cancel,
+        expiry or rejection takes the unfilled remainder back off the book
+        """
+        order = msg.get('order') or {}
+        booked = self._booked.get(order.get('id'))
+        if booked is None:
+            return
+        event = msg.get('event')
+        row, remaining, _ = booked
+        if event == 'partial_fill':
+            filled = abs(float(msg.get('qty') or 0.0))
+            booked[1] = remaining - np.copysign(min(filled, abs(remaining)), remaining)
+        elif event == 'fill':
+            del self._booked[order['id']]
+        elif event in SETTLED_EVENTS:
+            self.positions[row] -= remaining
+            del self._booked[order['id']]
+
+    # -- checks --------------------------------------------------------------
+
+    def _var(self, values: np.ndarray, quad: Optional[float] = None) -> float:
+        """z * sqrt(v' S v); pass v' S v as `quad` when it is already known"""
+        if quad is None:
+            quad = values @ self.cov @ values
+        return self.z * float(np.sqrt(max(quad, 0.0)))
+
+    def check(self, orders: List[Dict]) -> Dict:
+        """
+        Check a batch of {"symbol", "side", "qty"[, "price"]} orders against
+        the book as if all of them filled. Returns the approved/rejected
+        indices with reasons and the pre-trade metrics and the post-trade
+        ones of the approved orders.
+        """
+        started = time.perf_counter()
+        n_orders = len(orders)
+        rows = self.rows(o['symbol'] for o in orders)
+        signed = np.fromiter((float(o['qty']) * (1 if o['side'] == 'buy' else -1) for o in orders),
+                             dtype=np.float64, count=n_orders)
+        order_px = np.fromiter((o.get('price') or np.nan for o in orders), dtype=np.float64, count=n_orders)
+        prices = self.prices.copy()
+        has_px = np.isfinite(order_px)
+        prices[rows[has_px]] = order_px[has_px]
+        priced = np.isfinite(prices)
+
+        post = self.positions.copy()
+        np.add.at(post, rows, signed)
+        v0 = np.where(priced, self.positions * prices, 0.0)
+        v1 = np.where(priced, post * prices, 0.0)
+        equity = self.equity if self.equity > 0 else np.nan
+
+        sv0 = self.cov @ v0
+        pre = self._metrics(v0, equity, quad=float(v0 @ sv0))
+
+        # per-order flags; an order only fails a limit it makes worse
+        increases = np.abs(v1[rows]) > np.abs(v0[rows]) + 1e-9
+        reasons = [[] for _ in range(n_orders)]
+
+        def flag(mask, reason):
+            for i in np.nonzero(mask)[0]:
+                reasons[i].append(reason)
+
+        flag(~np.isfinite(prices[rows]), "no price")
+        if np.isnan(equity):
+            flag(increases, "equity unknown")
+            after = self._metrics(v1, equity)
+        else:
+            flag(increases & (np.abs(v1[rows]) / equity > self.max_position_pct), "concentration")
+            sector = self.sector[rows]
+            if (self.sector >= 0).any():
+                exposure = self._sector_exposure(v1, equity)
+                caps = np.array([self.sector_caps.get(name, self.max_sector_pct) for name in self.sector_names])
+                over = np.zeros(n_orders, dtype=bool)
+                known = sector >= 0
+                over[known] = exposure[sector[known]] > caps[sector[known]]
+                flag(increases & over, "sector")
+            deltas = np.where(priced[rows], signed * prices[rows], 0.0)
+            v1, quad = self._admit(rows, deltas, increases, v0, sv0, equity, reasons)
+            after = self._metrics(v1, equity, quad=quad)
+
+        rejected = [{"index": i, "symbol": orders[i]['symbol'], "reasons": r} for i, r in enumerate(reasons) if r]
+        return {
+            "approved": [i for i, r in enumerate(reasons) if not r],
+            "rejected": rejected,
+            "pre_trade": pre,
+            "post_trade": after,
+            "elapsed_us": round((time.perf_counter() - started) * 1e6, 1),
+        }
+
+    def _admit(self, rows: np.ndarray, deltas: np.ndarray, increases: np.ndarray, values: np.ndarray,
+               sv: np.ndarray, equity: float, reasons: List[List[str]]) -> Tuple[np.ndarray, float]:
+        """
+        Fit the orders not yet rejected to the gross, net and VaR limits.
+        Orders on symbols the batch reduces all go in; the rest are taken in
+        the order given, as the longest prefix that leaves every limit met or
+        no worse than it found it. The order that ends the prefix is rejected
+        and the ones after it are tried again on the new book. Prefix gross,
+        net and v'Sv are cumulative sums, so a round is a few array
+        operations, and orders over the gross limit on their own (gross only
+        grows from here) are rejected before the first round. `sv` is S v for
+        the book before the batch. Returns the values of the book with the
+        admitted orders and its v' S v.
+        """
+        cov = self.cov
+        values, sv = values.copy(), sv.copy()
+        open_ = np.fromiter((not r for r in reasons), dtype=bool, count=len(reasons))
+        reducing = open_ & ~increases
+        if reducing.any():
+            np.add.at(values, rows[reducing], deltas[reducing])
+            sv += deltas[reducing] @ cov.take(rows[reducing], axis=0)
+        quad = float(values @ sv)
+        pending = np.nonzero(open_ & increases)[0]
+        if not len(pending):
+            return values, quad
+        names = ("gross", "net", "var")
+        limits = np.array([self.max_gross, self.max_net, self.max_var_pct])[:, np.newaxis] * equity
+        tolerance = 1e-12 * equity
+
+        k, d = rows[pending], deltas[pending]
+        alone = np.abs(values[k] + d) - np.abs(values[k])
+        over = (np.abs(values).sum() + alone > limits[0, 0]) & (alone > tolerance)
+        for i in pending[over]:
+            reasons[i].append("gross")
+        pending, k, d = pending[~over], k[~over], d[~over]
+        # sqrt(v'Sv) is a norm, so an order moves it by at most |d| sqrt(S_kk);
+        # the exact v'Sv prefixes are only needed when that bound could breach
+        bound = self.z * (np.sqrt(max(quad, 0.0)) + np.abs(d) @ np.sqrt(np.diagonal(cov)[k]))
+        sub = cross = None
+        if bound > limits[2, 0]:
+            sub = cov.take(k, axis=0).take(k, axis=1)
+            svk = sv[k]
+            # sum_{i<j} d_i S_ij, the v'Sv cross terms with earlier orders
+            cross = d @ np.where(_upper(len(k)), sub, 0.0)
+        while len(k):
+            # each order's symbol value after it, counting earlier orders on that symbol
+            after = values[k] + _cumsum_by(k, d)
+            steps = np.empty((3, len(k) + 1))
+            steps[:, 0] = np.abs(values).sum(), values.sum(), quad
+            steps[0, 1:] = np.abs(after) - np.abs(after - d)
+            steps[1, 1:] = d
+            # v'Sv grows by 2 d (S v)_k + 2 d sum_{i<j} d_i S_ij + d^2 S_kk per order
+            steps[2, 1:] = 0.0 if sub is None else d * (2 * svk + 2 * cross + d * np.diagonal(sub))
+            prefix = np.cumsum(steps, axis=1)
+            measures = np.abs(prefix)
+            measures[2] = self.z * np.sqrt(np.maximum(prefix[2], 0.0))
+            breach = (measures[:, 1:] > limits) & (measures[:, 1:] > measures[:, :-1] + tolerance)
+            bad = breach.any(axis=0)
+            if not bad.any():
+                np.add.at(values, k, d)
+                return values, float(prefix[2, -1]) if sub is not None else float(values @ (cov @ values))
+            first = int(np.argmax(bad))
+            reasons[pending[first]] += [n for n, b in zip(names, breach[:, first]) if b]
+            np.add.at(values, k[:first], d[:first])
+            # the rest is a suffix: the admitted orders fold into S v and every
+            # order up to the rejected one drops out of the cross terms
+            rest = slice(first + 1, None)
+            if sub is None:
+                sv += d[:first] @ cov.take(k[:first], axis=0)
+                quad = float(values @ sv)
+            else:
+                quad = float(prefix[2, first])
+                svk = svk[rest] + d[:first] @ sub[:first, rest]
+                cross = cross[rest] - d[:first + 1] @ sub[:first + 1, rest]
+                sub = sub[rest, rest]
+            pending, k, d = pending[rest], k[rest], d[rest]
+        return values, quad
+
+    def _sector_exposure(self, values: np.ndarray, equity: float) -> np.ndarray:
+        known = self.sector >= 0
+        return np.bincount(self.sector[known], weights=np.abs(values[known]),
+                           minlength=len(self.sector_names)) / equity
+
+    def _metrics(self, values: np.ndarray, equity: float, quad: Optional[float] = None) -> Optional[Dict[str, float]]:
+        if np.isnan(equity):
+            return None
+        return {
+            "gross": float(np.abs(values).sum() / equity),
+            "net": float(abs(values.sum()) / equity),
+            "max_position": float(np.abs(values).max() / equity) if values.size else 0.0,
+            "var": self._var(values, quad) / equity,
+        }
+
+    def filter(self, orders: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """(approved orders, rejected orders with reasons)"""
+        result = self.check(orders)
+        rejected = [dict(orders[r["index"]], reasons=r["reasons"]) for r in result["rejected"]]
+        return [orders[i] for i in result["approved"]], rejected
+
+    def stats(self) -> Dict:
+        return {
+            "symbols": len(self.symbols),
+            "equity": self.equity,
+            "booked_orders": len(self._booked),
+            "covariance_symbols": int((self.last_t >= 0).sum()),
+            "limits": {"max_gross": self.max_gross, "max_net": self.max_net, "max_position_pct": self.max_position_pct,
+                       "max_sector_pct": self.max_sector_pct, "max_var_pct": self.max_var_pct},
+        }
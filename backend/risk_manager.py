@@ -1,11 +1,29 @@
 class RiskManager:
-    def __init__(self, max_drawdown_pct=0.2, risk_per_trade=0.01):
+    def __init__(self, max_drawdown_pct=0.2, risk_per_trade=0.01, target_volatility=0.02, max_position_pct=0.2):
         self.max_drawdown_pct = max_drawdown_pct
         self.risk_per_trade = risk_per_trade
+        # daily volatility at which a position gets exactly risk_per_trade of the account
+        self.target_volatility = target_volatility
+        self.max_position_pct = max_position_pct
+        # high-water mark of account equity seen so far
+        self.peak_equity = 0.0
+        self.current_drawdown = 0.0
 
-    def check_max_drawdown(self, current_drawdown):
+    def update_equity(self, equity):
+        """Track the equity high-water mark; returns the drawdown from it"""
+        self.peak_equity = max(self.peak_equity, equity)
+        self.current_drawdown = 1.0 - equity / self.peak_equity if self.peak_equity > 0 else 0.0
+        return self.current_drawdown
+
+    def check_max_drawdown(self, current_drawdown=None):
+        if current_drawdown is None:
+            current_drawdown = self.current_drawdown
         return current_drawdown <= self.max_drawdown_pct
 
     def position_size(self, account_value, volatility):
-        # basic fixed-fraction example; expand with Kelly/vol parity
-        return max(1, account_value * self.risk_per_trade)
+        # volatility-scaled fixed fraction: calmer names get larger positions,
+        # capped at max_position_pct of the account
+        if not volatility or volatility != volatility or volatility <= 0:
+            volatility = self.target_volatility
+        size = account_value * self.risk_per_trade * self.target_volatility / volatility
+        return max(1, min(size, account_value * self.max_position_pct))
@@ -0,0 +1,173 @@
+"""
+Robustness checks for the momentum backtest.
+
+- walk_forward: pick the best parameters on a rolling training window,
+  then trade them on the following unseen test window; the stitched
+  out-of-sample returns show how the rule holds up without hindsight.
+- bootstrap: Monte-Carlo resampling of per-period (or per-trade) returns,
+  simulated as (n_sims x n_periods) arrays in memory-bounded chunks, giving
+  confidence intervals for total return, Sharpe and max drawdown.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backtest import TRADING_DAYS_PER_YEAR, forward_fill, max_drawdown, run_backtest, sharpe_ratio
+
+# per-chunk budget for the simulation arrays
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def _score(metrics: Dict, metric: str) -> float:
+    value = metrics[metric]
+    return -value if metric == 'max_drawdown' else value
+
+
+def walk_forward(prices: np.ndarray, params: List[Dict], train_days: int = 252, test_days: int = 63,
+                 step: Optional[int] = None, metric: str = 'sharpe_ratio', dates: Optional[Sequence] = None,
+                 initial_capital: float = 100000.0, **backtest_kwargs) -> Dict:
+    """
+    Rolling walk-forward over `prices` (dates x symbols). In each window
+    every parameter dict is scored on `train_days` bars, and the winner is
+    run on the next `test_days` bars (with its lookback as warm-up only).
+    Windows advance by `step` bars (default: test_days, so test windows tile).
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim == 1:
+        prices = prices[:, np.newaxis]
+    prices = forward_fill(prices)
+    step = step or test_days
+    n = prices.shape[0]
+    if not params:
+        raise ValueError("params must contain at least one parameter set")
+    if train_days + test_days > n:
+        raise ValueError(f"need at least {train_days + test_days} bars, got {n}")
+
+    windows = []
+    oos_returns = []
+    for train_start in range(0, n - train_days - test_days + 1, step):
+        train_end = train_start + train_days
+        test_end = min(train_end + test_days, n)
+        train = prices[train_start:train_end]
+        scored = [(run_backtest(train, **dict(backtest_kwargs, **p)), p) for p in params]
+        in_sample, best = max(scored, key=lambda s: _score(s[0], metric))
+
+        # include the lookback before the test window so signals are warm on day one
+        warmup = min(best.get('lookback_days', 20) + backtest_kwargs.get('fill_lag', 1), train_end)
+        run = run_backtest(prices[train_end - warmup:test_end], include_series=True, **dict(backtest_kwargs, **best))
+        returns = run["returns"][warmup:]
+        oos_returns.append(returns)
+        equity = np.cumprod(1.0 + returns)
+        windows.append({
+            "train_start": str(dates[train_start]) if dates is not None else train_start,
+            "test_start": str(dates[train_end]) if dates is not None else train_end,
+            "test_end": str(dates[test_end - 1]) if dates is not None else test_end - 1,
+            "params": best,
+            "in_sample": {k: in_sample[k] for k in ('total_return', 'sharpe_ratio', 'max_drawdown')},
+            "out_of_sample": {
+                "total_return": float(equity[-1] - 1.0) if len(equity) else 0.0,
+                "sharpe_ratio": sharpe_ratio(returns),
+                "max_drawdown": max_drawdown(equity),
+            },
+        })
+
+    returns = np.concatenate(oos_returns) if oos_returns else np.empty(0)
+    equity = initial_capital * np.cumprod(1.0 + returns)
+    is_sharpe = np.mean([w["in_sample"]["sharpe_ratio"] for w in windows])
+    oos_sharpe = sharpe_ratio(returns)
+    return {
+        "windows": windows,
+        "out_of_sample": {
+            "bars": int(returns.size),
+            "final_equity": float(equity[-1]) if returns.size else initial_capital,
+            "total_return": float(equity[-1] / initial_capital - 1.0) if returns.size else 0.0,
+            "sharpe_ratio": oos_sharpe,
+            "max_drawdown": max_drawdown(equity),
+        },
+        # out-of-sample vs. average in-sample Sharpe; well below 1 suggests overfitting
+        "walk_forward_efficiency": float(oos_sharpe / is_sharpe) if is_sharpe else 0.0,
+        "returns": returns,
+    }
+
+
+def _resample_index(rng, n_sims: int, n_periods: int, n_values: int, block_size: int) -> np.ndarray:
+    if block_size <= 1:
+        return rng.integers(0, n_values, size=(n_sims, n_periods))
+    # moving-block bootstrap keeps short-range autocorrelation intact
+    n_blocks = -(-n_periods // block_size)
+    starts = rng.integers(0, n_values - block_size + 1, size=(n_sims, n_blocks))
+    index = (starts[:, :, np.newaxis] + np.arange(block_size)).reshape(n_sims, -1)
+    return index[:, :n_periods]
+
+
+def _interval(values: np.ndarray, confidence: float) -> Dict:
+    tail = (1.0 - confidence) / 2 * 100
+    low, median, high = np.percentile(values, [tail, 50, 100 - tail])
+    return {"mean": float(values.mean()), "median": float(median), "low": float(low), "high": float(high)}
+
+
+def bootstrap(returns, n_sims: int = 10000, n_periods: Optional[int] = None, block_size: int = 1,
+              confidence: float = 0.95, periods_per_year: Optional[int] = TRADING_DAYS_PER_YEAR,
+              seed: Optional[int] = None, max_chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Dict:
+    """
+    Monte-Carlo bootstrap of a return series: each simulation draws
+    `n_periods` returns (default: the series length) with replacement, in
+    blocks of `block_size`. Pass trade returns with periods_per_year=None
+    for a per-trade (unannualised) Sharpe. Returns confidence intervals for
+    total return, Sharpe and max drawdown, plus the probability of a loss.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    returns = returns[np.isfinite(returns)]
+    if returns.size < 2:
+        raise ValueError("need at least two returns to bootstrap")
+    n_periods = n_periods or returns.size
+    block_size = max(1, min(block_size, returns.size))
+    rng = np.random.default_rng(seed)
+
+    # index, sampled returns and equity curve are the large arrays per sim
+    per_sim = n_periods * 8 * 3
+    chunk = max(1, min(n_sims, max_chunk_bytes // per_sim))
+    total_return = np.empty(n_sims)
+    sharpe = np.empty(n_sims)
+    drawdown = np.empty(n_sims)
+    scale = np.sqrt(periods_per_year) if periods_per_year else 1.0
+
+    for start in range(0, n_sims, chunk):
+        size = min(chunk, n_sims - start)
+        sample = returns[_resample_index(rng, size, n_periods, returns.size, block_size)]
+        std = sample.std(axis=1, ddof=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe[start:start + size] = np.where(std > 0, sample.mean(axis=1) / std * scale, 0.0)
+        equity = np.cumprod(1.0 + sample, axis=1)
+        total_return[start:start + size] = equity[:, -1] - 1.0
+        peaks = np.maximum.accumulate(equity, axis=1)
+        drawdown[start:start + size] = np.max(1.0 - equity / peaks, axis=1)
+
+    return {
+        "n_sims": n_sims,
+        "n_periods": n_periods,
+        "block_size": block_size,
+        "confidence": confidence,
+        "total_return": _interval(total_return, confidence),
+        "sharpe_ratio": _interval(sharpe, confidence),
+        "max_drawdown": _interval(drawdown, confidence),
+        "probability_of_loss": float((total_return < 0).mean()),
+    }
+
+
+def robustness_report(prices: np.ndarray, params: List[Dict], train_days: int = 252, test_days: int = 63,
+                      n_sims: int = 10000, block_size: int = 5, seed: Optional[int] = None,
+                      dates: Optional[Sequence] = None, **backtest_kwargs) -> Dict:
+    """Walk-forward, then bootstrap its out-of-sample returns (and, for one symbol, the trades)"""
+    wf = walk_forward(prices, params, train_days, test_days, dates=dates, **backtest_kwargs)
+    report = {"walk_forward": {k: v for k, v in wf.items() if k != 'returns'}}
+    if wf["returns"].size >= 2:
+        report["return_bootstrap"] = bootstrap(wf["returns"], n_sims, block_size=block_size, seed=seed)
+    if np.ndim(prices) == 1 or np.shape(prices)[1] == 1:
+        # compounding trades one after another only models a single-symbol
+        # book; with several symbols the trades overlap in time
+        full = run_backtest(prices, include_series=True, **dict(backtest_kwargs, **wf["windows"][-1]["params"]))
+        if full["trade_returns"].size >= 2:
+            report["trade_bootstrap"] = bootstrap(full["trade_returns"], n_sims, periods_per_year=None, seed=seed)
+    return report
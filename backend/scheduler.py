@@ -1,9 +1,234 @@
+"""
+Trading-session scheduler.
+
+Jobs run on APScheduler's asyncio scheduler with triggers relative to the
+exchange session from market_calendar (open + N minutes, close - N minutes,
+or every N seconds while the market is open), so holidays and early closes
+are handled without special cases. Each job is wrapped so a slow run never
+overlaps the next one: the new run is either skipped or coalesced into a
+single re-run once the current one finishes. Run time and start lag
+(actual start - scheduled time) are kept per job as histograms.
+"""
+
+import asyncio
+import logging
+import math
+import re
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_SUBMITTED
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.base import BaseTrigger
+
+from market_calendar import MarketCalendar
+from metrics import JOB_LAG_SECONDS, JOB_RUN_SECONDS
+
+logger = logging.getLogger(__name__)
 
 scheduler = AsyncIOScheduler()
+calendar = MarketCalendar()
+jobs: Dict[str, "ScheduledJob"] = {}
+
+OVERLAP_POLICIES = ('skip', 'coalesce')
+
+
+class SessionTrigger(BaseTrigger):
+    """
+    kind='open': `minutes` after each session opens; kind='close': `minutes`
+    before each session closes; kind='interval': every `seconds` from open +
+    `minutes` until the close.
+    """
+
+    def __init__(self, kind: str = 'open', minutes: float = 0, seconds: Optional[float] = None,
+                 calendar: MarketCalendar = calendar):
+        if kind not in ('open', 'close', 'interval'):
+            raise ValueError(f"unknown session trigger {kind!r}")
+        if kind == 'interval' and not seconds or seconds is not None and seconds <= 0:
+            raise ValueError("interval triggers need seconds > 0")
+        self.kind = kind
+        self.offset = timedelta(minutes=minutes)
+        self.step = timedelta(seconds=seconds) if seconds else None
+        self.calendar = calendar
+
+    def _next_in_session(self, opens: datetime, closes: datetime, start: datetime) -> Optional[datetime]:
+        if self.kind == 'open':
+            t = opens + self.offset
+        elif self.kind == 'close':
+            t = closes - self.offset
+        else:
+            first = opens + self.offset
+            t = first if start <= first else first + self.step * math.ceil((start - first) / self.step)
+            if t >= closes:
+                return None
+        return t if t >= start else None
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        # like CronTrigger: resume from just after the last fire time so
+        # missed runs surface as misfires instead of disappearing
+        start = now if previous_fire_time is None else min(now, previous_fire_time + timedelta(microseconds=1))
+        start = start.astimezone(self.calendar.tz)
+        day = start.date()
+        for _ in range(30):
+            session = self.calendar.session(day)
+            if session is not None:
+                t = self._next_in_session(*session, start)
+                if t is not None:
+                    return t
+            day += timedelta(days=1)
+        return None
+
+    def __str__(self):
+        if self.kind == 'interval':
+            return f"session every {self.step.total_seconds():g}s from open+{self.offset}"
+        return f"session {self.kind}{'+' if self.kind == 'open' else '-'}{self.offset}"
+
+
+def parse_schedule(spec: str, calendar: MarketCalendar = calendar) -> SessionTrigger:
+    """'open', 'open+5' (minutes), 'close-15', 'every:60' (seconds, intraday) -> SessionTrigger"""
+    spec = spec.strip().lower()
+    # offsets point into the session: after the open, before the close
+    m = re.fullmatch(r'open(?:\s*\+\s*(\d+(?:\.\d+)?))?', spec)
+    if m:
+        return SessionTrigger('open', minutes=float(m.group(1) or 0), calendar=calendar)
+    m = re.fullmatch(r'close(?:\s*-\s*(\d+(?:\.\d+)?))?', spec)
+    if m:
+        return SessionTrigger('close', minutes=float(m.group(1) or 0), calendar=calendar)
+    m = re.fullmatch(r'every:(\d+(?:\.\d+)?)', spec)
+    if m:
+        return SessionTrigger('interval', seconds=float(m.group(1)), calendar=calendar)
+    raise ValueError(f"bad schedule {spec!r}; expected open[+N], close[-N] or every:SECONDS")
+
+
+class ScheduledJob:
+    """Overlap guard and timing stats around one scheduled callable (sync or async)"""
+
+    def __init__(self, func: Callable, name: str, overlap: str = 'skip'):
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"overlap must be one of {OVERLAP_POLICIES}")
+        self.func = func
+        self.name = name
+        self.overlap = overlap
+        self.running = False
+        self._pending: Optional[datetime] = None
+        # scheduled times of submitted runs, filled by the submission listener
+        self._scheduled = deque(maxlen=16)
+        self.run_time = JOB_RUN_SECONDS.labels(name)
+        self.lag = JOB_LAG_SECONDS.labels(name)
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.last_error: Optional[str] = None
+        self.last_finished: Optional[datetime] = None
+
+    async def run(self):
+        scheduled = self._scheduled.popleft() if self._scheduled else None
+        if self.running:
+            if self.overlap == 'coalesce':
+                self.coalesced += 1
+                # several late runs collapse into one re-run
+                self._pending = self._pending or scheduled or datetime.now().astimezone()
+            else:
+                self.skipped += 1
+                logger.warning(f"Job {self.name} still running, skipping run scheduled for {scheduled}")
+            return
+        self.running = True
+        try:
+            while True:
+                await self._run_once(scheduled)
+                if self._pending is None:
+                    break
+                scheduled, self._pending = self._pending, None
+        finally:
+            self.running = False
+
+    async def _run_once(self, scheduled: Optional[datetime]):
+        if scheduled is not None:
+            self.lag.observe(max(0.0, (datetime.now(scheduled.tzinfo) - scheduled).total_seconds()))
+        started = time.perf_counter()
+        try:
+            result = self.func()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.error(f"Job {self.name} failed: {e}")
+        finally:
+            self.runs += 1
+            self.run_time.observe(time.perf_counter() - started)
+            self.last_finished = datetime.now().astimezone()
+
+    def stats(self) -> Dict:
+        job = scheduler.get_job(self.name)
+        next_run = getattr(job, 'next_run_time', None)
+        return {
+            "overlap": self.overlap,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "coalesced": self.coalesced,
+            "next_run": next_run.isoformat() if next_run else None,
+            "last_finished": self.last_finished.isoformat() if self.last_finished else None,
+            "last_error": self.last_error,
+            "run_time_s": self.run_time.snapshot(),
+            "lag_s": self.lag.snapshot(),
+        }
+
+
+def _on_job_event(event):
+    job = jobs.get(event.job_id)
+    if job is None:
+        return
+    if event.code == EVENT_JOB_MAX_INSTANCES:
+        job.skipped += 1
+    else:
+        job._scheduled.extend(event.scheduled_run_times[-1:])
+
+
+scheduler.add_listener(_on_job_event, EVENT_JOB_SUBMITTED | EVENT_JOB_MAX_INSTANCES)
+
 
 def start_scheduler():
-    scheduler.start()
+    if not scheduler.running:
+        scheduler.start()
+
+
+def stop_scheduler():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+
 
 def add_daily_job(func, hour=0, minute=0):
     scheduler.add_job(func, 'cron', hour=hour, minute=minute)
+
+
+def add_session_job(func: Callable, trigger, name: Optional[str] = None, overlap: str = 'skip',
+                    misfire_grace_time: Optional[float] = None) -> ScheduledJob:
+    """
+    Schedule `func` on a SessionTrigger (or a parse_schedule spec string).
+    A run that is late by more than `misfire_grace_time` seconds (default:
+    the interval, or 5 minutes for open/close jobs) is dropped.
+    """
+    if isinstance(trigger, str):
+        trigger = parse_schedule(trigger)
+    name = name or getattr(func, '__qualname__', repr(func))
+    if misfire_grace_time is None:
+        misfire_grace_time = trigger.step.total_seconds() if trigger.step else 300
+    # APScheduler only accepts whole seconds here
+    misfire_grace_time = max(1, math.ceil(misfire_grace_time))
+    job = ScheduledJob(func, name, overlap)
+    jobs[name] = job
+    # the guard sees overlapping runs itself; the instance cap only backstops it
+    scheduler.add_job(job.run, trigger=trigger, id=name, name=name, replace_existing=True,
+                      coalesce=True, max_instances=3, misfire_grace_time=misfire_grace_time)
+    logger.info(f"Scheduled {name} ({trigger}, overlap={overlap})")
+    return job
+
+
+def job_stats() -> Dict:
+    return {name: job.stats() for name, job in jobs.items()}
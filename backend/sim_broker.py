@@ -0,0 +1,410 @@
+"""
+Offline simulated broker.
+
+SimulatedBroker has AlpacaClient's async surface (get_account,
+get_positions, create_order, get_last_quote(s), get_bars) but never touches
+the network. It replays historical bars on a simulated clock and routes
+orders through an in-process matching engine:
+
+- the clock reads the timestamp of the latest completed bar, and quotes are
+  that bar's close;
+- market orders fill at the next bar's open;
+- limit orders fill on a later bar that trades through the limit price, at
+  the open if the bar gaps past it;
+- day / ioc / fok orders expire when their first session passes unfilled,
+  while gtc orders rest until filled;
+- every fill pays `slippage_bps` against the order and a commission of
+  `commission_per_share` plus `commission_bps` of the notional.
+
+Payloads have the HTTP transport's shape (plain dicts, numbers as strings),
+so PortfolioState, the execution planner and strategies run against it
+unchanged. The broker also serves the BarStore read interface, capped at
+the clock, so indicators only ever see the past:
+
+    broker = SimulatedBroker.from_bar_store(BarStore('data/bars'), ['SPY', 'QQQ'], start='2020-01-01')
+    strategy = MomentumStrategy(broker, bar_store=broker, portfolio=PortfolioState(broker, ttl=0))
+    result = await broker.run(strategy.execute_strategy, warmup=strategy.lookback_days)
+"""
+
+import asyncio
+import datetime
+import itertools
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from backtest import TRADING_DAYS_PER_YEAR, forward_fill, max_drawdown, sharpe_ratio
+from bar_store import COLUMNS, to_end_epoch, to_epoch
+
+ORDER_TYPES = ('market', 'limit')
+TIME_IN_FORCE = ('day', 'gtc', 'ioc', 'fok')
+
+
+class SimulatedBrokerError(Exception):
+    """Order rejected by the simulated broker; status codes follow Alpaca's (403 funds/qty, 422 invalid)"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Simulated broker error {status_code}: {message}")
+        self.status_code = status_code
+
+
+def _iso(ts: float) -> str:
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+class SimClock:
+    """Simulated time: epoch seconds of the latest replayed bar"""
+
+    def __init__(self, start: float = 0.0):
+        self.ts = float(start)
+
+    def time(self) -> float:
+        return self.ts
+
+    # PortfolioState / rate-limiter style clock
+    monotonic = time
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.ts, datetime.timezone.utc)
+
+    def utcnow(self) -> datetime.datetime:
+        """Naive UTC, as datetime.utcnow()"""
+        return datetime.datetime.utcfromtimestamp(self.ts)
+
+
+class SimulatedBroker:
+    def __init__(self, bars: Dict[str, Dict[str, np.ndarray]], initial_cash: float = 100000.0,
+                 slippage_bps: float = 0.0, commission_per_share: float = 0.0, commission_bps: float = 0.0,
+                 allow_short: bool = False):
+        """
+        `bars` maps symbol -> BarStore-style columns ('t' epoch seconds,
+        'open', 'high', 'low', 'close', optional 'volume'); open/high/low
+        default to the close.
+        """
+        self.symbols = list(bars)
+        self.index = {s: j for j, s in enumerate(self.symbols)}
+        self._columns = {}
+        for symbol, b in bars.items():
+            t = np.asarray(b['t'], dtype=np.int64)
+            order = np.argsort(t, kind='stable')
+            columns = {'t': t[order]}
+            for name in ('open', 'high', 'low', 'close', 'volume'):
+                values = b.get(name)
+                if values is None:
+                    values = np.zeros(len(t)) if name == 'volume' else b['close']
+                columns[name] = np.asarray(values, dtype=COLUMNS[name])[order]
+            self._columns[symbol] = columns
+        # (dates x symbols) matrices on the union timeline; NaN where a symbol has no bar
+        stamps = [c['t'] for c in self._columns.values() if len(c['t'])]
+        self.dates = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype=np.int64)
+        shape = (len(self.dates), len(self.symbols))
+        self.open, self.high, self.low, self.close = (np.full(shape, np.nan) for _ in range(4))
+        for j, symbol in enumerate(self.symbols):
+            c = self._columns[symbol]
+            rows = np.searchsorted(self.dates, c['t'])
+            for matrix, name in ((self.open, 'open'), (self.high, 'high'), (self.low, 'low'), (self.close, 'close')):
+                matrix[rows, j] = c[name]
+        # quotes carry the last close forward over gaps
+        self.last = forward_fill(self.close)
+        self.session_days = self.dates // 86400
+
+        self.clock = SimClock(self.dates[0] if len(self.dates) else 0)
+        self.i = -1  # current bar row; -1 before the first step
+        self.initial_cash = initial_cash
+        self.cash = initial_cash
+        self.qty = np.zeros(len(self.symbols))
+        self.cost = np.zeros(len(self.symbols))  # signed cost basis of open positions
+        self.slippage = slippage_bps / 1e4
+        self.commission_per_share = commission_per_share
+        self.commission_rate = commission_bps / 1e4
+        self.allow_short = allow_short
+        self.orders: Dict[str, Dict] = {}
+        self.open_orders: List[Dict] = []
+        self.order_listeners = []
+        self._ids = itertools.count(1)
+        self.equity = np.full(len(self.dates), np.nan)
+        self.fills = 0
+        self.commission_paid = 0.0
+        self.realized_pl = 0.0
+
+    @classmethod
+    def from_bar_store(cls, store, symbols: Iterable[str], start=None, end=None, **kwargs) -> "SimulatedBroker":
+        return cls({s: store.read(s, start, end) for s in symbols}, **kwargs)
+
+    # -- AlpacaClient surface ----------------------------------------------
+
+    async def close(self):
+        pass
+
+    def add_order_listener(self, callback):
+        self.order_listeners.append(callback)
+
+    def limiter_stats(self):
+        return {}
+
+    def quote_cache_stats(self):
+        return {}
+
+    async def get_account(self):
+        long_value, short_value = self._market_values()
+        equity = self.cash + long_value + short_value
+        return {
+            "id": "sim-account", "status": "ACTIVE", "currency": "USD",
+            "cash": f"{self.cash:.2f}", "buying_power": f"{self.buying_power():.2f}",
+            "portfolio_value": f"{equity:.2f}", "equity": f"{equity:.2f}",
+            "last_equity": f"{self._last_equity():.2f}",
+            "long_market_value": f"{long_value:.2f}", "short_market_value": f"{short_value:.2f}",
+        }
+
+    async def get_positions(self):
+        positions = []
+        for j in np.flatnonzero(self.qty):
+            qty, price = self.qty[j], self._price(j)
+            value = qty * price
+            positions.append({
+                "symbol": self.symbols[j], "qty": f"{abs(qty):.10g}", "side": "long" if qty > 0 else "short",
+                "avg_entry_price": f"{self.cost[j] / qty:.4f}", "current_price": f"{price:.4f}",
+                "market_value": f"{value:.2f}", "cost_basis": f"{self.cost[j]:.2f}",
+                "unrealized_pl": f"{value - self.cost[j]:.2f}",
+            })
+        return positions
+
+    async def create_order(self, symbol, qty, side, type='market', time_in_force='day', limit_price=None):
+        order = self.submit(symbol, qty, side, type, time_in_force, limit_price)
+        for callback in self.order_listeners:
+            callback(order)
+        return order
+
+    async def get_last_quote(self, symbol):
+        j = self.index.get(symbol)
+        if j is None or self.i < 0 or np.isnan(self.last[self.i, j]):
+            return None
+        return {"symbol": symbol, "price": float(self.last[self.i, j]), "timestamp": _iso(self.clock.time())}
+
+    async def get_last_quotes(self, symbols, chunk_size=None):
+        quotes = {}
+        for symbol in symbols:
+            quote = await self.get_last_quote(symbol)
+            if quote is not None:
+                quotes[symbol] = quote
+        return quotes
+
+    async def get_bars(self, symbols, start, end, timeframe='1Day'):
+        """Replayed bars up to the clock, in AlpacaClient.get_bars format (`timeframe` is the data's own)"""
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        result = {}
+        for symbol in symbols:
+            b = self.read(symbol, start, end) if symbol in self.index else {'t': []}
+            result[symbol] = [
+                {"t": _iso(b['t'][k]), "o": float(b['open'][k]), "h": float(b['high'][k]),
+                 "l": float(b['low'][k]), "c": float(b['close'][k]), "v": float(b['volume'][k])}
+                for k in range(len(b['t']))
+            ]
+        return result
+
+    # -- BarStore read interface, capped at the clock -----------------------
+
+    def read(self, symbol: str, start=None, end=None, columns: Iterable[str] = None) -> Dict[str, np.ndarray]:
+        c = self._columns[symbol]
+        now = self.clock.time() if self.i >= 0 else -np.inf
+        end = now if end is None else min(to_end_epoch(end), now)
+        lo = 0 if start is None else int(np.searchsorted(c['t'], to_epoch(start), side='left'))
+        hi = int(np.searchsorted(c['t'], end, side='right'))
+        return {name: c[name][lo:hi] for name in (columns or COLUMNS)}
+
+    # -- matching engine ----------------------------------------------------
+
+    def _price(self, j: int) -> float:
+        return float(self.last[self.i, j]) if self.i >= 0 else np.nan
+
+    def _market_values(self):
+        if self.i < 0:
+            return 0.0, 0.0
+        values = np.nan_to_num(self.qty * self.last[self.i])
+        return float(values[values > 0].sum()), float(values[values < 0].sum())
+
+    def _last_equity(self) -> float:
+        marked = self.equity[:max(self.i, 0)]
+        marked = marked[~np.isnan(marked)]
+        return float(marked[-1]) if marked.size else self.initial_cash
+
+    def _reserved(self, side: str, j: Optional[int] = None) -> float:
+        """Cash (buys) or shares of symbol j (sells) committed to open orders"""
+        if side == 'buy':
+            return sum(o['_estimate'] for o in self.open_orders if o['side'] == 'buy')
+        return sum(float(o['qty']) for o in self.open_orders if o['side'] == 'sell' and o['_j'] == j)
+
+    def buying_power(self) -> float:
+        """Cash not committed to open buy orders (no margin)"""
+        return max(0.0, self.cash - self._reserved('buy'))
+
+    def submit(self, symbol, qty, side, type='market', time_in_force='day', limit_price=None) -> Dict:
+        j = self.index.get(symbol)
+        qty = float(qty)
+        if j is None:
+            raise SimulatedBrokerError(422, f"asset {symbol} not found")
+        if qty <= 0 or side not in ('buy', 'sell') or type not in ORDER_TYPES or time_in_force not in TIME_IN_FORCE:
+            raise SimulatedBrokerError(422, f"invalid order: {qty} {side} {type} {time_in_force}")
+        if type == 'limit' and (limit_price is None or float(limit_price) <= 0):
+            raise SimulatedBrokerError(422, "limit orders require a positive limit_price")
+        if self.i < 0 or np.isnan(self.last[self.i, j]):
+            raise SimulatedBrokerError(422, f"no price for {symbol} yet")
+        price = float(limit_price) if type == 'limit' else self._price(j) * (1 + self.slippage)
+        estimate = 0.0
+        if side == 'buy':
+            estimate = qty * price + self._commission(qty, price)
+            if estimate > self.buying_power():
+                raise SimulatedBrokerError(403, "insufficient buying power")
+        elif not self.allow_short and qty > self.qty[j] - self._reserved('sell', j) + 1e-9:
+            raise SimulatedBrokerError(403, f"insufficient qty available for order (requested: {qty:.10g})")
+        now = _iso(self.clock.time())
+        order = {
+            "id": f"sim-order-{next(self._ids)}", "client_order_id": None,
+            "symbol": symbol, "qty": f"{qty:.10g}", "side": side, "type": type, "time_in_force": time_in_force,
+            "limit_price": None if limit_price is None else f"{float(limit_price):.10g}",
+            "status": "new", "filled_qty": "0", "filled_avg_price": None,
+            "created_at": now, "submitted_at": now, "filled_at": None,
+        }
+        self.orders[order["id"]] = order
+        self.open_orders.append(dict(order, _j=j, _estimate=estimate, _session=None))
+        return dict(order)
+
+    def _commission(self, qty: float, price: float) -> float:
+        return qty * self.commission_per_share + qty * price * self.commission_rate
+
+    def _match(self):
+        """Try every open order against the bar just replayed"""
+        i = self.i
+        still_open = []
+        for order in self.open_orders:
+            j = order['_j']
+            bar_open = self.open[i, j]
+            if np.isnan(bar_open):
+                # no bar for this symbol today; the order keeps waiting
+                still_open.append(order)
+                continue
+            session = self.session_days[i]
+            if order['_session'] is None:
+                order['_session'] = session
+            elif order['time_in_force'] != 'gtc' and session != order['_session']:
+                self._close(order, 'expired')
+                continue
+            price = self._fill_price(order, bar_open, self.high[i, j], self.low[i, j])
+            if price is None:
+                if order['time_in_force'] in ('ioc', 'fok'):
+                    self._close(order, 'canceled')
+                else:
+                    still_open.append(order)
+                continue
+            self._fill(order, j, price)
+        self.open_orders = still_open
+
+    def _fill_price(self, order: Dict, bar_open: float, high: float, low: float) -> Optional[float]:
+        buy = order['side'] == 'buy'
+        slip = 1 + self.slippage if buy else 1 - self.slippage
+        if order['type'] == 'market':
+            return bar_open * slip
+        limit = float(order['limit_price'])
+        if buy and low <= limit:
+            return min(min(bar_open, limit) * slip, limit)
+        if not buy and high >= limit:
+            return max(max(bar_open, limit) * slip, limit)
+        return None
+
+    def _fill(self, order: Dict, j: int, price: float):
+        qty = float(order['qty'])
+        signed = qty if order['side'] == 'buy' else -qty
+        commission = self._commission(qty, price)
+        held = self.qty[j]
+        if held and np.sign(held) != np.sign(signed):
+            # closing (part of) a position realizes P&L against its average cost
+            closed = min(abs(signed), abs(held))
+            avg = self.cost[j] / held
+            self.realized_pl += closed * (price - avg) * np.sign(held)
+            self.cost[j] -= avg * closed * np.sign(held)
+            opened = abs(signed) - closed
+            self.cost[j] += opened * price * np.sign(signed)
+        else:
+            self.cost[j] += signed * price
+        self.qty[j] = held + signed
+        if abs(self.qty[j]) < 1e-9:
+            self.qty[j] = 0.0
+            self.cost[j] = 0.0
+        self.cash -= signed * price + commission
+        self.fills += 1
+        self.commission_paid += commission
+        self.realized_pl -= commission
+        self._close(order, 'filled', filled_avg_price=f"{price:.4f}", filled_qty=order['qty'],
+                    filled_at=_iso(self.clock.time()))
+
+    def _close(self, order: Dict, status: str, **fields):
+        self.orders[order['id']].update(status=status, **fields)
+
+    def cancel_all(self):
+        for order in self.open_orders:
+            self._close(order, 'canceled')
+        self.open_orders = []
+
+    # -- replay ---------------------------------------------------------------
+
+    def step(self) -> bool:
+        """Replay the next bar: advance the clock, match open orders, mark equity. False at the end."""
+        if self.i + 1 >= len(self.dates):
+            return False
+        self.i += 1
+        self.clock.ts = float(self.dates[self.i])
+        if self.open_orders:
+            self._match()
+        self.equity[self.i] = self.cash + float(np.nansum(self.qty * self.last[self.i]))
+        return True
+
+    async def run(self, on_bar: Optional[Callable] = None, warmup: int = 0, every: int = 1) -> Dict:
+        """
+        Replay every remaining bar, calling `on_bar()` (sync or async) after
+        each `every`-th one once `warmup` bars have been seen. Returns summary
+        metrics in backtest.run_backtest's terms.
+        """
+        started = time.perf_counter()
+        first = self.i + 1
+        calls = 0
+        while self.step():
+            if on_bar is not None and self.i >= warmup and (self.i - warmup) % every == 0:
+                result = on_bar()
+                if asyncio.iscoroutine(result):
+                    await result
+                calls += 1
+        return self.summary(elapsed=time.perf_counter() - started, steps=self.i + 1 - first, calls=calls)
+
+    def summary(self, elapsed: float = None, steps: int = None, calls: int = None) -> Dict:
+        equity = self.equity[:self.i + 1]
+        equity = equity[~np.isnan(equity)]
+        returns = equity[1:] / equity[:-1] - 1.0 if equity.size > 1 else np.empty(0)
+        statuses = {}
+        for order in self.orders.values():
+            statuses[order['status']] = statuses.get(order['status'], 0) + 1
+        result = {
+            "symbols": self.symbols,
+            "start_date": _iso(self.dates[0]) if len(self.dates) else None,
+            "end_date": _iso(self.clock.time()) if self.i >= 0 else None,
+            "bars": int(self.i + 1),
+            "initial_capital": self.initial_cash,
+            "final_equity": float(equity[-1]) if equity.size else self.initial_cash,
+            "total_return": float(equity[-1] / self.initial_cash - 1.0) if equity.size else 0.0,
+            "sharpe_ratio": sharpe_ratio(returns, TRADING_DAYS_PER_YEAR),
+            "max_drawdown": max_drawdown(equity),
+            "realized_pl": round(float(self.realized_pl), 2),
+            "commission": round(float(self.commission_paid), 2),
+            "fills": self.fills,
+            "orders": statuses,
+        }
+        if elapsed is not None:
+            symbol_bars = int(np.count_nonzero(~np.isnan(self.close[self.i + 1 - steps:self.i + 1])))
+            result.update({
+                "elapsed_s": round(elapsed, 4),
+                "steps": steps,
+                "strategy_calls": calls,
+                "bars_per_second": round(symbol_bars / elapsed, 1) if elapsed > 0 else None,
+            })
+        return result
@@ -1,14 +1,95 @@
-from typing import List
+from typing import Dict, List, Optional
 import datetime
 
-# Placeholder strategy engine — expand with vectorbt/backtrader as needed
+from backtest import bars_to_matrix, run_backtest
+from order_journal import order_event
+from portfolio_state import PortfolioState
+from robustness import robustness_report
+from sweep import param_grid
+
+# Base strategy engine — subclasses provide signals and execution
 class StrategyEngine:
-    def __init__(self, alpaca_client):
+    def __init__(self, alpaca_client, bar_store=None, journal=None, portfolio=None):
         self.alpaca = alpaca_client
+        # cached account/positions, shared with the API when one is passed in
+        self.portfolio = portfolio or PortfolioState.shared(alpaca_client)
+        # optional local history (bar_store.BarStore) for lookbacks/backtests
+        self.bar_store = bar_store
+        # optional order_journal.OrderJournal; orders are persisted write-behind
+        self.journal = journal
+
+    def compute_signals(self, symbols: List[str], prices) -> Dict[str, str]:
+        """
+        {symbol: 'buy' | 'sell' | 'hold'} from the latest `prices` (aligned with
+        `symbols`, NaN when unknown). Pure computation with no I/O, so
+        strategy_runner can run it in a worker process over a shard.
+
+        Optional: the base engine has no signal model of its own. Only
+        strategies handed to strategy_runner must override it, and
+        StrategyRunner rejects those that don't when it is built.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not implement compute_signals")
+
+    def now(self) -> datetime.datetime:
+        """Naive UTC now, or simulated time when the client carries a clock (sim_broker.SimulatedBroker)"""
+        clock = getattr(self.alpaca, 'clock', None)
+        return clock.utcnow() if clock is not None else datetime.datetime.utcnow()
+
+    async def record_order(self, symbol: str, qty: float, side: str, order=None, **kwargs):
+        """Queue an order event for the journal (no-op without one)"""
+        if self.journal is not None:
+            await self.journal.record(order_event(symbol, qty, side, order, **kwargs))
+
+    async def backtest_momentum(self, symbols: List[str], start: str, end: str,
+                                prices=None, dates=None,
+                                lookback_days: Optional[int] = None,
+                                momentum_threshold: Optional[float] = None,
+                                **kwargs):
+        """
+        Run the vectorized momentum backtest.
+
+        `prices` is a (dates x symbols) close matrix; when omitted it is read
+        from the local bar store if there is one, else the daily bars for
+        `symbols` between `start` and `end` are fetched from Alpaca.
+        Rule parameters default to the strategy's own lookback/threshold.
+        """
+        if prices is None:
+            dates, prices = await self._load_prices(symbols, start, end)
+        result = run_backtest(
+            prices,
+            lookback_days=lookback_days or getattr(self, 'lookback_days', 20),
+            momentum_threshold=momentum_threshold if momentum_threshold is not None else getattr(self, 'momentum_threshold', 0.05),
+            dates=dates,
+            symbols=symbols,
+            **kwargs
+        )
+        result["start_date"] = result["start_date"] or start
+        result["end_date"] = result["end_date"] or end
+        return result
+
+    async def _load_prices(self, symbols: List[str], start: str, end: str):
+        """(dates, dates x symbols closes) from the bar store, else from Alpaca"""
+        if self.bar_store is not None:
+            dates, prices = self.bar_store.price_matrix(symbols, start, end)
+            if len(prices):
+                return dates.astype('datetime64[s]'), prices
+        bars = await self.alpaca.get_bars(symbols, start, end)
+        return bars_to_matrix(bars, symbols)
 
-    async def backtest_momentum(self, symbols: List[str], start: str, end: str):
-        # placeholder - implement vectorbt/backtrader based backtests
-        return {"symbols": symbols, "start": start, "end": end, "result": "not_implemented"}
+    async def analyze_robustness(self, symbols: List[str], start: str, end: str, params: Optional[List[Dict]] = None,
+                                 prices=None, dates=None, **kwargs):
+        """
+        Walk-forward + Monte-Carlo bootstrap report (see robustness.py).
+        `params` defaults to a small grid around the strategy's own settings.
+        """
+        if prices is None:
+            dates, prices = await self._load_prices(symbols, start, end)
+        if params is None:
+            lookback = getattr(self, 'lookback_days', 20)
+            threshold = getattr(self, 'momentum_threshold', 0.05)
+            params = param_grid(lookback_days=sorted({max(2, lookback // 2), lookback, lookback * 2}),
+                                momentum_threshold=[threshold / 2, threshold, threshold * 2])
+        return robustness_report(prices, params, dates=dates, **kwargs)
 
     async def execute_daily_momentum(self):
         # fetch signals and execute orders
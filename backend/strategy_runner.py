@@ -0,0 +1,381 @@
+"""
+Sharded multi-strategy runner.
+
+The symbol universe is split into contiguous shards, one worker process per
+shard. Each worker keeps its own instance of every strategy, restricted to
+its shard, so indicator state stays warm between ticks. The parent fetches
+quotes once per tick for the whole universe (batched, or from the stream)
+and publishes them into a shared-memory price table; workers read their
+slice straight from it, run each strategy's compute_signals and send back
+only the actionable (non-hold) signals. These are merged per strategy onto
+one execution queue, drained by a single consumer that submits orders
+through the execution planner. Strategy CPU never runs on the API event
+loop, and strategies never race each other for a positions snapshot.
+
+    runner = StrategyRunner(client, {'momentum': MomentumStrategy}, universe, workers=4, bar_store_root='data/bars',
+                            portfolio=portfolio_state, journal=order_journal)
+    await runner.start()
+    await runner.tick()        # e.g. from scheduler.add_session_job(runner.tick, 'every:60')
+    await runner.stop()
+"""
+
+import asyncio
+import datetime
+import logging
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from execution_planner import ExecutionPlanner
+from metrics import STRATEGY_TICK_SECONDS
+from risk_manager import RiskManager
+
+logger = logging.getLogger(__name__)
+
+_HEADER = 8  # int64 sequence number
+
+
+class SharedPriceTable:
+    """
+    Latest price and timestamp per symbol in a shared-memory block, written
+    by one process and read by many. Writes bump a sequence number to odd
+    and back to even (a seqlock), so a reader never sees a half-published
+    tick.
+    """
+
+    def __init__(self, symbols: Sequence[str], name: Optional[str] = None):
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        n = len(self.symbols)
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=_HEADER + 16 * max(n, 1))
+        self.name = self.shm.name
+        self._seq = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self.prices = np.ndarray((n,), dtype=np.float64, buffer=self.shm.buf, offset=_HEADER)
+        self.timestamps = np.ndarray((n,), dtype=np.float64, buffer=self.shm.buf, offset=_HEADER + 8 * n)
+        if self.owner:
+            self._seq[0] = 0
+            self.prices[:] = np.nan
+            self.timestamps[:] = 0.0
+
+    @property
+    def seq(self) -> int:
+        return int(self._seq[0]) // 2
+
+    def publish(self, prices: Dict[str, float], ts: Optional[float] = None) -> int:
+        """Write {symbol: price} (unknown symbols are ignored); returns the new sequence number"""
+        get = self.index.get
+        rows = np.fromiter((get(s, -1) for s in prices), dtype=np.int64, count=len(prices))
+        values = np.fromiter(prices.values(), dtype=np.float64, count=len(prices))
+        known = rows >= 0
+        rows, values = rows[known], values[known]
+        self._seq[0] += 1
+        self.prices[rows] = values
+        self.timestamps[rows] = time.time() if ts is None else ts
+        self._seq[0] += 1
+        return self.seq
+
+    def read(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+        """(prices, timestamps, seq) for `rows`, copied from one consistent tick"""
+        while True:
+            start = int(self._seq[0])
+            if start % 2 == 0:
+                prices, timestamps = self.prices[rows], self.timestamps[rows]
+                if int(self._seq[0]) == start:
+                    return prices, timestamps, start // 2
+            time.sleep(0)
+
+    def close(self):
+        # views into the buffer must go before the mapping can be closed
+        del self._seq, self.prices, self.timestamps
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def shard(symbols: Sequence[str], n: int) -> List[List[str]]:
+    """Split `symbols` into `n` contiguous, near-equal shards"""
+    n = max(1, min(n, len(symbols) or 1))
+    bounds = np.linspace(0, len(symbols), n + 1).astype(int)
+    return [list(symbols[bounds[k]:bounds[k + 1]]) for k in range(n)]
+
+
+def _worker(strategies, symbols, shard_symbols, table_name, bar_store_root, conn):
+    """Worker process: own strategy instances for one shard; one compute_signals pass per tick message"""
+    bar_store = None
+    if bar_store_root:
+        from bar_store import BarStore
+        bar_store = BarStore(bar_store_root)
+    table = SharedPriceTable(symbols, name=table_name)
+    rows = np.fromiter((table.index[s] for s in shard_symbols), dtype=np.int64)
+    instances = {}
+    for name, (cls, kwargs) in strategies.items():
+        strategy = cls(None, bar_store=bar_store, **kwargs)
+        strategy.symbols = list(shard_symbols)
+        instances[name] = strategy
+    conn.send(('ready', os.getpid()))
+    try:
+        while True:
+            tick = conn.recv()
+            if tick is None:
+                break
+            prices, _, seq = table.read(rows)
+            signals, timings, errors = {}, {}, {}
+            for name, strategy in instances.items():
+                started = time.perf_counter()
+                try:
+                    computed = strategy.compute_signals(shard_symbols, prices)
+                    signals[name] = {s: v for s, v in computed.items() if v != 'hold'}
+                except Exception as e:
+                    errors[name] = f"{type(e).__name__}: {e}"
+                timings[name] = time.perf_counter() - started
+            conn.send((tick, seq, signals, timings, errors))
+    finally:
+        table.close()
+        conn.close()
+
+
+class StrategyRunner:
+    def __init__(self, client, strategies: Dict[str, Union[type, Tuple[type, Dict]]], symbols: Sequence[str],
+                 workers: Optional[int] = None, bar_store_root: Optional[str] = None, portfolio=None, journal=None,
+                 risk=None, risk_manager: Optional[RiskManager] = None, mp_context: str = 'spawn'):
+        """
+        `strategies` maps a name to a StrategyEngine subclass (or a (class,
+        kwargs) pair) implementing compute_signals; each worker builds it as
+        cls(None, bar_store=..., **kwargs). With `client` None nothing is
+        executed and tick() must be given prices.
+        """
+        self.client = client
+        self.strategies = {name: spec if isinstance(spec, tuple) else (spec, {}) for name, spec in strategies.items()}
+        from strategy_engine import StrategyEngine
+        for name, (cls, _) in self.strategies.items():
+            if getattr(cls, 'compute_signals', None) is StrategyEngine.compute_signals:
+                raise TypeError(f"strategy {name!r} ({cls.__name__}) does not implement compute_signals")
+        self.symbols = list(dict.fromkeys(symbols))
+        self.shards = shard(self.symbols, workers or os.cpu_count() or 1)
+        self.bar_store_root = bar_store_root
+        self._bar_store = None
+        self._risk_refreshed: Optional[datetime.date] = None
+        self.portfolio = portfolio
+        # spawn: the API process holds threads (executors, uvicorn) that fork would copy mid-flight
+        self._mp = multiprocessing.get_context(mp_context)
+        self.planner = ExecutionPlanner(client, portfolio=portfolio, journal=journal, risk=risk) if client is not None else None
+        self.risk_manager = risk_manager or RiskManager(max_drawdown_pct=0.15, risk_per_trade=0.02)
+        self.table: Optional[SharedPriceTable] = None
+        self._workers = []  # (process, connection)
+        # latest merged signals per strategy waiting for execution; a newer
+        # tick replaces an unexecuted one instead of queueing behind it
+        self._pending: Dict[str, Tuple[Dict[str, str], Dict[str, float]]] = {}
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._consumer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._starting: Optional[asyncio.Task] = None
+        self.ticks = 0
+        self.superseded = 0
+        self.restarts = 0
+        self.last_tick: Optional[Dict] = None
+        self.last_reports: Dict[str, Dict] = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        """Spawn the shard workers (concurrent callers share one start)"""
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._start())
+        try:
+            await asyncio.shield(self._starting)
+        except Exception:
+            self._starting = None
+            raise
+
+    async def _start(self):
+        await self._spawn_workers()
+        if self.planner is not None:
+            self._consumer = asyncio.create_task(self._execute_loop())
+        logger.info(f"Strategy runner started: {len(self.strategies)} strategies, {len(self.symbols)} symbols "
+                    f"in {len(self.shards)} shards")
+
+    async def _spawn_workers(self):
+        self.table = SharedPriceTable(self.symbols)
+        for shard_symbols in self.shards:
+            parent, child = self._mp.Pipe()
+            process = self._mp.Process(
+                target=_worker, name=f"strategy-shard-{len(self._workers)}", daemon=True,
+                args=(self.strategies, self.symbols, shard_symbols, self.table.name, self.bar_store_root, child))
+            process.start()
+            child.close()
+            self._workers.append((process, parent))
+        # workers import numpy and build their strategies; wait off the event loop
+        try:
+            await asyncio.gather(*(asyncio.to_thread(conn.recv) for _, conn in self._workers))
+        except (EOFError, OSError) as e:
+            await self._stop_workers()
+            raise RuntimeError("a strategy worker exited during startup (see its traceback above)") from e
+
+    async def _restart_workers(self):
+        """Replace every worker (and the price table); queued signals and the executor are kept"""
+        self.restarts += 1
+        await self._stop_workers()
+        await self._spawn_workers()
+
+    async def stop(self):
+        if self._consumer is not None:
+            self._consumer.cancel()
+            self._consumer = None
+        await self._stop_workers()
+        self._starting = None
+
+    async def _stop_workers(self):
+        for process, conn in self._workers:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process, conn in self._workers:
+            await asyncio.to_thread(process.join, 5)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+        self._workers = []
+        if self.table is not None:
+            self.table.close()
+            self.table = None
+
+    async def _prices(self) -> Dict[str, float]:
+        quotes = await self.client.get_last_quotes(self.symbols)
+        return {s: q['price'] for s, q in quotes.items()}
+
+    async def tick(self, prices: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        Publish prices (fetched for the whole universe unless given), run
+        every strategy on every shard and queue the merged signals for
+        execution. Returns timings and signal counts for the tick.
+        """
+        await self.start()
+        # one tick at a time: workers answer in order on their pipes
+        async with self._lock:
+            dead = [process.name for process, _ in self._workers if not process.is_alive()]
+            if dead:
+                logger.error(f"Strategy workers {', '.join(dead)} died; restarting the shard workers")
+                await self._restart_workers()
+            started = time.perf_counter()
+            if prices is None:
+                prices = await self._prices()
+            fetched = time.perf_counter()
+            self.ticks += 1
+            seq = self.table.publish(prices)
+            try:
+                for _, conn in self._workers:
+                    conn.send(self.ticks)
+                replies = await asyncio.gather(*(asyncio.to_thread(conn.recv) for _, conn in self._workers))
+            except (EOFError, OSError) as e:
+                # replies on the surviving pipes are now out of step: rebuild them all
+                await self._restart_workers()
+                raise RuntimeError("a strategy worker died during the tick; workers restarted") from e
+
+        merged = {name: {} for name in self.strategies}
+        worker_ms = {name: [] for name in self.strategies}
+        errors = {}
+        for k, (_, _, signals, timings, shard_errors) in enumerate(replies):
+            for name, shard_signals in signals.items():
+                merged[name].update(shard_signals)
+            for name, seconds in timings.items():
+                worker_ms[name].append(round(seconds * 1000, 3))
+            for name, error in shard_errors.items():
+                errors[f"{name}/{k}"] = error
+                logger.error(f"Strategy {name} failed on shard {k}: {error}")
+        elapsed = time.perf_counter() - started
+        for name in self.strategies:
+            STRATEGY_TICK_SECONDS.labels(name, 'error' if any(e.startswith(f"{name}/") for e in errors) else 'ok'
+                                         ).observe(elapsed)
+            if self.planner is not None:
+                self._enqueue(name, merged[name], prices)
+
+        self.last_tick = {
+            "tick": self.ticks,
+            "seq": seq,
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "fetch_ms": round((fetched - started) * 1000, 3),
+            "worker_ms": worker_ms,
+            "signals": {name: {"buy": sum(v == 'buy' for v in s.values()), "sell": sum(v == 'sell' for v in s.values())}
+                        for name, s in merged.items()},
+            "errors": errors,
+        }
+        return dict(self.last_tick, merged=merged)
+
+    def _enqueue(self, name: str, signals: Dict[str, str], prices: Dict[str, float]):
+        if name in self._pending:
+            self.superseded += 1
+        else:
+            self.queue.put_nowait(name)
+        self._pending[name] = (signals, prices)
+
+    async def _execute_loop(self):
+        while True:
+            name = await self.queue.get()
+            signals, prices = self._pending.pop(name)
+            try:
+                self.last_reports[name] = await self._execute(name, signals, prices)
+            except Exception as e:
+                logger.error(f"Executing {name} signals failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _execute(self, name: str, signals: Dict[str, str], prices: Dict[str, float]) -> Dict:
+        account = await self.portfolio.account() if self.portfolio is not None else await self.client.get_account()
+        account_value = float(account['portfolio_value'])
+        drawdown = self.risk_manager.update_equity(account_value)
+        if not self.risk_manager.check_max_drawdown(drawdown):
+            logger.warning(f"Risk limit exceeded ({drawdown:.1%} drawdown), not executing {name} signals")
+            return {"halted": True, "drawdown": drawdown}
+
+        def size(symbol):
+            price = prices.get(symbol)
+            if not price:
+                return None
+            return max(1, int(self.risk_manager.position_size(account_value, None) / price))
+
+        await self._refresh_risk()
+        report = await self.planner.rebalance(signals, size, tag=name, prices=prices)
+        logger.info(f"{name}: {report['submitted']} orders submitted, {report['failed']} failed, "
+                    f"{len(report['rejected'])} rejected by risk in {report['elapsed_s']}s")
+        return {k: v for k, v in report.items() if k != 'orders'}
+
+    async def _refresh_risk(self):
+        """
+        Once a day, feed the risk engine's covariance the bars the workers'
+        indicators see, in a worker thread under the engine's lock
+        """
+        risk = self.planner.risk
+        today = datetime.date.today()
+        if risk is None or self.bar_store_root is None or self._risk_refreshed == today:
+            return
+        self._risk_refreshed = today
+        if self._bar_store is None:
+            from bar_store import BarStore
+            self._bar_store = BarStore(self.bar_store_root)
+        await risk.refresh_in_thread(self._bar_store, self.symbols)
+
+    async def drain(self):
+        """Wait until every queued signal set has been executed"""
+        await self.queue.join()
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "workers": len(self._workers),
+            "symbols": len(self.symbols),
+            "strategies": list(self.strategies),
+            "ticks": self.ticks,
+            "restarts": self.restarts,
+            "queued": self.queue.qsize(),
+            "superseded": self.superseded,
+            "last_tick": self.last_tick,
+            "last_execution": self.last_reports,
+        }
@@ -0,0 +1,215 @@
+"""
+Parallel parameter sweep for the momentum backtest.
+
+The price matrix is copied once into a shared-memory block; worker
+processes attach to it in their initializer, so each task carries only a
+chunk of parameter dicts, not the prices. Chunks run on a ProcessPoolExecutor
+sized to the machine, and results are streamed back into a table that stays
+ranked by the chosen metric while the sweep runs.
+
+    python sweep.py --root data/bars --symbols SPY,QQQ,IWM --start 2015-01-01 \\
+        --lookback 5:120:5 --threshold 0.0:0.15:0.005 --top 20
+"""
+
+import argparse
+import bisect
+import csv
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from backtest import forward_fill, run_backtest
+
+# metrics where smaller is better; everything else ranks descending
+ASCENDING_METRICS = {'max_drawdown'}
+RESULT_KEYS = ('total_return', 'sharpe_ratio', 'max_drawdown', 'win_rate', 'total_trades', 'exposure', 'final_equity')
+
+_prices = None  # worker-side view of the shared price matrix
+_shm = None
+
+
+def param_grid(**values: Iterable) -> List[Dict]:
+    """Cartesian product: param_grid(lookback_days=[10, 20], momentum_threshold=[0.02, 0.05])"""
+    names = list(values)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(list(values[n]) for n in names))]
+
+
+def random_samples(space: Dict, n: int, seed: Optional[int] = None) -> List[Dict]:
+    """
+    `n` random draws from `space`: a list is sampled uniformly, a (low, high)
+    tuple uniformly in range (integers when both bounds are ints).
+    """
+    rng = random.Random(seed)
+
+    def draw(spec):
+        if isinstance(spec, tuple):
+            low, high = spec
+            return rng.randint(low, high) if isinstance(low, int) and isinstance(high, int) else rng.uniform(low, high)
+        return rng.choice(list(spec))
+
+    return [{name: draw(spec) for name, spec in space.items()} for _ in range(n)]
+
+
+def _attach(name: str, shape, dtype: str):
+    global _prices, _shm
+    _shm = shared_memory.SharedMemory(name=name)
+    _prices = np.ndarray(shape, dtype=dtype, buffer=_shm.buf)
+
+
+def _run_chunk(params: List[Dict], backtest_kwargs: Dict) -> List[Dict]:
+    results = []
+    for p in params:
+        metrics = run_backtest(_prices, **dict(backtest_kwargs, **p))
+        row = dict(p)
+        row.update((key, metrics[key]) for key in RESULT_KEYS)
+        results.append(row)
+    return results
+
+
+class SweepResults:
+    """Rows kept sorted by `metric` as they arrive (best first)"""
+
+    def __init__(self, metric: str = 'sharpe_ratio'):
+        self.metric = metric
+        self.sign = 1.0 if metric in ASCENDING_METRICS else -1.0
+        self._keys: List[float] = []
+        self.rows: List[Dict] = []
+
+    def add(self, row: Dict):
+        value = row.get(self.metric)
+        key = self.sign * value if value == value and value is not None else float('inf')
+        i = bisect.bisect_right(self._keys, key)
+        self._keys.insert(i, key)
+        self.rows.insert(i, row)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def top(self, n: int = 10) -> List[Dict]:
+        return self.rows[:n]
+
+    def best(self) -> Optional[Dict]:
+        return self.rows[0] if self.rows else None
+
+    def to_csv(self, path: str):
+        if not self.rows:
+            return
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.rows[0]))
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+
+def run_sweep(prices: np.ndarray, params: List[Dict], metric: str = 'sharpe_ratio', workers: Optional[int] = None,
+              chunk_size: Optional[int] = None, on_result: Optional[Callable[[Dict], None]] = None,
+              **backtest_kwargs) -> SweepResults:
+    """
+    Backtest every parameter dict in `params` against `prices` across a
+    process pool (`workers` defaults to the CPU count). Extra keyword
+    arguments are passed to every run_backtest call.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim == 1:
+        prices = prices[:, np.newaxis]
+    # filled once here instead of in every worker run
+    prices = np.ascontiguousarray(forward_fill(prices))
+    workers = workers or os.cpu_count() or 1
+    # a few chunks per worker keeps them busy without per-combination IPC
+    chunk_size = chunk_size or max(1, min(64, len(params) // (workers * 4) or 1))
+    results = SweepResults(metric)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(prices.nbytes, 1))
+    try:
+        np.ndarray(prices.shape, dtype=prices.dtype, buffer=shm.buf)[:] = prices
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(shm.name, prices.shape, prices.dtype.str)) as pool:
+            futures = [pool.submit(_run_chunk, params[i:i + chunk_size], backtest_kwargs)
+                       for i in range(0, len(params), chunk_size)]
+            for future in as_completed(futures):
+                for row in future.result():
+                    results.add(row)
+                    if on_result is not None:
+                        on_result(row)
+    finally:
+        shm.close()
+        shm.unlink()
+    return results
+
+
+def _parse_range(text: str, cast):
+    """'5:60:5' -> [5, 10, ..., 60] (inclusive); '10,20,30' -> a list"""
+    if ':' not in text:
+        return [cast(v) for v in text.split(',') if v]
+    start, stop, step = (cast(v) for v in text.split(':'))
+    return [cast(round(float(v), 10)) for v in np.arange(start, stop + step / 2, step)]
+
+
+def _print_table(rows: List[Dict]):
+    print(f"{'rank':>4} {'lookback':>8} {'threshold':>9} {'sharpe':>7} {'return':>8} {'max_dd':>7} {'trades':>6}")
+    for rank, row in enumerate(rows, 1):
+        print(f"{rank:>4} {row['lookback_days']:>8} {row['momentum_threshold']:>9.4f} {row['sharpe_ratio']:>7.2f} "
+              f"{row['total_return']:>8.2%} {row['max_drawdown']:>7.2%} {row['total_trades']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--root', default=os.getenv('BAR_STORE_DIR', 'data/bars'), help="bar store directory")
+    parser.add_argument('--symbols', default='', help="comma-separated; defaults to every stored symbol")
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--lookback', default='5:120:5', help="start:stop:step or a comma list")
+    parser.add_argument('--threshold', default='0.0:0.15:0.005', help="start:stop:step or a comma list")
+    parser.add_argument('--samples', type=int, help="random samples from the ranges instead of the full grid")
+    parser.add_argument('--cost-bps', type=float, default=0.0)
+    parser.add_argument('--metric', default='sharpe_ratio', choices=RESULT_KEYS)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', help="write every ranked row to .csv or .json")
+    args = parser.parse_args()
+
+    from bar_store import BarStore
+    store = BarStore(args.root)
+    symbols = [s.strip().upper() for s in args.symbols.split(',') if s.strip()] or store.symbols()
+    _, prices = store.price_matrix(symbols, args.start, args.end)
+    if not len(prices):
+        parser.error(f"no bars for {symbols} in {args.root}; run `python bar_store.py sync` first")
+
+    lookbacks = _parse_range(args.lookback, int)
+    thresholds = _parse_range(args.threshold, float)
+    if args.samples:
+        params = random_samples({"lookback_days": lookbacks, "momentum_threshold": thresholds}, args.samples)
+    else:
+        params = param_grid(lookback_days=lookbacks, momentum_threshold=thresholds)
+
+    print(f"Sweeping {len(params)} combinations over {prices.shape[0]} bars x {len(symbols)} symbols")
+    started = time.perf_counter()
+    done = 0
+
+    def progress(row):
+        nonlocal done
+        done += 1
+        if done % max(1, len(params) // 20) == 0:
+            print(f"  {done}/{len(params)} ({time.perf_counter() - started:.1f}s)")
+
+    results = run_sweep(prices, params, metric=args.metric, workers=args.workers, on_result=progress,
+                        cost_bps=args.cost_bps)
+    print(f"Done in {time.perf_counter() - started:.1f}s, ranked by {args.metric}:")
+    _print_table(results.top(args.top))
+    if args.output:
+        if args.output.endswith('.json'):
+            with open(args.output, 'w') as f:
+                json.dump(results.rows, f, indent=2)
+        else:
+            results.to_csv(args.output)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
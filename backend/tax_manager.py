@@ -1,11 +1,336 @@
-# Basic bookkeeping to support wash-sale detection and P&L reporting
-class TaxManager:
+# Lot-level bookkeeping for wash-sale detection and P&L reporting
+#
+# Open lots are kept per symbol in acquisition order, so FIFO consumes from a
+# moving head, LIFO pops from the tail and specific-ID goes through a lot-id
+# index. Buys with replacement shares left and unwashed loss sales are kept
+# as sorted arrays, so the +/-30 day wash-sale lookup for a sale or a new buy
+# is a pair of bisects rather than a scan of the trade history. Each
+# replacement share washes at most one loss share: a buy leaves its array
+# once its shares have all replaced a loss, and a loss sale once fully
+# washed, so either side only walks the entries it actually uses.
+# Realized and unrealized totals are maintained as trades and prices arrive.
+#
+# Disallowed wash-sale losses are reported, not rolled into the replacement
+# lots' basis.
+import bisect
+import datetime
+from typing import Dict, Iterable, List, Optional
+
+WASH_SALE_DAYS = 30
+LONG_TERM_SECONDS = 365 * 86400
+METHODS = ('fifo', 'lifo', 'specific')
+# order statuses that never produced a fill
+SKIP_STATUSES = ('failed', 'canceled', 'cancelled', 'rejected', 'expired')
+_EPS = 1e-9
+
+
+def _epoch(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.timestamp()
+    if isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day, tzinfo=datetime.timezone.utc).timestamp()
+    raise TypeError(f"Cannot convert {value!r} to a timestamp")
+
+
+class Lot:
+    __slots__ = ('lot_id', 'ts', 'qty', 'price', 'replace_left')
+
+    def __init__(self, lot_id, ts: float, qty: float, price: float):
+        self.lot_id = lot_id
+        self.ts = ts
+        self.qty = qty
+        self.price = price
+        # shares bought that have not yet replaced a loss sale's share
+        self.replace_left = qty
+
+
+class _SymbolBook:
+    __slots__ = ('lots', 'head', 'by_id', 'open_qty', 'open_cost', 'last_price',
+                 'buy_ts', 'buys', 'loss_ts', 'loss_left', 'loss_per_share', 'realized')
+
     def __init__(self):
-        self.trades = []
+        self.lots: List[Lot] = []  # sorted by acquisition time
+        self.head = 0              # everything before head is fully consumed
+        self.by_id: Dict = {}
+        self.open_qty = 0.0
+        self.open_cost = 0.0
+        self.last_price = None
+        self.buy_ts: List[float] = []      # buys with replacement shares left
+        self.buys: List[Lot] = []
+        self.loss_ts: List[float] = []     # loss sales with shares not yet washed
+        self.loss_left: List[float] = []
+        self.loss_per_share: List[float] = []
+        self.realized = 0.0
+
+    def unrealized(self) -> float:
+        if self.last_price is None:
+            return 0.0
+        return self.open_qty * self.last_price - self.open_cost
+
+
+class TaxManager:
+    def __init__(self, method: str = 'fifo', wash_window_days: int = WASH_SALE_DAYS):
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}")
+        self.method = method
+        self.wash_window = wash_window_days * 86400
+        self.books: Dict[str, _SymbolBook] = {}
+        self.trade_count = 0
+        self.unmatched_qty = 0.0  # sold without an open lot to match
+        self.realized_short_term = 0.0
+        self.realized_long_term = 0.0
+        self.wash_disallowed = 0.0
+        self.wash_sales: List[Dict] = []
+        self._unrealized = 0.0
+        self._next_lot = 0
+
+    def _book(self, symbol: str) -> _SymbolBook:
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = _SymbolBook()
+        return book
+
+    # -- trades ------------------------------------------------------------
+
+    def record_trade(self, trade: Dict) -> Optional[Dict]:
+        """
+        Apply one fill: {"symbol", "qty", "side", "price", "timestamp"} plus an
+        optional "id" (becomes the lot id of a buy) and, for specific-ID sells,
+        "lot_ids". Returns the realized result of a sell.
+        """
+        ts = _epoch(trade.get('timestamp', trade.get('created_at')))
+        lot_id = trade.get('id', trade.get('broker_order_id'))
+        return self._apply(trade['symbol'], trade['side'], float(trade['qty']), float(trade['price']), ts,
+                           lot_id, trade.get('lot_ids'))
+
+    def bulk_load(self, trades: Iterable[Dict]) -> int:
+        """
+        Apply many fills in timestamp order; returns how many were applied.
+        Broker orders are taken at their filled_qty and filled_avg_price, not
+        the quantity requested, and skipped if nothing filled.
+        """
+        rows = []
+        for t in trades:
+            if t.get('status') in SKIP_STATUSES:
+                continue
+            qty, price = t.get('filled_qty', t.get('qty')), t.get('filled_avg_price', t.get('price'))
+            if price is None or not qty or float(qty) <= _EPS:
+                continue
+            rows.append((_epoch(t.get('timestamp', t.get('created_at'))), float(qty), float(price), t))
+        rows.sort(key=lambda r: r[0])
+        apply = self._apply
+        for ts, qty, price, t in rows:
+            apply(t['symbol'], t['side'], qty, price, ts, t.get('id', t.get('broker_order_id')), t.get('lot_ids'))
+        return len(rows)
+
+    async def load_fills(self, engine=None, since=None, chunk_size: int = 50000) -> int:
+        """
+        Stream executions from the journal's `order_fills` table, oldest
+        first, into the books: one lot per fill, at the filled quantity and
+        price (partial fills included, unfilled orders never seen)
+        """
+        from sqlalchemy import select
+        from database import Fill
+        if engine is None:
+            from database import engine
+        query = (select(Fill.id, Fill.symbol, Fill.qty, Fill.side, Fill.price, Fill.created_at)
+                 .order_by(Fill.created_at, Fill.id)
+                 .execution_options(yield_per=chunk_size))
+        if since is not None:
+            query = query.where(Fill.created_at >= since)
+        applied = 0
+        apply = self._apply
+        async with engine.connect() as conn:
+            result = await conn.stream(query)
+            async for rows in result.partitions():
+                for fill_id, symbol, qty, side, price, created_at in rows:
+                    apply(symbol, side, float(qty), float(price), _epoch(created_at), fill_id, None)
+                applied += len(rows)
+        return applied
+
+    def _apply(self, symbol, side, qty, price, ts, lot_id, lot_ids):
+        self.trade_count += 1
+        book = self._book(symbol)
+        before = book.unrealized()
+        book.last_price = price
+        if side == 'buy':
+            self._buy(book, qty, price, ts, lot_id)
+            result = None
+        else:
+            result = self._sell(symbol, book, qty, price, ts, lot_ids)
+        self._unrealized += book.unrealized() - before
+        return result
+
+    def _buy(self, book: _SymbolBook, qty, price, ts, lot_id):
+        if lot_id is None:
+            lot_id = self._next_lot
+            self._next_lot += 1
+        lot = Lot(lot_id, ts, qty, price)
+        lots = book.lots
+        if not lots or lots[-1].ts <= ts:
+            lots.append(lot)
+        else:
+            i = bisect.bisect_right(lots, ts, key=lambda l: l.ts)
+            lots.insert(i, lot)
+            book.head = min(book.head, i)
+        book.by_id[lot_id] = lot
+        book.open_qty += qty
+        book.open_cost += qty * price
+
+        # this buy may be the replacement for recent loss sales, earliest first;
+        # only unwashed sales are indexed, and the ones it exhausts are dropped
+        lo = bisect.bisect_left(book.loss_ts, ts - self.wash_window)
+        hi = bisect.bisect_right(book.loss_ts, ts + self.wash_window)
+        available = qty
+        i = lo
+        while i < hi and available > _EPS:
+            left = book.loss_left[i]
+            washed = min(left, available)
+            available -= washed
+            self._wash(book.loss_ts[i], washed, washed * book.loss_per_share[i], ts)
+            if left - washed > _EPS:
+                book.loss_left[i] = left - washed
+                break
+            i += 1
+        if i > lo:
+            del book.loss_ts[lo:i], book.loss_left[lo:i], book.loss_per_share[lo:i]
+
+        # what is left can replace shares of loss sales still to come
+        lot.replace_left = available
+        if available > _EPS:
+            i = bisect.bisect_right(book.buy_ts, ts)
+            book.buy_ts.insert(i, ts)
+            book.buys.insert(i, lot)
+
+    def _take(self, book: _SymbolBook, qty: float, lot_ids) -> List:
+        """Consume `qty` from open lots; returns [(lot, qty taken)]"""
+        taken = []
+        for lot_id in lot_ids or ():
+            lot = book.by_id.get(lot_id)
+            if lot is None or lot.qty <= _EPS or qty <= _EPS:
+                continue
+            q = min(lot.qty, qty)
+            lot.qty -= q
+            qty -= q
+            taken.append((lot, q))
+        lots = book.lots
+        lifo = self.method == 'lifo'
+        while qty > _EPS and book.head < len(lots):
+            lot = lots[-1] if lifo else lots[book.head]
+            if lot.qty <= _EPS:
+                if lifo:
+                    lots.pop()
+                else:
+                    book.head += 1
+                book.by_id.pop(lot.lot_id, None)
+                continue
+            q = min(lot.qty, qty)
+            lot.qty -= q
+            qty -= q
+            taken.append((lot, q))
+        if qty > _EPS:
+            self.unmatched_qty += qty
+        # drop the consumed prefix once it dominates the list
+        if book.head > 1024 and book.head * 2 > len(lots):
+            del lots[:book.head]
+            book.head = 0
+        return taken
+
+    def _sell(self, symbol: str, book: _SymbolBook, qty, price, ts, lot_ids) -> Dict:
+        taken = self._take(book, qty, lot_ids)
+        sold = sum(q for _, q in taken)
+        cost = sum(lot.price * q for lot, q in taken)
+        gain = sold * price - cost
+        book.open_qty -= sold
+        book.open_cost -= cost
+        book.realized += gain
+        for lot, q in taken:
+            part = (price - lot.price) * q
+            if ts - lot.ts > LONG_TERM_SECONDS:
+                self.realized_long_term += part
+            else:
+                self.realized_short_term += part
+
+        disallowed = 0.0
+        if gain < -_EPS and sold > _EPS:
+            # replacement shares bought within the window, earliest first, that
+            # have not replaced another sale's shares and are not the ones sold
+            own: Dict[Lot, float] = {}
+            for lot, q in taken:
+                own[lot] = own.get(lot, 0.0) + q
+            lo = bisect.bisect_left(book.buy_ts, ts - self.wash_window)
+            hi = bisect.bisect_right(book.buy_ts, ts + self.wash_window)
+            washed = 0.0
+            spent = []
+            for j in range(lo, hi):
+                if sold - washed <= _EPS:
+                    break
+                lot = book.buys[j]
+                used = min(sold - washed, lot.replace_left - own.get(lot, 0.0))
+                if used > _EPS:
+                    washed += used
+                    lot.replace_left -= used
+                    if lot.replace_left <= _EPS:
+                        spent.append(j)
+            for j in reversed(spent):
+                del book.buy_ts[j], book.buys[j]
+            loss_per_share = -gain / sold
+            if washed > _EPS:
+                disallowed = washed * loss_per_share
+                self._wash(ts, washed, disallowed, ts)
+            if sold - washed > _EPS:
+                # later buys within the window can still wash the rest
+                i = bisect.bisect_right(book.loss_ts, ts)
+                book.loss_ts.insert(i, ts)
+                book.loss_left.insert(i, sold - washed)
+                book.loss_per_share.insert(i, loss_per_share)
+        return {"symbol": symbol, "qty": sold, "proceeds": sold * price, "cost": cost,
+                "gain": gain, "wash_disallowed": disallowed}
+
+    def _wash(self, sale_ts: float, qty: float, disallowed: float, replacement_ts: float):
+        self.wash_disallowed += disallowed
+        self.wash_sales.append({"sale_ts": sale_ts, "qty": qty, "disallowed": disallowed,
+                                "replacement_ts": replacement_ts})
+
+    # -- prices / reports --------------------------------------------------
+
+    def update_price(self, symbol: str, price: float):
+        """Mark a symbol to a new price; unrealized P&L moves by qty x change"""
+        book = self.books.get(symbol)
+        if book is None:
+            return
+        before = book.unrealized()
+        book.last_price = price
+        self._unrealized += book.unrealized() - before
+
+    def update_prices(self, prices: Dict[str, float]):
+        for symbol, price in prices.items():
+            self.update_price(symbol, price)
+
+    def open_lots(self, symbol: str) -> List[Lot]:
+        book = self.books.get(symbol)
+        if book is None:
+            return []
+        return [lot for lot in book.lots[book.head:] if lot.qty > _EPS]
 
-    def record_trade(self, trade):
-        self.trades.append(trade)
+    def position(self, symbol: str) -> Dict:
+        book = self._book(symbol)
+        return {"qty": book.open_qty, "cost": book.open_cost, "last_price": book.last_price,
+                "realized": book.realized, "unrealized": book.unrealized()}
 
     def compute_pnl(self):
-        # placeholder: implement proper realized/unrealized accounting
-        return {"realized": 0.0, "unrealized": 0.0}
+        realized = self.realized_short_term + self.realized_long_term
+        return {
+            "realized": realized,
+            "unrealized": self._unrealized,
+            "realized_short_term": self.realized_short_term,
+            "realized_long_term": self.realized_long_term,
+            "wash_sale_disallowed": self.wash_disallowed,
+            "trades": self.trade_count,
+        }
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Multi-account sweeps: one AutoDriverAPI per account vs. an AccountPool.
+
+Against the fake Alpaca server, times a portfolio sweep (get_account for
+every account) and an order per account, first looping over independent
+per-account clients, then with AccountPool's batched get_accounts and
+create_orders over shared transport.
+
+    python benchmarks/bench_accounts.py --accounts 50 --latency-ms 20 --rounds 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from bench_utils import latency_summary, save_results
+from fake_alpaca import FakeAlpacaServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib_api'))
+from autodriver_api import AccountPool, AutoDriverAPI  # noqa: E402
+
+
+async def timed(call, rounds):
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - started)
+    return latency_summary(latencies, sum(latencies))
+
+
+async def run(url, args):
+    accounts = {f"acct{i}": {"api_key": f"key{i}", "secret_key": "secret", "base_url": url}
+                for i in range(args.accounts)}
+    results = {}
+
+    apis = [AutoDriverAPI(base_url=url, transport=args.transport, **{k: v for k, v in creds.items() if k != 'base_url'})
+            for creds in accounts.values()]
+
+    async def sweep():
+        for api in apis:
+            await api.get_account()
+
+    async def orders():
+        for api in apis:
+            await api.create_order('SPY', 1, 'buy')
+
+    await sweep()
+    results["per_account"] = {"get_account": await timed(sweep, args.rounds),
+                              "create_order": await timed(orders, args.rounds)}
+    for api in apis:
+        await api.close()
+
+    async with AccountPool(accounts, transport=args.transport) as pool:
+        batch = [{"account": name, "symbol": "SPY", "qty": 1, "side": "buy"} for name in accounts]
+        await pool.get_accounts()
+        results["pool"] = {"get_account": await timed(pool.get_accounts, args.rounds),
+                           "create_order": await timed(lambda: pool.create_orders(batch), args.rounds)}
+        results["pool_limits"] = pool.limiter_stats()
+
+    for op in ("get_account", "create_order"):
+        single, pooled = results["per_account"][op], results["pool"][op]
+        print(f"{op:13} across {args.accounts} accounts: per-account clients p50 {single['p50_ms']:>9}ms   "
+              f"pool p50 {pooled['p50_ms']:>9}ms")
+    return results
+
+
+def main(args):
+    with FakeAlpacaServer(port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms) as alpaca:
+        os.environ['APCA_API_DATA_URL'] = alpaca.url
+        results = asyncio.run(run(alpaca.url, args))
+    if args.output:
+        save_results(args.output, {"config": vars(args), **results})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="fake Alpaca response latency")
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--transport', choices=('rest', 'http'), default='http')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--output')
+    main(parser.parse_args())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of the API request path.
+
+Starts the fake Alpaca server and `backend/main.py` under uvicorn (each in
+its own process, backed by a throwaway SQLite database), then drives
+/fetch_quote, /create_order, /portfolio and /health at increasing
+concurrency and reports throughput and latency percentiles for every
+endpoint and level. The server's own /metrics scrape is saved alongside,
+so client-side and server-side timings can be compared.
+
+    python benchmarks/bench_api.py --concurrency 1,8,32,128 --requests 500 --latency-ms 20 --jitter-ms 5 \\
+        --output results/api.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench_utils import BACKEND_DIR, latency_summary, save_results
+from fake_alpaca import FakeAlpacaServer
+
+ENDPOINTS = ('health', 'fetch_quote', 'create_order', 'portfolio')
+
+
+class APIServer:
+    """backend/main.py under uvicorn in a child process, pointed at the fake Alpaca server"""
+
+    def __init__(self, alpaca_url: str, port: int, transport: str = 'http', env: dict = None, quiet: bool = True,
+                 db: str = None):
+        self.port = port
+        self.quiet = quiet
+        self.url = f"http://127.0.0.1:{port}"
+        # a database passed in is kept; a throwaway one is removed on exit
+        self.owns_db = db is None
+        self.db = db or tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+        # seconds from spawning the process to its first 200 from /health
+        self.ready_s = None
+        self.env = dict(os.environ, **{
+            'ALPACA_API_KEY': 'bench',
+            'ALPACA_SECRET_KEY': 'bench',
+            'ALPACA_BASE_URL': alpaca_url,
+            'APCA_API_DATA_URL': alpaca_url,
+            'ALPACA_TRANSPORT': transport,
+            'DATABASE_URL': f"sqlite+aiosqlite:///{self.db}",
+            'KEEP_ALIVE_URL': '',
+        }, **(env or {}))
+        self.process = None
+
+    def __enter__(self):
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(self.port),
+             '--log-level', 'warning', '--no-access-log'],
+            cwd=BACKEND_DIR, env=self.env,
+            # the app logs every order at INFO; keep that off the benchmark's terminal
+            stdout=subprocess.DEVNULL if self.quiet else None, stderr=subprocess.DEVNULL if self.quiet else None)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1.0).status_code == 200:
+                    self.ready_s = time.perf_counter() - started
+                    return self
+            except httpx.HTTPError:
+                time.sleep(0.01)
+        self.__exit__()
+        raise RuntimeError(f"API server did not become healthy on {self.url}")
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+        if self.owns_db and os.path.exists(self.db):
+            os.unlink(self.db)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request_factory(endpoint: str, symbols):
+    """Callable(client, i) issuing request i for `endpoint`"""
+    if endpoint == 'fetch_quote':
+        return lambda client, i: client.get('/fetch_quote', params={'ticker': symbols[i % len(symbols)]})
+    if endpoint == 'create_order':
+        # alternate buys and sells so the book stays flat and clear of risk limits
+        return lambda client, i: client.post('/create_order', json={
+            'symbol': symbols[(i // 2) % len(symbols)], 'qty': 1, 'side': 'buy' if i % 2 == 0 else 'sell'})
+    return lambda client, i: client.get(f'/{endpoint}')
+
+
+async def drive(client, call, requests, concurrency):
+    latencies = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        for i in iter(lambda: next(counter), None):
+            if i >= requests:
+                return
+            started = time.perf_counter()
+            try:
+                resp = await call(client, i)
+                if resp.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latency_summary(latencies, time.perf_counter() - started, errors)
+
+
+async def run(api_url, args):
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    levels = [int(c) for c in args.concurrency.split(',')]
+    endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+    results = {}
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=60.0) as client:
+        for endpoint in endpoints:
+            call = request_factory(endpoint, symbols)
+            await drive(client, call, min(args.warmup, args.requests), 1)
+            results[endpoint] = {}
+            for concurrency in levels:
+                summary = await drive(client, call, args.requests, concurrency)
+                results[endpoint][str(concurrency)] = summary
+                print(f"{endpoint:13} c={concurrency:<4} {summary['throughput_rps']:>9} req/s  "
+                      f"p50 {summary['p50_ms']:>9} ms  p95 {summary['p95_ms']:>9} ms  "
+                      f"p99 {summary['p99_ms']:>9} ms  errors {summary['errors']}")
+        server_metrics = (await client.get('/metrics')).text
+    return results, server_metrics
+
+
+def main(args):
+    env = {
+        # measure the request path, not the upstream rate budget, unless asked to
+        'ALPACA_RATE_LIMIT_PER_MINUTE': str(args.rate_limit_per_minute),
+        'ALPACA_RATE_LIMIT_BURST': str(max(1, int(args.rate_limit_per_minute / 60))),
+        'QUOTE_CACHE_TTL_SECONDS': str(args.quote_ttl),
+        'PRETRADE_RISK_ENABLED': 'true' if args.risk else 'false',
+    }
+    with FakeAlpacaServer(port=args.alpaca_port or free_port(), latency_ms=args.latency_ms,
+                          jitter_ms=args.jitter_ms) as alpaca:
+        with APIServer(alpaca.url, args.port or free_port(), transport=args.transport, env=env,
+                       quiet=not args.server_logs) as api:
+            results, server_metrics = asyncio.run(run(api.url, args))
+    if args.output:
+        save_results(args.output, {"config": vars(args), "endpoints": results, "server_metrics": server_metrics})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    parser.add_argument('--concurrency', default='1,8,32,128', help="comma-separated levels, run in order")
+    parser.add_argument('--requests', type=int, default=500, help="requests per endpoint and level")
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="fake Alpaca response latency")
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--transport', choices=('rest', 'http'), default='http')
+    parser.add_argument('--quote-ttl', type=float, default=1.0, help="QUOTE_CACHE_TTL_SECONDS for the API (0 disables)")
+    parser.add_argument('--rate-limit-per-minute', type=float, default=10 ** 7)
+    parser.add_argument('--no-risk', dest='risk', action='store_false', help="disable pre-trade risk checks")
+    parser.add_argument('--server-logs', action='store_true', help="show the API server's log output")
+    parser.add_argument('--port', type=int, help="API port (default: a free one)")
+    parser.add_argument('--alpaca-port', type=int, help="fake Alpaca port (default: a free one)")
+    parser.add_argument('--output')
+    main(parser.parse_args())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Per-tick cost of the incremental indicator engine.
+
+Warms IndicatorEngine up on synthetic history, then times one vectorized
+update (momentum ring, EWMA volatility, ATR, rolling high/low) for the
+whole universe plus the momentum/volatility reads a strategy tick needs.
+
+    python benchmarks/bench_indicators.py --symbols 3000 --ticks 500
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from bench_utils import latency_summary, save_results
+from indicators import IndicatorEngine
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (args.history + args.ticks, args.symbols)), axis=0))
+    engine = IndicatorEngine(symbols, momentum_window=args.lookback)
+
+    started = time.perf_counter()
+    engine.warm_up(closes[:args.history], closes[:args.history] * 1.01, closes[:args.history] * 0.99)
+    warm_up_s = time.perf_counter() - started
+
+    latencies = []
+    for bar in closes[args.history:]:
+        t0 = time.perf_counter()
+        engine.update(bar, bar * 1.01, bar * 0.99)
+        engine.momentum()
+        engine.volatility()
+        latencies.append(time.perf_counter() - t0)
+
+    results = {"config": vars(args), "warm_up_s": round(warm_up_s, 4),
+               "tick": latency_summary(latencies, sum(latencies))}
+    print(f"warm-up of {args.history} bars x {args.symbols} symbols: {warm_up_s * 1000:.1f} ms")
+    print(f"tick p50 {results['tick']['p50_ms']} ms  p99 {results['tick']['p99_ms']} ms")
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=3000)
+    parser.add_argument('--history', type=int, default=250)
+    parser.add_argument('--ticks', type=int, default=500)
+    parser.add_argument('--lookback', type=int, default=20)
+    parser.add_argument('--output', help="write results as JSON to this path")
+    main(parser.parse_args())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Order history read path.
+
+Journals N synthetic orders, each with its fill, into a throwaway SQLite
+database through OrderJournal.write_rows (so the daily rollups are
+maintained from the fills as they would be live), then times /orders pages at increasing depth with keyset cursors
+against the same pages fetched with OFFSET, and the /orders/summary query
+over a month and over the whole history (first page of days plus the
+per-symbol totals).
+
+    python benchmarks/bench_orders.py --orders 200000 --symbols 200 --page 100
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from bench_utils import latency_summary, save_results
+
+# database builds its module engine at import; the benchmark binds its own, so
+# keep that one from needing a Postgres driver
+os.environ.setdefault('DATABASE_URL', 'sqlite+aiosqlite://')
+from database import Base, DEFAULT_ORDER_FIELDS, Order, daily_rollups, encode_cursor, list_orders, rollup_totals  # noqa: E402
+from order_journal import OrderJournal  # noqa: E402
+
+
+def synthetic_orders(n, n_symbols, days, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2024, 1, 2, 14, 30)
+    offsets = np.sort(rng.uniform(0, days * 86400, size=n))
+    symbols = rng.integers(0, n_symbols, size=n)
+    sides = rng.random(n) < 0.5
+    qty = rng.integers(1, 100, size=n)
+    prices = 50 + symbols + rng.normal(0, 2, size=n)
+    for i in range(n):
+        row = {
+            "symbol": f"SYM{symbols[i]}",
+            "qty": float(qty[i]),
+            "side": 'buy' if sides[i] else 'sell',
+            "price": round(float(prices[i]), 2),
+            "broker_order_id": f"bench-{i}",
+            "created_at": start + datetime.timedelta(seconds=float(offsets[i])),
+        }
+        yield dict(row, status='filled', raw={"id": f"bench-{i}", "status": "filled", "client_order_id": f"c-{i}"})
+        yield dict(row, kind='fill')
+
+
+async def timed(call, iterations):
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - started)
+    return latency_summary(latencies, sum(latencies))
+
+
+async def run(args, path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    journal = OrderJournal(engine=engine)
+
+    batch, write_latencies = [], []
+    started = time.perf_counter()
+    for row in synthetic_orders(args.orders, args.symbols, args.days):
+        batch.append(row)
+        if len(batch) == args.batch:
+            t0 = time.perf_counter()
+            await journal.write_rows(batch)
+            write_latencies.append(time.perf_counter() - t0)
+            batch = []
+    if batch:
+        await journal.write_rows(batch)
+    write_s = time.perf_counter() - started
+    results = {"config": vars(args), "write": dict(latency_summary(write_latencies, write_s),
+                                                    orders_per_s=round(args.orders / write_s, 1))}
+    print(f"wrote {args.orders} orders and fills with rollups: {results['write']['orders_per_s']} orders/s, "
+          f"batch of {args.batch} p50 {results['write']['p50_ms']}ms")
+
+    table = Order.__table__
+    columns = [table.c[f] for f in DEFAULT_ORDER_FIELDS]
+    newest_first = (table.c.created_at.desc(), table.c.id.desc())
+    results["pages"] = {}
+    for fraction in (0.0, 0.1, 0.5, 0.9):
+        depth = int(args.orders * fraction)
+        async with engine.connect() as conn:
+            anchor = (await conn.execute(select(table.c.created_at, table.c.id).order_by(*newest_first)
+                                         .offset(max(0, depth - 1)).limit(1))).one()
+        cursor = encode_cursor(*anchor) if depth else None
+
+        async def keyset():
+            await list_orders(limit=args.page, cursor=cursor, bind=engine)
+
+        async def offset():
+            async with engine.connect() as conn:
+                (await conn.execute(select(*columns).order_by(*newest_first).offset(depth).limit(args.page))).all()
+
+        keyset_summary = await timed(keyset, args.iterations)
+        offset_summary = await timed(offset, args.iterations)
+        results["pages"][str(depth)] = {"keyset": keyset_summary, "offset": offset_summary}
+        print(f"page at depth {depth:>8}: keyset p50 {keyset_summary['p50_ms']:>8}ms   "
+              f"offset p50 {offset_summary['p50_ms']:>8}ms")
+
+    last_day = (datetime.datetime(2024, 1, 2) + datetime.timedelta(days=args.days)).date()
+    async def summary(start=None, end=None):
+        await daily_rollups(start, end, bind=engine)
+        await rollup_totals(start, end, bind=engine)
+
+    month = await timed(lambda: summary(last_day - datetime.timedelta(days=30), last_day), args.iterations)
+    history = await timed(summary, args.iterations)
+    results["summary"] = {"last_30_days": month, "all_days": history}
+    print(f"summary over 30 days: p50 {month['p50_ms']}ms; over {args.days} days: p50 {history['p50_ms']}ms")
+
+    started = time.perf_counter()
+    await journal.rebuild_rollups()
+    results["rebuild_rollups_s"] = round(time.perf_counter() - started, 3)
+    print(f"full rollup rebuild: {results['rebuild_rollups_s']}s")
+    await engine.dispose()
+    return results
+
+
+def main(args):
+    path = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    try:
+        results = asyncio.run(run(args, path))
+    finally:
+        os.unlink(path)
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--days', type=int, default=250, help="calendar days the orders are spread over")
+    parser.add_argument('--batch', type=int, default=500, help="rows per journal write")
+    parser.add_argument('--page', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=20, help="timed reads per measurement")
+    parser.add_argument('--output')
+    main(parser.parse_args())
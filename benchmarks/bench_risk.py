@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Pre-trade risk check latency.
+
+Builds a book across a synthetic universe (random positions, sectors and a
+covariance warmed from a year of closes), then times batch checks of N
+orders and single-order checks, plus one incremental covariance update.
+
+    python benchmarks/bench_risk.py --symbols 500 --orders 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from bench_utils import latency_summary, save_results
+from risk_engine import PreTradeRiskEngine
+
+
+def build_engine(n_symbols, bars, seed=0):
+    rng = np.random.default_rng(seed)
+    symbols = [f"SYM{i}" for i in range(n_symbols)]
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, size=(bars, n_symbols)), axis=0))
+    engine = PreTradeRiskEngine(max_gross=1.5, max_position_pct=0.05,
+                                sectors={s: f"S{i % 11}" for i, s in enumerate(symbols)})
+    engine.warm_up(closes, symbols)
+    qty = rng.integers(0, 50, size=n_symbols)
+    engine.sync({
+        "account": {"equity": float((qty * closes[-1]).sum() * 1.5)},
+        "positions": [{"symbol": s, "qty": str(q), "side": "long", "current_price": float(p)}
+                      for s, q, p in zip(symbols, qty, closes[-1]) if q],
+    })
+    return engine, symbols, closes, rng
+
+
+def main(args):
+    engine, symbols, closes, rng = build_engine(args.symbols, args.bars)
+
+    def orders(n):
+        picks = rng.choice(len(symbols), size=n, replace=False)
+        return [{"symbol": symbols[i], "side": "buy" if rng.random() < 0.6 else "sell",
+                 "qty": int(rng.integers(1, 100))} for i in picks]
+
+    batches = [orders(args.orders) for _ in range(args.iterations)]
+    batch_latencies = []
+    rejected = 0
+    for batch in batches:
+        t0 = time.perf_counter()
+        result = engine.check(batch)
+        batch_latencies.append(time.perf_counter() - t0)
+        rejected += len(result["rejected"])
+
+    singles = [orders(1) for _ in range(args.iterations)]
+    single_latencies = []
+    for order in singles:
+        t0 = time.perf_counter()
+        engine.check(order)
+        single_latencies.append(time.perf_counter() - t0)
+
+    bar = dict(zip(symbols, closes[-1] * (1 + rng.normal(0, 0.01, size=len(symbols)))))
+    started = time.perf_counter()
+    engine.update_bar(bar)
+    update_ms = (time.perf_counter() - started) * 1000
+
+    results = {
+        "config": vars(args),
+        "batch_check": latency_summary(batch_latencies, sum(batch_latencies)),
+        "single_check": latency_summary(single_latencies, sum(single_latencies)),
+        "rejected_per_batch": round(rejected / args.iterations, 1),
+        "covariance_update_ms": round(update_ms, 3),
+    }
+    print(f"{args.orders}-order batch over {args.symbols} symbols: p50 {results['batch_check']['p50_ms']}ms "
+          f"p99 {results['batch_check']['p99_ms']}ms ({results['rejected_per_batch']} rejected on average)")
+    print(f"single order: p50 {results['single_check']['p50_ms']}ms p99 {results['single_check']['p99_ms']}ms")
+    print(f"covariance update for one bar: {update_ms:.2f}ms")
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=200, help="orders per batch check")
+    parser.add_argument('--bars', type=int, default=252, help="closes used to warm the covariance")
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--output')
+    main(parser.parse_args())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Sharded strategy runner tick time vs. worker count.
+
+Writes random-walk daily history for a large universe into a temporary bar
+store, then, for each worker count, starts a StrategyRunner with
+MomentumStrategy and times ticks of fresh prices through the shared-memory
+price table. Signals are computed and merged but not executed. A heartbeat
+task on the event loop records how late it wakes up during the ticks, which
+shows whether strategy CPU ever blocks the loop.
+
+    python benchmarks/bench_runner.py --symbols 3000 --workers 1,2,4 --ticks 50
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from bench_utils import latency_summary, save_results
+from bar_store import BarStore
+from example_momentum_strategy import MomentumStrategy
+from strategy_runner import StrategyRunner
+
+
+def write_history(root, symbols, days, seed=0):
+    rng = np.random.default_rng(seed)
+    t = int(time.time()) // 86400 * 86400 - 86400 * np.arange(days, 0, -1)
+    store = BarStore(root)
+    closes = 100.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, (days, len(symbols))), axis=0))
+    for j, symbol in enumerate(symbols):
+        store.append(symbol, t, close=closes[:, j])
+    return closes[-1]
+
+
+async def heartbeat(lags, interval=0.001):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(symbols, last, root, workers, args):
+    rng = np.random.default_rng(workers)
+    runner = StrategyRunner(None, {'momentum': MomentumStrategy}, symbols, workers=workers, bar_store_root=root)
+    started = time.perf_counter()
+    await runner.start()
+    startup_s = time.perf_counter() - started
+    prices = last.copy()
+    # the first tick warms every worker's indicators from the bar store
+    first = await runner.tick(dict(zip(symbols, prices)))
+    lags, latencies = [], []
+    beat = asyncio.create_task(heartbeat(lags))
+    try:
+        ticks_started = time.perf_counter()
+        for _ in range(args.ticks):
+            prices = prices * np.exp(rng.normal(0, 0.01, len(prices)))
+            t0 = time.perf_counter()
+            result = await runner.tick(dict(zip(symbols, prices)))
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - ticks_started
+    finally:
+        beat.cancel()
+        await runner.stop()
+    summary = latency_summary(latencies, elapsed)
+    summary.update({
+        "startup_s": round(startup_s, 3),
+        "warm_tick_ms": first['elapsed_ms'],
+        "worker_ms_last": result['worker_ms']['momentum'],
+        "signals_last": result['signals']['momentum'],
+        "loop_lag_max_ms": round(max(lags) * 1000, 3) if lags else None,
+    })
+    return summary
+
+
+def main(args):
+    symbols = [f"S{i:05d}" for i in range(args.symbols)]
+    root = tempfile.mkdtemp(prefix='bench_runner_')
+    try:
+        last = write_history(root, symbols, args.days)
+        results = {}
+        for workers in (int(w) for w in args.workers.split(',')):
+            r = results[str(workers)] = asyncio.run(run(symbols, last, root, workers, args))
+            print(f"workers={workers:<3} tick p50 {r['p50_ms']:>8} ms  p95 {r['p95_ms']:>8} ms  "
+                  f"per-shard compute {r['worker_ms_last']} ms  loop lag max {r['loop_lag_max_ms']} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print(f"({os.cpu_count()} CPUs available)")
+    if args.output:
+        save_results(args.output, {"config": vars(args), "cpus": os.cpu_count(), "workers": results})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=3000)
+    parser.add_argument('--days', type=int, default=120, help="history per symbol for indicator warm-up")
+    parser.add_argument('--workers', default='1,2,4', help="comma-separated worker counts, run in order")
+    parser.add_argument('--ticks', type=int, default=50)
+    parser.add_argument('--output')
+    main(parser.parse_args())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Simulated-broker replay speed.
+
+Generates random-walk daily bars, then runs MomentumStrategy.execute_strategy
+unmodified against sim_broker.SimulatedBroker after every bar: quotes,
+portfolio reads, the execution planner, pre-trade risk checks and the
+matching engine all run in-process on the simulated clock. Reports symbol-bars
+replayed per second and strategy ticks per second, plus the run's own
+trading summary.
+
+    python benchmarks/bench_sim.py --symbols 6 --days 2520 --slippage-bps 5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+
+import numpy as np
+
+from bench_utils import save_results
+from example_momentum_strategy import MomentumStrategy
+from portfolio_state import PortfolioState
+from sim_broker import SimulatedBroker
+
+
+def random_bars(n_symbols, n_days, seed=0):
+    rng = np.random.default_rng(seed)
+    t = 1420070400 + 86400 * np.arange(n_days, dtype=np.int64)  # daily from 2015-01-01
+    bars = {}
+    for j in range(n_symbols):
+        close = 100.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, n_days)))
+        open_ = close * np.exp(rng.normal(0, 0.004, n_days))
+        bars[f"SYM{j}"] = {
+            't': t, 'open': open_, 'close': close,
+            'high': np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.005, n_days))),
+            'low': np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.005, n_days))),
+        }
+    return bars
+
+
+async def run(args):
+    broker = SimulatedBroker(random_bars(args.symbols, args.days, args.seed), slippage_bps=args.slippage_bps,
+                             commission_per_share=args.commission_per_share)
+    strategy = MomentumStrategy(broker, bar_store=broker, portfolio=PortfolioState(broker, ttl=0))
+    strategy.symbols = broker.symbols
+    # the strategy prints a line per tick; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        return await broker.run(strategy.execute_strategy, warmup=strategy.lookback_days)
+
+
+def main(args):
+    logging.disable(logging.WARNING)
+    result = asyncio.run(run(args))
+    ticks_per_second = round(result['strategy_calls'] / result['elapsed_s'], 1)
+    print(f"{result['bars']} bars x {args.symbols} symbols in {result['elapsed_s']}s: "
+          f"{result['bars_per_second']:,.0f} symbol-bars/s, {ticks_per_second:,.0f} strategy ticks/s")
+    print(f"return {result['total_return']:.1%}, max drawdown {result['max_drawdown']:.1%}, "
+          f"{result['fills']} fills, orders {result['orders']}")
+    if args.output:
+        save_results(args.output, {"config": vars(args), "ticks_per_second": ticks_per_second, **result})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=6)
+    parser.add_argument('--days', type=int, default=2520, help="daily bars per symbol")
+    parser.add_argument('--slippage-bps', type=float, default=5.0)
+    parser.add_argument('--commission-per-share', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    main(parser.parse_args())
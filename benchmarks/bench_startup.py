@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Cold-start time of the API process, with and without FAST_START.
+
+Spawns `backend/main.py` under uvicorn repeatedly against the fake Alpaca
+server and measures, from the client side, how long each process takes to
+answer /health with a 200, alongside the milestones the server reports
+itself (app ready, first response, broker warm; seconds since process
+start). Each mode keeps one SQLite database across its runs, so runs after
+the first show FAST_START skipping create_all.
+
+    python benchmarks/bench_startup.py --runs 5 --latency-ms 50
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from bench_api import APIServer, free_port
+from bench_utils import save_results
+from fake_alpaca import FakeAlpacaServer
+
+MODES = {"standard": {"FAST_START": "false"}, "fast_start": {"FAST_START": "true"}}
+
+
+def run_mode(alpaca_url, env, args):
+    db = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    runs = []
+    try:
+        for _ in range(args.runs):
+            with APIServer(alpaca_url, free_port(), transport=args.transport, env=env, db=db) as api:
+                first = httpx.get(f"{api.url}/health", timeout=10.0).json()
+                # wait for the background warm-up so its milestone is recorded too
+                deadline = time.monotonic() + 30
+                health = first
+                while health.get("status") == "warming" and time.monotonic() < deadline:
+                    time.sleep(0.02)
+                    health = httpx.get(f"{api.url}/health", timeout=10.0).json()
+                runs.append({"ready_s": round(api.ready_s, 4), "first_status": first.get("status"),
+                             **{k: v for k, v in health.get("startup", {}).items() if k != "process_start"}})
+    finally:
+        os.unlink(db)
+    return runs
+
+
+def summarize(runs):
+    summary = {}
+    for key in ("ready_s", "app_ready", "first_response", "broker_warm"):
+        values = [r[key] for r in runs if r.get(key) is not None]
+        if values:
+            summary[key] = {"median": round(statistics.median(values), 4), "min": min(values), "max": max(values)}
+    return summary
+
+
+def main(args):
+    results = {"config": vars(args), "modes": {}}
+    with FakeAlpacaServer(port=free_port(), latency_ms=args.latency_ms) as alpaca:
+        for mode, env in MODES.items():
+            runs = run_mode(alpaca.url, env, args)
+            results["modes"][mode] = {"runs": runs, "summary": summarize(runs)}
+            s = results["modes"][mode]["summary"]
+            print(f"{mode:11} healthy after {s['ready_s']['median']:.3f}s (median of {len(runs)}), "
+                  f"first response {s.get('first_response', {}).get('median')}s, "
+                  f"broker warm {s.get('broker_warm', {}).get('median')}s after process start")
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help="process starts per mode")
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="fake Alpaca response latency")
+    parser.add_argument('--transport', choices=('rest', 'http'), default='http')
+    parser.add_argument('--output')
+    main(parser.parse_args())
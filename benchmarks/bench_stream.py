@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Streaming ingest check against the fake Alpaca replay stream.
+
+Runs MarketDataStream against the local websocket replay for a few seconds
+and reports ingest rate, fan-out to a subscriber and the cost of reading
+the latest price back out of the ring buffers.
+
+    python benchmarks/bench_stream.py --symbols 500 --ticks-per-second 20000 --seconds 5
+"""
+
+import argparse
+import asyncio
+import time
+
+from bench_utils import save_results
+from fake_alpaca import FakeAlpacaServer
+from market_stream import MarketDataStream, TickStore
+
+
+async def main(args):
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    store = TickStore(capacity=args.buffer_size)
+    with FakeAlpacaServer(port=args.port, ticks_per_second=args.ticks_per_second) as server:
+        stream = MarketDataStream('bench', 'bench', symbols, store, url=server.url.replace('http', 'ws') + '/v2/iex')
+        queue = stream.subscribe()
+        received = 0
+
+        async def consume():
+            nonlocal received
+            while True:
+                await queue.get()
+                received += 1
+
+        tasks = [asyncio.create_task(stream.run()), asyncio.create_task(consume())]
+        while not store.live:
+            await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await asyncio.sleep(args.seconds)
+        elapsed = time.perf_counter() - started
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    reads = 100000
+    t0 = time.perf_counter()
+    for i in range(reads):
+        store.last_quote(symbols[i % len(symbols)])
+    read_us = (time.perf_counter() - t0) / reads * 1e6
+
+    results = {
+        "config": vars(args),
+        "messages": stream.messages,
+        "ingest_per_second": round(stream.messages / elapsed, 1),
+        "subscriber_received": received,
+        "subscriber_dropped": stream.dropped,
+        "symbols_seen": len(store.trades),
+        "last_quote_read_us": round(read_us, 3),
+    }
+    for key, value in results.items():
+        if key != "config":
+            print(f"{key:22} {value}")
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--ticks-per-second', type=float, default=5000.0)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--buffer-size', type=int, default=1024)
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--output', help="write results as JSON to this path")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Parameter sweep scaling across worker processes.
+
+Runs the same lookback x threshold grid over a synthetic price matrix with
+1, 2, 4, ... workers (up to the CPU count) and reports combinations per
+second and speedup over a single worker. Prices reach the workers through
+shared memory, so the per-task cost is just the parameter chunk.
+
+    python benchmarks/bench_sweep.py --combinations 2000 --days 2520 --symbols 100
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from bench_utils import save_results
+from sweep import param_grid, run_sweep
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, (args.days, args.symbols)), axis=0))
+    side = max(1, int(round(args.combinations ** 0.5)))
+    params = param_grid(lookback_days=np.linspace(5, 250, side).astype(int).tolist(),
+                        momentum_threshold=np.linspace(0.0, 0.2, side).round(6).tolist())
+
+    max_workers = args.max_workers or os.cpu_count() or 1
+    counts = sorted({1, max_workers} | {2 ** k for k in range(1, 10) if 2 ** k < max_workers})
+    runs = []
+    for workers in counts:
+        started = time.perf_counter()
+        results = run_sweep(prices, params, workers=workers)
+        elapsed = time.perf_counter() - started
+        runs.append({"workers": workers, "elapsed_s": round(elapsed, 3),
+                     "combinations_per_s": round(len(params) / elapsed, 1)})
+        runs[-1]["speedup"] = round(runs[0]["elapsed_s"] / elapsed, 2)
+        print(f"{workers:>3} workers: {len(params)} combinations in {elapsed:.2f}s "
+              f"({runs[-1]['combinations_per_s']}/s, x{runs[-1]['speedup']})")
+    best = results.best()
+    print(f"best: lookback {best['lookback_days']} threshold {best['momentum_threshold']} sharpe {best['sharpe_ratio']:.2f}")
+    if args.output:
+        save_results(args.output, {"config": vars(args), "combinations": len(params), "runs": runs})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--combinations', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=2520)
+    parser.add_argument('--symbols', type=int, default=100)
+    parser.add_argument('--max-workers', type=int)
+    parser.add_argument('--output')
+    main(parser.parse_args())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+TaxManager lot accounting throughput.
+
+Bulk-loads a synthetic trade history (random buys and sells across a
+universe, spread over a few years so wash-sale windows overlap), then times
+incremental trades and price marks against the loaded books.
+
+    python benchmarks/bench_tax.py --trades 1000000 --symbols 500 --method fifo
+"""
+
+import argparse
+import random
+import time
+
+from bench_utils import latency_summary, save_results
+from tax_manager import TaxManager
+
+
+def synthetic_trades(n, symbols, seconds, seed=0):
+    rng = random.Random(seed)
+    names = [f"SYM{i}" for i in range(symbols)]
+    held = dict.fromkeys(names, 0)
+    price = {s: rng.uniform(20, 500) for s in names}
+    trades = []
+    for i in range(n):
+        s = rng.choice(names)
+        price[s] *= 1 + rng.gauss(0, 0.02)
+        if held[s] > 0 and rng.random() < 0.45:
+            side, qty = 'sell', rng.randint(1, held[s])
+        else:
+            side, qty = 'buy', rng.randint(1, 100)
+        held[s] += qty if side == 'buy' else -qty
+        trades.append({"id": i, "symbol": s, "side": side, "qty": qty, "price": round(price[s], 2),
+                       "timestamp": seconds * i / n})
+    return trades, price
+
+
+def main(args):
+    trades, prices = synthetic_trades(args.trades + args.incremental, args.symbols, args.years * 365 * 86400)
+    history, live = trades[:args.trades], trades[args.trades:]
+    tm = TaxManager(method=args.method)
+
+    started = time.perf_counter()
+    tm.bulk_load(history)
+    load_s = time.perf_counter() - started
+
+    latencies = []
+    for trade in live:
+        t0 = time.perf_counter()
+        tm.record_trade(trade)
+        latencies.append(time.perf_counter() - t0)
+
+    started = time.perf_counter()
+    for _ in range(args.marks):
+        tm.update_prices(prices)
+    mark_s = time.perf_counter() - started
+
+    pnl = tm.compute_pnl()
+    results = {
+        "config": vars(args),
+        "bulk_load": {"trades": len(history), "elapsed_s": round(load_s, 3),
+                      "trades_per_s": round(len(history) / load_s)},
+        "incremental_trade": latency_summary(latencies, sum(latencies)),
+        "price_marks_per_s": round(args.marks * len(prices) / mark_s),
+        "wash_sales": len(tm.wash_sales),
+        "pnl": {k: round(v, 2) for k, v in pnl.items()},
+    }
+    print(f"bulk load: {len(history):,} trades in {load_s:.2f}s ({results['bulk_load']['trades_per_s']:,}/s)")
+    print(f"incremental trade: p50 {results['incremental_trade']['p50_ms']}ms "
+          f"p99 {results['incremental_trade']['p99_ms']}ms")
+    print(f"price marks: {results['price_marks_per_s']:,}/s, wash sales found: {len(tm.wash_sales):,}")
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trades', type=int, default=1000000)
+    parser.add_argument('--incremental', type=int, default=10000, help="trades applied one at a time after the load")
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--years', type=float, default=3)
+    parser.add_argument('--method', choices=('fifo', 'lifo', 'specific'), default='fifo')
+    parser.add_argument('--marks', type=int, default=100, help="full-universe price updates to time")
+    parser.add_argument('--output')
+    main(parser.parse_args())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Compare AlpacaClient transports against the local fake Alpaca server.
+
+Drives get_last_quote (cache disabled) and get_account through the
+thread-pool REST transport and the native async HTTP transport at the same
+concurrency and prints throughput and latency percentiles for each.
+
+    python benchmarks/bench_transport.py --requests 2000 --concurrency 32 --latency-ms 10
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from bench_utils import latency_summary, save_results
+from fake_alpaca import FakeAlpacaServer
+from alpaca_client import create_alpaca_client
+
+
+async def drive(call, requests, concurrency):
+    latencies = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with sem:
+            started = time.perf_counter()
+            try:
+                if await call(i) is None:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latency_summary(latencies, time.perf_counter() - started, errors)
+
+
+async def bench_transport(transport, url, args):
+    client = create_alpaca_client(
+        api_key='bench', secret_key='bench', base_url=url, transport=transport,
+        quote_ttl=0, max_workers=args.concurrency, rate_per_minute=10 ** 9, burst=10 ** 6,
+    )
+    symbols = [f"SYM{i}" for i in range(100)]
+    try:
+        return {
+            "get_last_quote": await drive(lambda i: client.get_last_quote(symbols[i % 100]), args.requests, args.concurrency),
+            "get_account": await drive(lambda i: client.get_account(), args.requests, args.concurrency),
+        }
+    finally:
+        await client.close()
+
+
+async def main(args):
+    results = {"config": vars(args), "transports": {}}
+    with FakeAlpacaServer(port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms) as server:
+        os.environ['APCA_API_DATA_URL'] = server.url
+        for transport in ('rest', 'http'):
+            try:
+                results["transports"][transport] = await bench_transport(transport, server.url, args)
+            except ImportError as e:
+                print(f"Skipping {transport} transport: {e}")
+                continue
+            for name, summary in results["transports"][transport].items():
+                print(f"{transport:5} {name:15} {summary['throughput_rps']:>9} req/s  "
+                      f"p50 {summary['p50_ms']:>8} ms  p99 {summary['p99_ms']:>8} ms  errors {summary['errors']}")
+    if args.output:
+        save_results(args.output, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--latency-ms', type=float, default=10.0)
+    parser.add_argument('--jitter-ms', type=float, default=2.0)
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--output', help="write results as JSON to this path")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Alpaca trading and market-data REST APIs.
+
+Serves the handful of endpoints AlpacaClient uses, with configurable
+latency and jitter, so benchmarks run reproducibly without network access
+or API keys. Trading and data endpoints share one host - point both
+ALPACA_BASE_URL and APCA_API_DATA_URL at it. A websocket at /v2/<feed>
+replays a random-walk trade stream (point ALPACA_STREAM_URL at
+ws://host:port/v2/iex).
+
+    python benchmarks/fake_alpaca.py --port 8100 --latency-ms 20 --jitter-ms 5
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket
+
+
+def _now():
+    return datetime.datetime.utcnow().isoformat() + 'Z'
+
+
+def _price(symbol):
+    # stable per-symbol base price with a little noise
+    return round(50 + (sum(map(ord, symbol)) % 400) + random.uniform(-0.5, 0.5), 2)
+
+
+def create_app(latency_ms: float = 0.0, jitter_ms: float = 0.0, ticks_per_second: float = 1000.0) -> FastAPI:
+    app = FastAPI(title="Fake Alpaca")
+    app.state.ticks_per_second = ticks_per_second
+    app.state.latency_ms = latency_ms
+    app.state.jitter_ms = jitter_ms
+    app.state.requests = 0
+    order_ids = itertools.count(1)
+    positions = {}
+
+    @app.middleware("http")
+    async def simulated_latency(request: Request, call_next):
+        app.state.requests += 1
+        delay = app.state.latency_ms + random.uniform(-app.state.jitter_ms, app.state.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+        return await call_next(request)
+
+    @app.get('/v2/account')
+    async def account():
+        equity = 100000.0 + sum(p['market_value'] for p in positions.values())
+        return {
+            "id": "fake-account", "status": "ACTIVE", "currency": "USD",
+            "cash": "100000.00", "buying_power": "200000.00",
+            "portfolio_value": f"{equity:.2f}", "equity": f"{equity:.2f}", "last_equity": f"{equity:.2f}",
+        }
+
+    @app.get('/v2/positions')
+    async def list_positions():
+        return [
+            {"symbol": s, "qty": str(p['qty']), "avg_entry_price": str(p['price']),
+             "market_value": str(p['market_value']), "unrealized_pl": "0", "side": "long"}
+            for s, p in positions.items()
+        ]
+
+    @app.post('/v2/orders')
+    async def submit_order(request: Request):
+        body = await request.json()
+        symbol = body['symbol']
+        qty = float(body['qty'])
+        price = _price(symbol)
+        held = positions.setdefault(symbol, {"qty": 0.0, "price": price, "market_value": 0.0})
+        held['qty'] += qty if body.get('side') == 'buy' else -qty
+        held['market_value'] = held['qty'] * price
+        if held['qty'] == 0:
+            positions.pop(symbol)
+        return {
+            "id": f"fake-order-{next(order_ids)}", "client_order_id": body.get('client_order_id'),
+            "symbol": symbol, "qty": body['qty'], "side": body.get('side'), "type": body.get('type', 'market'),
+            "time_in_force": body.get('time_in_force', 'day'), "status": "filled",
+            "filled_qty": body['qty'], "filled_avg_price": str(price),
+            "created_at": _now(), "submitted_at": _now(), "filled_at": _now(),
+        }
+
+    @app.get('/v2/stocks/trades/latest')
+    async def latest_trades(symbols: str):
+        return {"trades": {s: {"t": _now(), "p": _price(s), "s": 100, "x": "V", "i": 1}
+                           for s in symbols.split(',') if s}}
+
+    @app.get('/v2/stocks/{symbol}/trades/latest')
+    async def latest_trade(symbol: str):
+        return {"symbol": symbol, "trade": {"t": _now(), "p": _price(symbol), "s": 100, "x": "V", "i": 1}}
+
+    @app.get('/v2/stocks/bars')
+    async def bars(symbols: str, start: str = None, end: str = None, timeframe: str = '1Day', limit: int = 10000):
+        end_day = datetime.date.fromisoformat(end[:10]) if end else datetime.date.today()
+        start_day = datetime.date.fromisoformat(start[:10]) if start else end_day - datetime.timedelta(days=30)
+        days = [start_day + datetime.timedelta(days=i) for i in range((end_day - start_day).days + 1)]
+        days = [d for d in days if d.weekday() < 5]
+        result = {}
+        for symbol in symbols.split(','):
+            rng = random.Random(symbol)
+            price = _price(symbol)
+            series = []
+            for day in days:
+                close = price * (1 + rng.gauss(0.0003, 0.015))
+                series.append({"t": f"{day.isoformat()}T04:00:00Z", "o": price, "h": max(price, close) * 1.005,
+                               "l": min(price, close) * 0.995, "c": close, "v": rng.randint(10 ** 5, 10 ** 7)})
+                price = close
+            result[symbol] = series
+        return {"bars": result, "next_page_token": None}
+
+    @app.websocket('/v2/{feed}')
+    async def market_stream(websocket: WebSocket, feed: str):
+        """Replays a random-walk trade stream using Alpaca's websocket protocol"""
+        await websocket.accept()
+        await websocket.send_json([{"T": "success", "msg": "connected"}])
+        try:
+            await websocket.receive_json()  # auth
+            await websocket.send_json([{"T": "success", "msg": "authenticated"}])
+            sub = await websocket.receive_json()
+            symbols = sub.get('trades') or ['SPY']
+            await websocket.send_json([{"T": "subscription", "trades": symbols, "bars": sub.get('bars', [])}])
+            prices = {s: _price(s) for s in symbols}
+            batch = max(1, int(app.state.ticks_per_second / 100))
+            while True:
+                msgs = []
+                for _ in range(batch):
+                    symbol = random.choice(symbols)
+                    prices[symbol] *= 1 + random.gauss(0, 0.0005)
+                    msgs.append({"T": "t", "S": symbol, "p": round(prices[symbol], 4), "s": 100, "t": _now()})
+                await websocket.send_text(json.dumps(msgs))
+                await asyncio.sleep(batch / app.state.ticks_per_second)
+        except Exception:
+            # client went away (disconnect or closed mid-send)
+            pass
+
+    return app
+
+
+class FakeAlpacaServer:
+    """Runs the fake API in a child process so it doesn't share our GIL"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8100, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 ticks_per_second: float = 1000.0):
+        self.host = host
+        self.port = port
+        self.url = f"http://{host}:{port}"
+        self.args = [sys.executable, os.path.abspath(__file__), '--host', host, '--port', str(port),
+                     '--latency-ms', str(latency_ms), '--jitter-ms', str(jitter_ms),
+                     '--ticks-per-second', str(ticks_per_second)]
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.args)
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection((self.host, self.port), timeout=0.2).close()
+                return self
+            except OSError:
+                if self.process.poll() is not None:
+                    break
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError(f"fake Alpaca server did not start on {self.url}")
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(timeout=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--ticks-per-second', type=float, default=1000.0, help="trade replay rate of the websocket stream")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.jitter_ms, args.ticks_per_second), host=args.host, port=args.port, log_level='warning')
@@ -1,16 +1,32 @@
 """
 AutoDriver API - library wrapper for Avivi Invest backend.
 Simple async wrapper to reuse core features in other projects.
+
+AccountPool drives many accounts from one process: every account's client
+shares one connection pool (or thread pool, for the 'rest' transport), one
+concurrency cap and one rate-limit budget, and the batched methods fan out
+across accounts concurrently.
 """
+import asyncio
+import logging
 import os
-from alpaca_client import AlpacaClient
+from typing import Dict, Iterable, List, Optional
+from alpaca_client import create_alpaca_client
+from rate_limiter import PrioritySemaphore, TokenBucketLimiter
+
+logger = logging.getLogger(__name__)
 
 class AutoDriverAPI:
-    def __init__(self, api_key=None, secret_key=None, base_url=None, paper=True):
+    def __init__(self, api_key=None, secret_key=None, base_url=None, paper=True, transport=None, client=None):
+        if client is not None:
+            # an account from an AccountPool; the pool owns the shared transport
+            self.client = client
+            return
         api_key = api_key or os.getenv('ALPACA_API_KEY')
         secret_key = secret_key or os.getenv('ALPACA_SECRET_KEY')
         base_url = base_url or os.getenv('ALPACA_BASE_URL')
-        self.client = AlpacaClient(api_key=api_key, secret_key=secret_key, base_url=base_url, paper=paper)
+        # transport: 'rest' (default) or 'http'; falls back to ALPACA_TRANSPORT
+        self.client = create_alpaca_client(api_key=api_key, secret_key=secret_key, base_url=base_url, paper=paper, transport=transport)
 
     async def fetch_quote(self, symbol):
         return await self.client.get_last_quote(symbol)
@@ -20,3 +36,130 @@ class AutoDriverAPI:
 
     async def get_account(self):
         return await self.client.get_account()
+
+    async def close(self):
+        await self.client.close()
+
+
+class AccountPool:
+    """
+    Clients for several accounts over shared infrastructure.
+
+        async with AccountPool({"alice": {"api_key": ..., "secret_key": ...}, ...}) as pool:
+            accounts = await pool.get_accounts()
+            await pool.create_orders([{"account": "alice", "symbol": "SPY", "qty": 1, "side": "buy"}])
+
+    Each account's credentials may also carry `base_url` and `paper`. The
+    rate limit defaults to the per-account budget (ALPACA_RATE_LIMIT_PER_MINUTE
+    and burst) times the number of accounts, as one bucket, and concurrency to
+    at least one slot per account, so a call to every account goes out at once.
+    """
+
+    def __init__(self, accounts: Dict[str, Dict], transport: str = None, paper: bool = True,
+                 max_workers: int = None, rate_per_minute: float = None, burst: int = None):
+        if not accounts:
+            raise ValueError("AccountPool needs at least one account")
+        self.credentials = dict(accounts)
+        self.transport = (transport or os.getenv('ALPACA_TRANSPORT', 'rest')).lower()
+        self.paper = paper
+        n = len(self.credentials)
+        self.max_workers = max_workers or max(int(os.getenv('ALPACA_MAX_WORKERS', 8)), n)
+        per_account = float(os.getenv('ALPACA_RATE_LIMIT_PER_MINUTE', 200))
+        self.rate_per_minute = rate_per_minute or per_account * n
+        if burst is None:
+            burst = int(os.getenv('ALPACA_RATE_LIMIT_BURST') or max(1, int(per_account / 60))) * n
+        self.burst = burst
+        self.clients = {}
+        self._executor = None
+        self._http = None
+
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def open(self):
+        if self.clients:
+            return
+        if self.transport == 'http':
+            from alpaca_http import http_client
+            self._http = http_client(self.max_workers)
+        elif self.transport == 'rest':
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='alpaca-pool')
+        shared = dict(
+            rate_limiter=TokenBucketLimiter(rate_per_minute=self.rate_per_minute, burst=self.burst),
+            slots=PrioritySemaphore(self.max_workers),
+            executor=self._executor,
+            http=self._http,
+        )
+        quote_cache = None
+        for name, creds in self.credentials.items():
+            client = create_alpaca_client(
+                api_key=creds.get('api_key'), secret_key=creds.get('secret_key'), base_url=creds.get('base_url'),
+                paper=creds.get('paper', self.paper), transport=self.transport, **shared)
+            # quotes are market data, the same for every account: one cache
+            if quote_cache is None:
+                quote_cache = client.quote_cache
+            client.quote_cache = quote_cache
+            self.clients[name] = client
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.close()
+        self.clients = {}
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def account(self, name: str) -> AutoDriverAPI:
+        return AutoDriverAPI(client=self.clients[name])
+
+    def limiter_stats(self):
+        """Shared rate-limit and concurrency statistics for the whole pool"""
+        return next(iter(self.clients.values())).limiter_stats() if self.clients else {}
+
+    async def fetch_quotes(self, symbols: Iterable[str]) -> Dict[str, Dict]:
+        """Latest quotes, fetched once for all accounts in concurrent multi-symbol requests"""
+        return await next(iter(self.clients.values())).get_last_quotes(list(symbols))
+
+    async def get_accounts(self, names: Optional[Iterable[str]] = None) -> Dict:
+        """{"accounts": {name: account}, "errors": {name: message}}, every account queried at once"""
+        names = list(names) if names is not None else list(self.clients)
+        results = await asyncio.gather(*(self.clients[n].get_account() for n in names), return_exceptions=True)
+        accounts, errors = {}, {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error(f"Account {name} fetch failed: {result}")
+                errors[name] = str(result)
+            else:
+                accounts[name] = result
+        return {"accounts": accounts, "errors": errors}
+
+    async def create_orders(self, orders: List[Dict]) -> List[Dict]:
+        """
+        Submit orders ({"account", "symbol", "qty", "side"}, optionally "type",
+        "time_in_force", "limit_price") across accounts concurrently. Results
+        come back in input order with status 'submitted' and the broker order,
+        or status 'failed' and the error.
+        """
+        async def submit(order):
+            client = self.clients[order['account']]
+            try:
+                placed = await client.create_order(
+                    symbol=order['symbol'], qty=order['qty'], side=order['side'], type=order.get('type', 'market'),
+                    time_in_force=order.get('time_in_force', 'day'), limit_price=order.get('limit_price'))
+                return dict(order, status='submitted', order=placed)
+            except Exception as e:
+                logger.error(f"Order {order['side']} {order['qty']} {order['symbol']} for {order['account']} failed: {e}")
+                return dict(order, status='failed', error=str(e))
+
+        unknown = {o['account'] for o in orders} - set(self.clients)
+        if unknown:
+            raise KeyError(f"unknown accounts: {', '.join(sorted(unknown))}")
+        return list(await asyncio.gather(*(submit(o) for o in orders)))